@@ -31,6 +31,7 @@ from modoboa.transport import models as transport_models
 from modoboa.transport.api.v2 import serializers as transport_serializers
 
 from ... import constants, models
+from ...models.mixins import fetch_message_counters
 
 
 class CreateDomainAdminSerializer(serializers.Serializer):
@@ -50,6 +51,15 @@ class DomainResourceSerializer(serializers.ModelSerializer):
         model = limits_models.DomainObjectLimit
 
 
+class DomainListSerializer(serializers.ListSerializer):
+    """Fetch data shared by all domains before serializing them."""
+
+    def to_representation(self, data):
+        domains = list(data.all() if hasattr(data, "all") else data)
+        fetch_message_counters(domains)
+        return super().to_representation(domains)
+
+
 class DomainSerializer(v1_serializers.DomainSerializer):
     """Domain serializer for v2 API."""
 
@@ -57,6 +67,7 @@ class DomainSerializer(v1_serializers.DomainSerializer):
     transport = transport_serializers.TransportSerializer(required=False)
 
     class Meta(v1_serializers.DomainSerializer.Meta):
+        list_serializer_class = DomainListSerializer
         fields = v1_serializers.DomainSerializer.Meta.fields + (
             "domain_admin",
             "transport",
@@ -778,7 +789,7 @@ class WritableAccountSerializer(v1_serializers.WritableAccountSerializer):
                 if not owner.is_superuser:
                     allocate_resources_from_user(limit, owner, resource["max_value"])
                 limit.max_value = resource["max_value"]
-                limit.save()
+                limit.save(update_fields=["max_value"])
         return instance
 
 
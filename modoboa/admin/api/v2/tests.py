@@ -1,15 +1,20 @@
 """API v2 tests."""
 
+import datetime
 from unittest import mock
 
 from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.encoding import force_str
 
 from rest_framework.authtoken.models import Token
 
 from modoboa.admin import factories, models, constants
 from modoboa.core import factories as core_factories, models as core_models
+from modoboa.dnstools.factories import DNSRecordFactory
 from modoboa.lib.permissions import grant_access_to_object
 from modoboa.lib.tests import ModoAPITestCase
 
@@ -101,6 +106,46 @@ class DomainViewSetTestCase(ModoAPITestCase):
         domain.refresh_from_db()
         self.assertFalse(domain.enable_dns_checks)
 
+    def test_list_query_count(self):
+        """Listing domains must not issue extra queries per domain."""
+        self.set_global_parameter("enable_domain_limits", True, app="limits")
+        creation = timezone.now() - datetime.timedelta(days=2)
+        for i in range(5):
+            domain = factories.DomainFactory(name=f"domain{i}.tld", quota=100)
+            factories.MailboxFactory(
+                address="user", domain=domain, user__username=f"user@domain{i}.tld"
+            )
+            factories.MXRecordFactory(domain=domain, updated=timezone.now())
+            factories.AlarmFactory(domain=domain, mailbox=None)
+            DNSRecordFactory(domain=domain, type="spf", is_valid=True)
+        models.Domain.objects.update(creation=creation)
+
+        url = reverse("v2:domain-list")
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, {"page_size": 1})
+        self.assertEqual(resp.status_code, 200)
+        with self.assertNumQueries(len(ctx)):
+            resp = self.client.get(url, {"page_size": 10})
+        self.assertEqual(resp.status_code, 200)
+
+        results = {domain["name"]: domain for domain in resp.json()["results"]}
+        self.assertEqual(len(results), 7)
+        for domain in models.Domain.objects.all():
+            result = results[domain.name]
+            self.assertEqual(result["mailbox_count"], domain.mailbox_count)
+            self.assertEqual(result["mbalias_count"], domain.mbalias_count)
+            self.assertEqual(result["domainalias_count"], domain.domainalias_count)
+            self.assertEqual(
+                result["opened_alarms_count"], domain.opened_alarms_count
+            )
+            self.assertEqual(
+                result["allocated_quota_in_percent"],
+                domain.allocated_quota_in_percent,
+            )
+            self.assertEqual(result["dns_global_status"], domain.dns_global_status)
+        self.assertEqual(results["domain0.tld"]["opened_alarms_count"], 1)
+        self.assertEqual(results["domain0.tld"]["allocated_quota_in_percent"], 10)
+
     def test_update_resources(self):
         self.set_global_parameter("enable_domain_limits", True, app="limits")
         domain = models.Domain.objects.get(name="test2.com")
@@ -291,7 +336,7 @@ domainalias; domalias1.com; domain1.com; True
             "domain,test2.com,0,0,True",
         ]
         self.assertCountEqual(
-            expected_response, force_str(response.content.strip()).split("\r\n")
+            expected_response, force_str(response.getvalue().strip()).split("\r\n")
         )
 
 
@@ -1000,7 +1045,7 @@ dlist; dlist@test.com; True; user1@test.com; user@extdomain.com
     def test_export(self):
         response = self.client.get(reverse("v2:identities-export"))
         expected_response = "account,admin,,,,True,SuperAdmins,,\r\naccount,admin@test.com,{PLAIN}toto,,,True,DomainAdmins,admin@test.com,10,test.com\r\naccount,admin@test2.com,{PLAIN}toto,,,True,DomainAdmins,admin@test2.com,10,test2.com\r\naccount,user@test.com,{PLAIN}toto,,,True,SimpleUsers,user@test.com,10\r\naccount,user@test2.com,{PLAIN}toto,,,True,SimpleUsers,user@test2.com,10\r\nalias,alias@test.com,True,user@test.com\r\nalias,forward@test.com,True,user@external.com\r\nalias,postmaster@test.com,True,test@truc.fr,toto@titi.com\r\n"  # NOQA:E501
-        received_content = force_str(response.content.strip()).split("\r\n")
+        received_content = force_str(response.getvalue().strip()).split("\r\n")
         # Empty admin password because it is hashed using SHA512-CRYPT
         admin_row = received_content[0].split(",")
         admin_row[2] = ""
@@ -1010,7 +1055,7 @@ dlist; dlist@test.com; True; user1@test.com; user@extdomain.com
     def test_export_accounts(self):
         response = self.client.get(f"{reverse('v2:identities-export')}?type=account")
         expected_response = "account,admin,,,,True,SuperAdmins,,\r\naccount,admin@test.com,{PLAIN}toto,,,True,DomainAdmins,admin@test.com,10,test.com\r\naccount,admin@test2.com,{PLAIN}toto,,,True,DomainAdmins,admin@test2.com,10,test2.com\r\naccount,user@test.com,{PLAIN}toto,,,True,SimpleUsers,user@test.com,10\r\naccount,user@test2.com,{PLAIN}toto,,,True,SimpleUsers,user@test2.com,10\r\n"  # NOQA:E501
-        received_content = force_str(response.content.strip()).split("\r\n")
+        received_content = force_str(response.getvalue().strip()).split("\r\n")
         # Empty admin password because it is hashed using SHA512-CRYPT
         admin_row = received_content[0].split(",")
         admin_row[2] = ""
@@ -1020,7 +1065,7 @@ dlist; dlist@test.com; True; user1@test.com; user@extdomain.com
     def test_export_aliases(self):
         response = self.client.get(f"{reverse('v2:identities-export')}?type=alias")
         expected_response = "alias,alias@test.com,True,user@test.com\r\nalias,forward@test.com,True,user@external.com\r\nalias,postmaster@test.com,True,test@truc.fr,toto@titi.com\r\n"  # NOQA:E501
-        received_content = force_str(response.content.strip()).split("\r\n")
+        received_content = force_str(response.getvalue().strip()).split("\r\n")
         self.assertCountEqual(expected_response.strip().split("\r\n"), received_content)
 
 
@@ -14,6 +14,7 @@ from django.db.models import (
     When,
 )
 from django.db.models.functions import Concat
+from django.http import StreamingHttpResponse
 
 from django_filters import rest_framework as dj_filters
 from drf_spectacular.utils import extend_schema, extend_schema_view
@@ -37,7 +38,9 @@ from modoboa.lib import signals as lib_signals
 from modoboa.lib import viewsets as lib_viewsets
 from modoboa.lib.throttle import GetThrottleViewsetMixin
 from modoboa.lib.exceptions import AliasExists
+from modoboa.parameters import tools as param_tools
 
+from ... import exporter
 from ... import lib
 from ... import models
 from ... import constants
@@ -86,9 +89,14 @@ class DomainViewSet(
 
     def get_queryset(self):
         """Filter queryset based on current user."""
-        if self.request.user and not self.request.user.is_anonymous:
-            return models.Domain.objects.get_for_admin(self.request.user)
-        return models.Domain.objects.none()
+        if not self.request.user or self.request.user.is_anonymous:
+            return models.Domain.objects.none()
+        queryset = models.Domain.objects.get_for_admin(self.request.user)
+        if self.action in ["list", "retrieve"]:
+            queryset = queryset.with_statistics().select_related("transport")
+            if param_tools.get_global_parameter("enable_domain_limits", app="limits"):
+                queryset = queryset.prefetch_related("domainobjectlimit_set")
+        return queryset
 
     def get_serializer_class(self, *args, **kwargs):
         if self.action == "delete":
@@ -147,10 +155,8 @@ class DomainViewSet(
     )
     def export(self, request, **kwargs):
         """Export domains and aliases to CSV."""
-        result = []
-        for domain in self.get_queryset():
-            result += domain.to_csv_rows()
-        return response.Response(result)
+        rows = exporter.get_domain_rows(self.get_queryset())
+        return StreamingHttpResponse(exporter.stream_csv(rows), content_type="text/csv")
 
     @extend_schema(request=serializers.CSVImportSerializer)
     @action(
@@ -325,11 +331,10 @@ class IdentityViewSet(GetThrottleViewsetMixin, viewsets.ViewSet):
     )
     def export(self, request, **kwargs):
         """Export accounts and aliases to CSV."""
-        result = []
-        idtfilter = request.GET.get("type")
-        for idt in lib.get_identities(request.user, idtfilter=idtfilter):
-            result.append(idt.to_csv_row())
-        return response.Response(result)
+        rows = exporter.get_identity_rows(
+            request.user, idtfilter=request.GET.get("type")
+        )
+        return StreamingHttpResponse(exporter.stream_csv(rows), content_type="text/csv")
 
     @extend_schema(request=serializers.CSVIdentityImportSerializer)
     @action(
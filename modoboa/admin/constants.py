@@ -13,6 +13,24 @@ DNSBL_PROVIDERS = [
     "zen.spamhaus.org",
 ]
 
+# DNS checks tuning (can be overridden in settings)
+# Maximum number of DNS lookups running at the same time
+DNS_CHECKS_MAX_CONCURRENCY = 50
+# Timeout (in seconds) of a single lookup
+DNS_CHECKS_QUERY_TIMEOUT = 10
+# Number of domains checked by a single job
+DNS_CHECKS_BATCH_SIZE = 50
+# How long (in seconds) DNSBL results are shared between domains (0 to disable)
+DNSBL_CACHE_TTL = 3600
+DNSBL_CACHE_KEY_PREFIX = "modoboa:dnsbl"
+
+# Number of CSV rows imported at once by "modo import --bulk"
+IMPORT_CHUNK_SIZE = 500
+# Number of objects fetched at once by CSV exports (can be overridden in settings)
+EXPORT_CHUNK_SIZE = 2000
+# Number of objects fixed at once by "modo repair"
+REPAIR_CHUNK_SIZE = 1000
+
 # Do not run tests for these domains.
 # https://en.wikipedia.org/wiki/Top-level_domain#Reserved_domains
 RESERVED_TLD = ["example", "invalid", "localhost", "test"]
@@ -1,17 +1,29 @@
+import asyncio
+import concurrent.futures
 import ipaddress
-import socket
+import logging
+
+import dns.exception
+import dns.resolver
 
 from django.conf import settings
 from django.core.mail import EmailMessage
+from django.db import connection
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 
-from modoboa.admin import constants, models
-from modoboa.dnstools import models as dns_models
+from modoboa.admin import constants, lib, models
+from modoboa.dnstools import lib as dns_lib, models as dns_models
+from modoboa.lib.redis import get_redis_connection
 from modoboa.parameters import tools as param_tools
 
+logger = logging.getLogger("modoboa.dns")
+
+# Returned by DNSChecker.lookup when a lookup did not complete in time
+LOOKUP_TIMEOUT = object()
+
 
 class DNSChecker:
 
@@ -22,6 +34,36 @@ class DNSChecker:
             return constants.DNSBL_PROVIDERS
         return settings.DNSBL_PROVIDERS
 
+    @cached_property
+    def max_concurrency(self) -> int:
+        """Return the maximum number of DNS lookups running at the same time."""
+        return getattr(
+            settings,
+            "DNS_CHECKS_MAX_CONCURRENCY",
+            constants.DNS_CHECKS_MAX_CONCURRENCY,
+        )
+
+    @cached_property
+    def query_timeout(self) -> float:
+        """Return the timeout (in seconds) of a single DNS lookup."""
+        return getattr(
+            settings, "DNS_CHECKS_QUERY_TIMEOUT", constants.DNS_CHECKS_QUERY_TIMEOUT
+        )
+
+    @cached_property
+    def dnsbl_cache_ttl(self) -> int:
+        """Return how long (in seconds) DNSBL results are kept in cache."""
+        return getattr(settings, "DNSBL_CACHE_TTL", constants.DNSBL_CACHE_TTL)
+
+    @cached_property
+    def rclient(self):
+        return get_redis_connection(hget_return_type=None)
+
+    @cached_property
+    def resolver(self):
+        """Return the resolver shared by all lookups."""
+        return lib.get_dns_resolver(lifetime=self.query_timeout)
+
     @cached_property
     def sender(self):
         """Return sender address for notifications."""
@@ -39,70 +81,84 @@ class DNSChecker:
             ipaddress.ip_network(str(v.strip())) for v in valid_mxs.split() if v.strip()
         ]
 
-    def query_dnsbl(self, mx_list, provider):
+    def query_dnsbl(self, ip, provider):
         """Check given IP against given DNSBL provider."""
-        results = {}
-        for ip, mxs in mx_list.items():
-            try:
-                ip = ipaddress.ip_address(str(ip))
-            except ValueError:
-                continue
-            else:
-                delim = "." if ip.version == 4 else ":"
-                reverse = delim.join(ip.exploded.split(delim)[::-1])
-            pattern = f"{reverse}.{provider}."
-            try:
-                result = socket.gethostbyname(pattern)
-                # result from dnsbl is in ipv4 format
-                splited_result = result.split(".")
-                if int(splited_result[-1]) > 15:
-                    # Typical dnsbl result : 127.0.0.[1-15] (depends on services)
-                    result = False
-            except socket.gaierror:
-                result = False
-            for mx in mxs:
-                results[mx] = result
-        return results
-
-    def store_dnsbl_result(self, domain, provider, results):
-        """Store DNSBL provider results for domain.
-
-        Return a list of alerts.
+        try:
+            ip = ipaddress.ip_address(str(ip))
+        except ValueError:
+            return False
+        delim = "." if ip.version == 4 else ":"
+        reverse = delim.join(ip.exploded.split(delim)[::-1])
+        pattern = f"{reverse}.{provider}."
+        try:
+            answer = self.resolver.resolve(pattern, "A")
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return False
+        except dns.resolver.NoNameservers:
+            # Provider unreachable: status is unknown
+            return None
+        result = answer[0].address
+        # result from dnsbl is in ipv4 format
+        splited_result = result.split(".")
+        if int(splited_result[-1]) > 15:
+            # Typical dnsbl result : 127.0.0.[1-15] (depends on services)
+            return False
+        return result
+
+    def store_dnsbl_results(self, domain: models.Domain, results: dict) -> list:
+        """Store DNSBL results for domain.
+
+        Results are saved using a single bulk upsert and alarms are
+        opened for MXs which were not listed yet. Timed out lookups
+        (``None`` status) are skipped so the previous status is kept.
+
+        :param results: a dictionary ``{provider: {mx: status}}``
+        :return: a list of alerts
         """
+        previous = {
+            (provider, mx_id): status
+            for provider, mx_id, status in models.DNSBLResult.objects.filter(
+                domain=domain
+            ).values_list("provider", "mx_id", "status")
+        }
         alerts = []
-        to_create = []
-        for mx, result in list(results.items()):
-            if not result:
-                result = ""
-            dnsbl_result = models.DNSBLResult.objects.filter(
-                domain=domain, provider=provider, mx=mx
-            ).first()
-            trigger = False
-            if dnsbl_result is None:
-                to_create.append(
+        to_save = []
+        alarms_to_close = []
+        for provider, mx_results in results.items():
+            listed = False
+            timed_out = False
+            for mx, result in mx_results.items():
+                if result is None:
+                    timed_out = True
+                    continue
+                result = result or ""
+                to_save.append(
                     models.DNSBLResult(
                         domain=domain, provider=provider, mx=mx, status=result
                     )
                 )
-                if result:
-                    trigger = True
-            else:
-                dnsbl_result.status = result
-                dnsbl_result.save()
-                if not dnsbl_result.status and result:
-                    trigger = True
-            alarm_name = f"domain_mx_in_dnsbl_{provider}"
-            if trigger:
+                if not result:
+                    continue
+                listed = True
+                if previous.get((provider, mx.id)):
+                    continue
                 title = _("MX {} listed by DNSBL provider {}").format(mx.name, provider)
                 domain.alarms.create(
-                    internal_name=alarm_name, status=constants.ALARM_OPENED, title=title
+                    internal_name=f"domain_mx_in_dnsbl_{provider}",
+                    status=constants.ALARM_OPENED,
+                    title=title,
                 )
                 alerts.append((provider, mx.name))
-            else:
-                domain.alarms.filter(
-                    internal_name=alarm_name, status=constants.ALARM_OPENED
-                ).update(status=constants.ALARM_CLOSED, closed=timezone.now())
-        models.DNSBLResult.objects.bulk_create(to_create)
+            if not listed and not timed_out:
+                alarms_to_close.append(f"domain_mx_in_dnsbl_{provider}")
+        upsert_options = {"update_conflicts": True, "update_fields": ["status"]}
+        if connection.features.supports_update_conflicts_with_target:
+            upsert_options["unique_fields"] = ["domain", "provider", "mx"]
+        models.DNSBLResult.objects.bulk_create(to_save, **upsert_options)
+        if alarms_to_close:
+            domain.alarms.filter(
+                internal_name__in=alarms_to_close, status=constants.ALARM_OPENED
+            ).update(status=constants.ALARM_CLOSED, closed=timezone.now())
         return alerts
 
     def send_alert_notifications(
@@ -178,49 +234,187 @@ class DNSChecker:
         tpl = "admin/notifications/domain_invalid_mx.html"
         self.send_alert_notifications(domain, alerts, subject, tpl)
 
-    def run(self, domain: models.Domain, ttl: int = 7200):
+    def prepare(self, domain: models.Domain) -> dict:
+        """Find which DNS lookups are needed for domain.
+
+        Records which are still valid (see `ttl`) are not queried again.
+        """
         # Remove deprecated records first
         domain.dnsblresult_set.exclude(provider__in=self.providers).delete()
 
-        mx_list = list(models.MXRecord.objects.get_or_create_for_domain(domain, ttl))
-
-        if self.config["enable_mx_checks"]:
-            self.check_valid_mx(domain, mx_list)
-
+        now = timezone.now()
+        mx_list = list(models.MXRecord.objects.filter(domain=domain, updated__gt=now))
+        rtypes = []
         if self.config["enable_spf_checks"]:
-            dns_models.DNSRecord.objects.get_or_create_for_domain(domain, "spf", ttl)
+            rtypes.append("spf")
         condition = (
             self.config["enable_dkim_checks"]
             and domain.enable_dkim
             and domain.dkim_public_key
         )
         if condition:
-            dns_models.DNSRecord.objects.get_or_create_for_domain(domain, "dkim", ttl)
+            rtypes.append("dkim")
         if self.config["enable_dmarc_checks"]:
-            dns_models.DNSRecord.objects.get_or_create_for_domain(domain, "dmarc", ttl)
+            rtypes.append("dmarc")
         if self.config["enable_autoconfig_checks"]:
-            dns_models.DNSRecord.objects.get_or_create_for_domain(
-                domain, "autoconfig", ttl
+            rtypes += ["autoconfig", "autodiscover"]
+        valid_rtypes = dns_models.DNSRecord.objects.filter(
+            domain=domain, type__in=rtypes, updated__gt=now
+        ).values_list("type", flat=True)
+        return {
+            "domain": domain,
+            "mx_list": mx_list or None,
+            "domain_mxs": [],
+            "rtypes": [rtype for rtype in rtypes if rtype not in valid_rtypes],
+            "records": {},
+            "dnsbl": {},
+        }
+
+    async def lookup(self, func, *args, **kwargs):
+        """Run a blocking DNS lookup in the thread pool.
+
+        The number of concurrent lookups is limited and each lookup
+        is given `query_timeout` seconds to complete, starting when a
+        worker picks it up. `LOOKUP_TIMEOUT` is returned if it does not.
+        """
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+
+        def run():
+            loop.call_soon_threadsafe(started.set)
+            return func(*args, **kwargs)
+
+        async with self._semaphore:
+            future = loop.run_in_executor(self._executor, run)
+            try:
+                await started.wait()
+                return await asyncio.wait_for(future, self.query_timeout)
+            except (asyncio.TimeoutError, dns.exception.Timeout):
+                logger.warning(
+                    _("DNS lookup timeout (%s), skipping") % ", ".join(map(str, args))
+                )
+                return LOOKUP_TIMEOUT
+
+    async def resolve_domain(self, check: dict) -> None:
+        """Resolve every record needed by a domain concurrently."""
+        domain = check["domain"]
+        ipv6 = self.config["enable_ipv6_mx_checks"]
+        lookups = [
+            self.lookup(
+                dns_lib.get_record,
+                rtype,
+                domain.name,
+                selector=domain.dkim_key_selector,
+                resolver=self.resolver,
+                ipv6=ipv6,
+            )
+            for rtype in check["rtypes"]
+        ]
+        if check["mx_list"] is None:
+            lookups.append(
+                self.lookup(lib.get_domain_mx_list, domain.name, self.resolver, ipv6)
+            )
+        results = await asyncio.gather(*lookups)
+        check["records"] = dict(zip(check["rtypes"], results))
+        if check["mx_list"] is None:
+            check["domain_mxs"] = results[-1]
+            if check["domain_mxs"] is LOOKUP_TIMEOUT:
+                return
+            addresses = {
+                str(mx_ip_addr) for _mx_addr, mx_ip_addr in check["domain_mxs"]
+            }
+        else:
+            addresses = {mx.address for mx in check["mx_list"]}
+
+        if not self.config["enable_dnsbl_checks"]:
+            return
+        queries = [
+            (address, provider) for address in addresses for provider in self.providers
+        ]
+        results = await asyncio.gather(
+            *[self.query_dnsbl_once(*query) for query in queries]
+        )
+        check["dnsbl"] = dict(zip(queries, results))
+
+    async def query_dnsbl_once(self, address: str, provider: str):
+        """Query DNSBL provider for address, only once per run.
+
+        Domains sharing the same MXs wait for the same lookup.
+        """
+        key = (address, provider)
+        if key not in self._dnsbl_lookups:
+            self._dnsbl_lookups[key] = asyncio.ensure_future(
+                self.lookup_dnsbl(address, provider)
+            )
+        return await self._dnsbl_lookups[key]
+
+    async def lookup_dnsbl(self, address: str, provider: str):
+        """Return DNSBL status of address, using the shared cache if possible."""
+        key = f"{constants.DNSBL_CACHE_KEY_PREFIX}:{provider}:{address}"
+        if self.dnsbl_cache_ttl:
+            status = self.rclient.get(key)
+            if status is not None:
+                return status.decode() or False
+        result = await self.lookup(self.query_dnsbl, address, provider)
+        if result is LOOKUP_TIMEOUT:
+            return None
+        if result is not None and self.dnsbl_cache_ttl:
+            self.rclient.set(key, result or "", ex=self.dnsbl_cache_ttl)
+        return result
+
+    async def resolve(self, checks: list) -> list:
+        """Resolve DNS records of several domains concurrently.
+
+        :return: a list containing, for each check, None or the
+                 exception raised while resolving it
+        """
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._dnsbl_lookups = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_concurrency
+        )
+        try:
+            return await asyncio.gather(
+                *[self.resolve_domain(check) for check in checks],
+                return_exceptions=True,
             )
-            dns_models.DNSRecord.objects.get_or_create_for_domain(
-                domain, "autodiscover", ttl
+        finally:
+            # Timed out lookups must not block the end of the run
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def store(self, check: dict, ttl: int = 7200) -> None:
+        """Store lookup results for a domain and raise alarms if needed."""
+        domain = check["domain"]
+        if check["mx_list"] is not None:
+            mx_list = check["mx_list"]
+        elif check["domain_mxs"] is LOOKUP_TIMEOUT:
+            # Keep previous MX records and alarms
+            mx_list = None
+        else:
+            mx_list = models.MXRecord.objects.store_for_domain(
+                domain, check["domain_mxs"], ttl
             )
 
+        if self.config["enable_mx_checks"] and mx_list is not None:
+            self.check_valid_mx(domain, mx_list)
+
+        for rtype, value in check["records"].items():
+            if value is LOOKUP_TIMEOUT:
+                continue
+            dns_models.DNSRecord.objects.store_for_domain(domain, rtype, value, ttl)
+
         condition = not self.config["enable_dnsbl_checks"] or not mx_list
         if condition:
             return
 
-        mx_by_ip = {}
-        for mx in mx_list:
-            if mx.address not in mx_by_ip:
-                mx_by_ip[mx.address] = [mx]
-            elif mx not in mx_by_ip[mx.address]:
-                mx_by_ip[mx.address].append(mx)
-
-        alerts = []
-        for provider in self.providers:
-            results = self.query_dnsbl(mx_by_ip, provider)
-            alerts += self.store_dnsbl_result(domain, provider, results)
+        results = {
+            provider: {
+                mx: check["dnsbl"].get((mx.address, provider))
+                for mx in mx_list
+            }
+            for provider in self.providers
+        }
+        alerts = self.store_dnsbl_results(domain, results)
 
         if not alerts:
             return
@@ -228,3 +422,28 @@ class DNSChecker:
         subject = _("[modoboa] DNSBL issue(s) for domain {}").format(domain.name)
         tpl = "admin/notifications/domain_in_dnsbl.html"
         self.send_alert_notifications(domain, alerts, subject, tpl)
+
+    def run_many(self, domains: list, ttl: int = 7200) -> None:
+        """Run DNS checks for several domains.
+
+        Database accesses are done before and after DNS lookups,
+        which are all performed concurrently.
+        """
+        checks = [self.prepare(domain) for domain in domains]
+        # The database can't be accessed from the event loop: make
+        # sure the resolver is configured before entering it.
+        self.resolver  # noqa: B018
+        errors = asyncio.run(self.resolve(checks))
+        for check, error in zip(checks, errors):
+            if error is not None:
+                # One failing domain must not prevent the others from
+                # being checked
+                logger.error(
+                    _("DNS checks failed for %s") % check["domain"].name,
+                    exc_info=error,
+                )
+                continue
+            self.store(check, ttl)
+
+    def run(self, domain: models.Domain, ttl: int = 7200):
+        self.run_many([domain], ttl)
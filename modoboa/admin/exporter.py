@@ -0,0 +1,114 @@
+"""Streaming export of identities and domains."""
+
+import csv
+from collections.abc import Iterator
+
+from django.conf import settings
+
+from modoboa.core.models import User
+from modoboa.lib.csvutils import SafeCSVWriter
+from . import constants, models
+
+
+class Echo:
+    """File-like object returning what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def get_chunk_size() -> int:
+    return getattr(settings, "EXPORT_CHUNK_SIZE", constants.EXPORT_CHUNK_SIZE)
+
+
+def iterate_by_chunks(queryset) -> Iterator[list]:
+    """Iterate over a queryset, one list of objects at a time.
+
+    Objects are fetched using ``iterator()`` so memory use does not
+    depend on the size of the queryset.
+    """
+    chunk_size = get_chunk_size()
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_domain_rows(domains) -> Iterator[list]:
+    """Return CSV rows of domains and their aliases."""
+    domains = domains.prefetch_related("domainalias_set")
+    for domain in domains.iterator(chunk_size=get_chunk_size()):
+        yield from domain.to_csv_rows()
+
+
+def get_account_rows(accounts) -> Iterator[list]:
+    """Return CSV rows of accounts."""
+    accounts = accounts.select_related("mailbox__domain").prefetch_related("groups")
+    for chunk in iterate_by_chunks(accounts):
+        admins = [account for account in chunk if account.role == "DomainAdmins"]
+        if admins:
+            administered_domains = {admin.pk: [] for admin in admins}
+            qset = (
+                models.Domain.objects.filter(owners__user__in=admins)
+                .values_list("owners__user", "name")
+                .order_by("name")
+            )
+            for user_id, name in qset:
+                administered_domains[user_id].append(name)
+            for admin in admins:
+                # Used by the account_exported signal receiver
+                admin._administered_domains = administered_domains[admin.pk]
+        for account in chunk:
+            yield account.to_csv_row()
+
+
+def get_alias_rows(aliases) -> Iterator[list]:
+    """Return CSV rows of aliases."""
+    aliases = aliases.prefetch_related("aliasrecipient_set")
+    for alias in aliases.iterator(chunk_size=get_chunk_size()):
+        yield alias.to_csv_row()
+
+
+def get_identity_rows(user=None, idtfilter=None) -> Iterator[list]:
+    """Return CSV rows of the identities a user can access.
+
+    Aliases targeted by other aliases are exported first so the
+    resulting file can be imported again.
+
+    :param user: a ``User`` instance (all identities if None)
+    :param str idtfilter: only export accounts or aliases
+    """
+    if not idtfilter or idtfilter == "account":
+        accounts = User.objects.all()
+        if user is not None:
+            accounts = accounts.filter(
+                pk__in=user.objectaccess_set.filter(
+                    content_type__app_label="core", content_type__model="user"
+                ).values("object_id")
+            )
+        yield from get_account_rows(accounts)
+    if not idtfilter or idtfilter == "alias":
+        aliases = models.Alias.objects.filter(internal=False)
+        if user is not None:
+            aliases = aliases.filter(
+                pk__in=user.objectaccess_set.filter(
+                    content_type__app_label="admin", content_type__model="alias"
+                ).values("object_id")
+            )
+        targets = models.AliasRecipient.objects.filter(r_alias__isnull=False)
+        yield from get_alias_rows(aliases.filter(pk__in=targets.values("r_alias")))
+        yield from get_alias_rows(aliases.exclude(pk__in=targets.values("r_alias")))
+
+
+def stream_csv(rows, delimiter=",") -> Iterator[str]:
+    """Return CSV lines, one at a time.
+
+    Cells are escaped using ``SafeCSVWriter``.
+    """
+    writer = SafeCSVWriter(csv.writer(Echo(), delimiter=delimiter))
+    for row in rows:
+        yield writer.writerow(row)
@@ -7,6 +7,7 @@ from django.utils.translation import gettext as _
 
 from modoboa.core import models as core_models, signals as core_signals
 from modoboa.lib import exceptions, permissions, signals as lib_signals
+from modoboa.lib.db_utils import bulk_insert
 from modoboa.lib.email_utils import split_mailbox
 from modoboa.parameters import tools as param_tools
 from . import lib, models, postfix_maps, signals as admin_signals
@@ -94,6 +95,39 @@ def manage_alias_for_mailbox(sender, instance, **kwargs):
     )
 
 
+@receiver(core_signals.objects_bulk_created, sender=models.Mailbox)
+def create_aliases_for_mailboxes(sender, objects, **kwargs):
+    """Create "self aliases" for mailboxes created in bulk."""
+    addresses = {mb.full_address: mb for mb in objects}
+    existing = {
+        alias.address: alias
+        for alias in models.Alias.objects.filter(
+            address__in=addresses, internal=True
+        )
+    }
+    new_aliases = [
+        models.Alias(
+            address=address, domain=mb.domain, internal=True, enabled=mb.user.enabled
+        )
+        for address, mb in addresses.items()
+        if address not in existing
+    ]
+    bulk_insert(models.Alias, new_aliases, "address", internal=True)
+    core_signals.objects_bulk_created.send(sender=models.Alias, objects=new_aliases)
+    existing.update((alias.address, alias) for alias in new_aliases)
+    recipients = models.AliasRecipient.objects.bulk_create(
+        [
+            models.AliasRecipient(
+                address=address, alias=existing[address], r_mailbox=mb
+            )
+            for address, mb in addresses.items()
+        ]
+    )
+    core_signals.objects_bulk_created.send(
+        sender=models.AliasRecipient, objects=recipients
+    )
+
+
 @receiver(signals.pre_delete, sender=models.Mailbox)
 def mailbox_deleted_handler(sender, **kwargs):
     """``Mailbox`` pre_delete signal receiver.
@@ -194,6 +228,9 @@ def export_admin_domains(sender, user, **kwargs):
     result = [user.mailbox.quota] if hasattr(user, "mailbox") else [""]
     if user.role != "DomainAdmins":
         return result
+    if hasattr(user, "_administered_domains"):
+        # Fetched in bulk by the exporter
+        return result + user._administered_domains
     return result + [dom.name for dom in models.Domain.objects.get_for_admin(user)]
 
 
@@ -0,0 +1,330 @@
+"""Bulk import of identities."""
+
+import collections
+
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils.translation import gettext as _
+
+from modoboa.core import models as core_models, signals as core_signals
+from modoboa.lib import permissions
+from modoboa.lib.db_utils import bulk_insert
+from modoboa.lib.email_utils import split_mailbox
+from modoboa.lib.exceptions import BadRequest, Conflict, PermDeniedException
+from . import models
+
+TRUE_VALUES = ["true", "1", "yes", "y"]
+
+
+class BulkImporter:
+    """Import identities from CSV rows, one chunk at a time.
+
+    Rows of a chunk are validated in memory against data fetched once
+    for the whole chunk, then objects are created using
+    ``bulk_create``. ``objects_bulk_created`` is sent instead of
+    ``post_save`` so other applications can keep up.
+
+    Objects are created on behalf of a super administrator, so only
+    domain limits are checked.
+    """
+
+    # Minimum number of fields by alias type
+    alias_types = {"alias": 4, "forward": 4, "dlist": 5}
+
+    def __init__(self, user, options: dict):
+        if not user.is_superuser:
+            raise PermDeniedException
+        self.user = user
+        self.options = options
+
+    def supports(self, objtype: str) -> bool:
+        """Tell if objects of this type can be imported in bulk."""
+        return objtype in ["domain", "account"] or objtype in self.alias_types
+
+    def check_conflict(self, lineno: int, row: list):
+        """Raise Conflict unless existing objects must be skipped."""
+        if self.options["continue_if_exists"]:
+            return
+        raise Conflict(
+            _("Object already exists at line {}: {}").format(
+                lineno, self.options["sepchar"].join(row[:2])
+            )
+        )
+
+    def get_domains(self, names, **annotations) -> dict:
+        """Return existing domains indexed by name."""
+        qset = models.Domain.objects.filter(name__in=names).annotate(**annotations)
+        return {domain.name: domain for domain in qset}
+
+    def check_domain_limits(self, objects: list, object_type: str):
+        """Check domain limits for new objects."""
+        counter = collections.Counter(obj.domain for obj in objects)
+        for domain, count in counter.items():
+            core_signals.can_create_object.send(
+                sender=self.__class__,
+                context=domain,
+                object_type=object_type,
+                count=count,
+            )
+
+    def get_domain_admins(self, objects: list) -> list:
+        """Return administrators of the domains objects belong to.
+
+        :return: a list of (admins, objects) tuples
+        """
+        objects_by_domain = collections.defaultdict(list)
+        for obj in objects:
+            objects_by_domain[obj.domain].append(obj)
+        result = []
+        for domain, domain_objects in objects_by_domain.items():
+            admins = list(domain.admins)
+            if admins:
+                result.append((admins, domain_objects))
+        return result
+
+    @transaction.atomic
+    def import_rows(self, rows: list):
+        """Import a chunk of rows.
+
+        Domains are created first, then accounts and aliases.
+
+        :param list rows: (line number, row) tuples
+        """
+        rows_by_type = collections.defaultdict(list)
+        for lineno, row in rows:
+            rows_by_type[row[0].strip()].append((lineno, row))
+        self.import_domains(rows_by_type["domain"])
+        self.import_accounts(rows_by_type["account"])
+        self.import_aliases(
+            [item for objtype in self.alias_types for item in rows_by_type[objtype]]
+        )
+
+    def import_domains(self, rows: list):
+        """Import domains.
+
+        See :meth:`Domain.from_csv` for the expected format.
+        """
+        entries = {}
+        for lineno, row in rows:
+            domain = models.Domain()
+            domain.load_csv_row(row)
+            if domain.name in entries:
+                self.check_conflict(lineno, row)
+                continue
+            entries[domain.name] = (lineno, row, domain)
+        existing = self.get_domains(entries)
+        domains = []
+        for name, (lineno, row, domain) in entries.items():
+            if name in existing:
+                self.check_conflict(lineno, row)
+                continue
+            domains.append(domain)
+        if not domains:
+            return
+        bulk_insert(models.Domain, domains, "name")
+        core_signals.objects_bulk_created.send(sender=models.Domain, objects=domains)
+        permissions.grant_ownership_of_objects(
+            self.user, domains, ContentType.objects.get_for_model(models.Domain)
+        )
+
+    def import_accounts(self, rows: list):
+        """Import accounts and their mailboxes.
+
+        See :meth:`User.from_csv` and
+        :func:`modoboa.admin.handlers.import_account_mailbox` for the
+        expected format.
+        """
+        entries = {}
+        for lineno, row in rows:
+            if len(row) < 7:
+                raise BadRequest(_("Invalid line"))
+            username = row[1].strip().lower()
+            if username in entries:
+                self.check_conflict(lineno, row)
+                continue
+            entries[username] = (lineno, row)
+        existing = set(
+            core_models.User.objects.filter(username__in=entries).values_list(
+                "username", flat=True
+            )
+        )
+        emails = {
+            username: split_mailbox(row[7].strip().lower())
+            for username, (_lineno, row) in entries.items()
+            if len(row) > 7 and row[7].strip()
+        }
+        domains = self.get_domains(
+            {domname for _local_part, domname in emails.values()},
+            annotated_allocated_quota=Coalesce(Sum("mailbox__quota"), 0),
+        )
+        addresses = set(
+            models.Mailbox.objects.filter(
+                domain__in=domains.values(),
+                address__in=[local_part for local_part, _domname in emails.values()],
+            ).values_list("address", "domain__name")
+        )
+        accounts = []
+        mailboxes = []
+        for username, (lineno, row) in entries.items():
+            email = emails.get(username)
+            if username in existing or email in addresses:
+                self.check_conflict(lineno, row)
+                continue
+            account = core_models.User()
+            account.load_csv_row(row, self.options["crypt_passwords"])
+            if email is not None:
+                account.email = row[7].strip().lower()
+                mailboxes.append(self.load_mailbox(account, row, domains))
+                addresses.add(email)
+            accounts.append((account, row))
+        if not accounts:
+            return
+        self.check_domain_limits(mailboxes, "mailboxes")
+        self.create_accounts(accounts)
+        self.create_mailboxes(mailboxes)
+        for account, row in accounts:
+            if account.role != "DomainAdmins" or len(row) < 8:
+                continue
+            for domname in row[9:]:
+                domain = models.Domain.objects.filter(name=domname.strip()).first()
+                if domain is not None:
+                    domain.add_admin(account)
+
+    def load_mailbox(self, account, row: list, domains: dict):
+        """Return a new mailbox for account."""
+        local_part, domname = split_mailbox(account.email)
+        domain = domains.get(domname)
+        if domain is None:
+            raise BadRequest(
+                _("Account import failed (%s): domain does not exist")
+                % account.username
+            )
+        if len(row) == 8:
+            quota = None
+        else:
+            try:
+                quota = int(row[8].strip())
+            except ValueError:
+                raise BadRequest(
+                    _("Account import failed (%s): wrong quota value")
+                    % account.username
+                ) from None
+        mb = models.Mailbox(
+            address=local_part,
+            domain=domain,
+            user=account,
+            use_domain_quota=not quota,
+        )
+        mb.set_quota(quota, override_rules=True)
+        # Next mailboxes of this chunk must see this allocation
+        domain.annotated_allocated_quota += mb.quota
+        vars(domain).pop("allocated_quota", None)
+        return mb
+
+    def create_accounts(self, accounts: list):
+        """Create accounts and set their role."""
+        users = [account for account, _row in accounts]
+        bulk_insert(core_models.User, users, "username")
+        core_signals.objects_bulk_created.send(sender=core_models.User, objects=users)
+        group = Group.objects.get(name="SimpleUsers")
+        memberships = []
+        for account, row in accounts:
+            role = row[6].strip()
+            if role != "SimpleUsers":
+                account.role = role
+                continue
+            account._role = role
+            memberships.append(
+                core_models.User.groups.through(user_id=account.pk, group_id=group.pk)
+            )
+        core_models.User.groups.through.objects.bulk_create(memberships)
+        permissions.grant_ownership_of_objects(
+            self.user, users, ContentType.objects.get_for_model(core_models.User)
+        )
+
+    def create_mailboxes(self, mailboxes: list):
+        """Create mailboxes and their quota records."""
+        if not mailboxes:
+            return
+        models.Quota.objects.bulk_create(
+            [models.Quota(username=mb.full_address) for mb in mailboxes],
+            ignore_conflicts=True,
+        )
+        bulk_insert(models.Mailbox, mailboxes, "user_id")
+        core_signals.objects_bulk_created.send(sender=models.Mailbox, objects=mailboxes)
+        mailbox_ct = ContentType.objects.get_for_model(models.Mailbox)
+        permissions.grant_ownership_of_objects(self.user, mailboxes, mailbox_ct)
+        # Accounts with a role allowing to create domains are not
+        # managed by domain administrators
+        managed = [
+            mb
+            for mb in mailboxes
+            if mb.user.role == "SimpleUsers"
+            or not mb.user.has_perm("admin.add_domain")
+        ]
+        user_ct = ContentType.objects.get_for_model(core_models.User)
+        for admins, domain_mailboxes in self.get_domain_admins(managed):
+            permissions.grant_access_to_objects_for_users(
+                admins, domain_mailboxes, mailbox_ct
+            )
+            permissions.grant_access_to_objects_for_users(
+                admins, [mb.user for mb in domain_mailboxes], user_ct
+            )
+
+    def import_aliases(self, rows: list):
+        """Import aliases, forwards and distribution lists.
+
+        See :meth:`Alias.from_csv` for the expected format.
+        """
+        for _lineno, row in rows:
+            if len(row) < self.alias_types[row[0].strip()]:
+                raise BadRequest(_("Invalid line: {}").format(row))
+        entries = [
+            (lineno, row, row[1].strip().lower(), [rcpt.strip() for rcpt in row[3:]])
+            for lineno, row in rows
+        ]
+        domains = self.get_domains(
+            {split_mailbox(address)[1] for _lineno, _row, address, _rcpts in entries}
+        )
+        existing = {
+            alias.address: alias
+            for alias in models.Alias.objects.filter(
+                address__in=[entry[2] for entry in entries], internal=False
+            )
+        }
+        aliases = []
+        recipients = []
+        for lineno, row, address, addresses in entries:
+            domain = domains.get(split_mailbox(address)[1])
+            if domain is None:
+                raise ValidationError(_("Domain not found."))
+            if address in existing:
+                # Existing aliases get new recipients (like Alias.from_csv does)
+                self.check_conflict(lineno, row)
+            else:
+                existing[address] = models.Alias(
+                    address=address,
+                    domain=domain,
+                    enabled=row[2].strip().lower() in TRUE_VALUES,
+                )
+                aliases.append(existing[address])
+            recipients.append((existing[address], addresses))
+        self.check_domain_limits(aliases, "mailbox_aliases")
+        if aliases:
+            bulk_insert(models.Alias, aliases, "address", internal=False)
+            core_signals.objects_bulk_created.send(
+                sender=models.Alias, objects=aliases
+            )
+            alias_ct = ContentType.objects.get_for_model(models.Alias)
+            permissions.grant_ownership_of_objects(self.user, aliases, alias_ct)
+            for admins, domain_aliases in self.get_domain_admins(aliases):
+                permissions.grant_access_to_objects_for_users(
+                    admins, domain_aliases, alias_ct
+                )
+        # Recipients are resolved once all aliases of the chunk exist
+        for alias, addresses in recipients:
+            alias.add_recipients(addresses)
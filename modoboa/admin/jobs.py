@@ -4,14 +4,16 @@ import logging
 import os
 import shutil
 
+from django.conf import settings
 from django.db.models import F
 from django.utils import timezone
 
 import django_rq
 
-from modoboa.admin import models
+from modoboa.admin import constants, models
 from modoboa.admin.app_settings import load_admin_settings
 from modoboa.admin.dns_checker import DNSChecker
+from modoboa.lib import dns_cache
 from modoboa.lib.sysutils import exec_cmd
 from modoboa.parameters import tools as param_tools
 
@@ -69,20 +71,39 @@ def handle_mailbox_operations():
             delete_mailbox(ope)
 
 
+def launch_domains_dns_checks(domain_ids: list[int]):
+    """Run DNS checks for a batch of domains."""
+    domains = list(models.Domain.objects.filter(id__in=domain_ids))
+    DNSChecker().run_many(domains)
+    models.Domain.objects.filter(id__in=[domain.id for domain in domains]).update(
+        last_dns_check_execution=timezone.now()
+    )
+    logger.info(
+        "DNS cache statistics: %(hits)d hit(s), %(misses)d miss(es)",
+        dns_cache.get_stats(),
+    )
+
+
 def launch_domain_dns_checks(domain_id: int):
-    domain = models.Domain.objects.get(id=domain_id)
-    DNSChecker().run(domain)
-    domain.last_dns_check_execution = timezone.now()
-    domain.save()
+    launch_domains_dns_checks([domain_id])
 
 
 def handle_dns_checks():
-    """Launch DNS checks for every possible domain."""
+    """Launch DNS checks for every possible domain.
+
+    Domains are grouped in batches, one job being enqueued per batch.
+    """
     minute = timezone.now().minute
     queue = django_rq.get_queue("modoboa")
-    for domain in models.Domain.objects.annotate(slot=F("id") % 60).filter(
-        enable_dns_checks=True, slot=minute
-    ):
-        if domain.uses_a_reserved_tld:
-            continue
-        queue.enqueue(launch_domain_dns_checks, domain.id)
+    domain_ids = [
+        domain.id
+        for domain in models.Domain.objects.annotate(slot=F("id") % 60).filter(
+            enable_dns_checks=True, slot=minute
+        )
+        if not domain.uses_a_reserved_tld
+    ]
+    batch_size = getattr(
+        settings, "DNS_CHECKS_BATCH_SIZE", constants.DNS_CHECKS_BATCH_SIZE
+    )
+    for pos in range(0, len(domain_ids), batch_size):
+        queue.enqueue(launch_domains_dns_checks, domain_ids[pos : pos + batch_size])
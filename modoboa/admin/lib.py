@@ -24,6 +24,7 @@ from reversion import revisions as reversion
 
 from modoboa.core import signals as core_signals
 from modoboa.core.models import User
+from modoboa.lib import dns_cache
 from modoboa.lib.exceptions import Conflict, ModoboaException, PermDeniedException
 from modoboa.parameters import tools as param_tools
 
@@ -164,14 +165,21 @@ def import_dlist(user, row, formopts):
     _import_alias(user, row, formopts=formopts)
 
 
-def get_dns_resolver():
-    """Return a DNS resolver object."""
+def get_dns_resolver(lifetime: float | None = None):
+    """Return a DNS resolver object.
+
+    :param lifetime: optional timeout (in seconds) applied to each query
+    """
     dns_server = param_tools.get_global_parameter("custom_dns_server")
     if dns_server:
-        resolver = dns.resolver.Resolver()
+        resolver = dns.resolver.Resolver(configure=False)
         resolver.nameservers = [dns_server]
+    elif lifetime is not None:
+        resolver = dns.resolver.Resolver()
     else:
         resolver = dns.resolver
+    if lifetime is not None:
+        resolver.lifetime = lifetime
     return resolver
 
 
@@ -183,7 +191,7 @@ def get_authoritative_server(domain, resolver=None):
 
     while True:
         try:
-            answers = resolver.resolve(dnsname, "NS")
+            answers = dns_cache.resolve(resolver, dnsname, "NS")
             if answers:
                 first_answer = answers[0]
                 if hasattr(first_answer, "target"):
@@ -200,7 +208,7 @@ def get_authoritative_ip(domain, resolver=None):
     dnsserver_name = get_authoritative_server(domain, resolver=resolver)
     if not resolver:
         resolver = get_dns_resolver()
-    answer = resolver.resolve(dnsserver_name)
+    answer = dns_cache.resolve(resolver, dnsserver_name)
     if answer:
         return answer[0].address
     return None
@@ -209,8 +217,11 @@ def get_authoritative_ip(domain, resolver=None):
 def get_authoritative_resolver(domain, resolver=None):
     dnsserver_ip = get_authoritative_ip(domain, resolver=resolver)
     if dnsserver_ip:
+        lifetime = getattr(resolver, "lifetime", None)
         resolver = dns.resolver.Resolver()
         resolver.nameservers = [dnsserver_ip]
+        if lifetime is not None:
+            resolver.lifetime = lifetime
     else:
         resolver = get_dns_resolver()
     return resolver
@@ -222,7 +233,7 @@ def get_dns_records(name, typ, resolver=None):
 
     try:
         resolver = get_authoritative_resolver(name, resolver=resolver)
-        dns_answers = resolver.resolve(name, typ, search=True)
+        dns_answers = dns_cache.resolve(resolver, name, typ, search=True)
     except dns.resolver.NXDOMAIN as e:
         logger.error(_("No DNS record found for %s") % name, exc_info=e)
     except dns.resolver.NoAnswer as e:
@@ -244,11 +255,18 @@ def get_dns_records(name, typ, resolver=None):
     return None
 
 
-def get_domain_mx_list(domain):
-    """Return a list of MX IP address for domain."""
+def get_domain_mx_list(domain, resolver=None, ipv6: bool | None = None):
+    """Return a list of MX IP address for domain.
+
+    :param resolver: the resolver to use (default one if not specified)
+    :param ipv6: also look for AAAA records (global setting if not specified)
+    """
     result = []
     logger = logging.getLogger("modoboa.dns")
-    resolver = get_dns_resolver()
+    if resolver is None:
+        resolver = get_dns_resolver()
+    if ipv6 is None:
+        ipv6 = param_tools.get_global_parameter("enable_ipv6_mx_checks", app="admin")
     dns_answers = get_dns_records(domain, "MX", resolver)
     if dns_answers is None:
         return result
@@ -257,7 +275,7 @@ def get_domain_mx_list(domain):
             omit_final_dot=True, idna_codec=IDNA_2008_UTS_46
         )
         rtypes = ["A"]
-        if param_tools.get_global_parameter("enable_ipv6_mx_checks", app="admin"):
+        if ipv6:
             rtypes.append("AAAA")
         for rtype in rtypes:
             ip_answers = get_dns_records(mx_domain, rtype, resolver)
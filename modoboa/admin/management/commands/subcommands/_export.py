@@ -6,9 +6,8 @@ from django.core.management.base import BaseCommand
 from django.utils.encoding import smart_str
 
 from modoboa.core.extensions import exts_pool
-from modoboa.core.models import User
 from modoboa.lib.csvutils import SafeCSVWriter
-from .... import models
+from .... import exporter, models
 
 
 class ExportCommand(BaseCommand):
@@ -34,32 +33,11 @@ class ExportCommand(BaseCommand):
 
     def export_domains(self):
         """Export all domains."""
-        for dom in models.Domain.objects.all():
-            dom.to_csv(self.csvwriter)
+        self.csvwriter.writerows(exporter.get_domain_rows(models.Domain.objects.all()))
 
     def export_identities(self):
         """Export all identities."""
-        for u in User.objects.all():
-            u.to_csv(self.csvwriter)
-        dumped_aliases = []
-        # Export aliases pointing to mailboxes first
-        qset = (
-            models.Alias.objects.filter(internal=False)
-            .exclude(alias_recipient_aliases=None)
-            .distinct()
-            .prefetch_related("aliasrecipient_set")
-        )
-        for alias in qset:
-            alias.to_csv(self.csvwriter)
-            dumped_aliases += [alias.pk]
-        # Then export the rest
-        qset = (
-            models.Alias.objects.filter(internal=False)
-            .exclude(pk__in=dumped_aliases)
-            .prefetch_related("aliasrecipient_set")
-        )
-        for alias in qset:
-            alias.to_csv(self.csvwriter)
+        self.csvwriter.writerows(exporter.get_identity_rows())
 
     def handle(self, *args, **options):
         exts_pool.load_all()
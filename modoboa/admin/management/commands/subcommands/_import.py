@@ -13,7 +13,8 @@ from django.utils.translation import gettext as _
 from modoboa.core import models as core_models
 from modoboa.core.extensions import exts_pool
 from modoboa.lib.exceptions import Conflict
-from .... import signals
+from .... import constants, signals
+from ....importer import BulkImporter
 
 
 class ImportCommand(BaseCommand):
@@ -40,44 +41,87 @@ class ImportCommand(BaseCommand):
             default=False,
             help="Encrypt provided passwords.",
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            default=False,
+            help=(
+                "Import domains, accounts and aliases by chunks using bulk "
+                "queries (faster for large files)."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=constants.IMPORT_CHUNK_SIZE,
+            help="Number of rows imported at once in bulk mode.",
+        )
         parser.add_argument("files", type=str, nargs="+", help="CSV files to import.")
 
+    def _read_lines(self, fp, pbar, encoding):
+        """Iterate over file lines and report progress."""
+        position = 0
+        for line in fp:
+            position += len(line.encode(encoding))
+            pbar.update(min(position, pbar.maxval))
+            yield line
+
+    def _import_row(self, user, row, options, lineno):
+        """Import a single row using the function registered for its type."""
+        fct = signals.import_object.send(sender=self.__class__, objtype=row[0].strip())
+        fct = [func for x_, func in fct if func is not None]
+        if not fct:
+            return
+        try:
+            fct[0](user, row, options)
+        except Conflict:
+            if options["continue_if_exists"]:
+                return
+            raise CommandError(
+                "Object already exists at line {}: {}".format(
+                    lineno, options["sepchar"].join(row[:2])
+                )
+            ) from None
+
+    def _import_chunk(self, importer, chunk):
+        """Import rows using bulk queries."""
+        try:
+            importer.import_rows(chunk)
+        except Conflict as exc:
+            raise CommandError(str(exc)) from None
+        chunk.clear()
+
     def _import(self, filename, options, encoding="utf-8"):
         """Import domains or identities."""
         superadmin = core_models.User.objects.filter(is_superuser=True).first()
         if not os.path.isfile(filename):
             raise CommandError("File not found")
 
-        num_lines = sum(1 for line in open(filename, encoding=encoding) if line)
+        # Progress is measured in bytes so the file is only read once
         pbar = progressbar.ProgressBar(
             widgets=[progressbar.Percentage(), progressbar.Bar(), progressbar.ETA()],
-            maxval=num_lines,
+            maxval=max(os.path.getsize(filename), 1),
         ).start()
+        importer = BulkImporter(superadmin, options) if options["bulk"] else None
+        chunk = []
         with open(filename, encoding=encoding, newline="") as f:
-            reader = csv.reader(f, delimiter=options["sepchar"])
-            i = 0
+            reader = csv.reader(
+                self._read_lines(f, pbar, encoding), delimiter=options["sepchar"]
+            )
             for row in reader:
                 if not row:
                     continue
-                fct = signals.import_object.send(
-                    sender=self.__class__, objtype=row[0].strip()
-                )
-                fct = [func for x_, func in fct if func is not None]
-                if not fct:
+                if importer and importer.supports(row[0].strip()):
+                    chunk.append((reader.line_num, row))
+                    if len(chunk) >= options["chunk_size"]:
+                        self._import_chunk(importer, chunk)
                     continue
-                fct = fct[0]
-                try:
-                    fct(superadmin, row, options)
-                except Conflict:
-                    if options["continue_if_exists"]:
-                        continue
-                    raise CommandError(
-                        "Object already exists at line {}: {}".format(
-                            i + 1, options["sepchar"].join(row[:2])
-                        )
-                    ) from None
-                i += 1
-                pbar.update(i)
+                if chunk:
+                    # Keep rows order: pending ones might be required
+                    self._import_chunk(importer, chunk)
+                self._import_row(superadmin, row, options, reader.line_num)
+            if chunk:
+                self._import_chunk(importer, chunk)
 
         pbar.finish()
 
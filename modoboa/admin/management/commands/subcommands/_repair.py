@@ -1,13 +1,21 @@
 """Management command to check and fix known problems."""
 
+import collections
+import itertools
+import time
+
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, Min, OuterRef, Value
+from django.db.models.functions import Concat
 from django.utils.encoding import smart_str
 
 
-from modoboa.admin import models
-from modoboa.core.models import User
-from modoboa.lib.permissions import get_object_owner, grant_access_to_object
+from modoboa.admin import constants, models
+from modoboa.core.models import ObjectAccess, User
+from modoboa.lib.permissions import grant_ownership_of_objects
 
 known_problems = []
 
@@ -23,30 +31,94 @@ def log(message, quiet=False, **options):
         print(message)
 
 
+def get_domain_field(model) -> str | None:
+    """Return the field giving the domain objects of model belong to."""
+    if model is User:
+        return None
+    if model is models.Domain:
+        return "pk"
+    if model is models.DomainAlias:
+        return "target_id"
+    return "domain_id"
+
+
+def get_new_owners(model, objects: list, fallback) -> dict:
+    """Return the new owner of each object, indexed by object id.
+
+    Objects bound to a domain are given to one of its administrators,
+    other objects to the fallback user.
+    """
+    field = get_domain_field(model)
+    if field is None:
+        return {obj.pk: fallback for obj in objects}
+    domain_ids = {getattr(obj, field) for obj in objects}
+    admin_ids = dict(
+        ObjectAccess.objects.filter(
+            content_type=ContentType.objects.get_for_model(models.Domain),
+            object_id__in=domain_ids,
+            user__is_superuser=False,
+        )
+        .order_by()
+        .values("object_id")
+        .annotate(admin_id=Min("user"))
+        .values_list("object_id", "admin_id")
+    )
+    admins = User.objects.in_bulk(admin_ids.values())
+    return {
+        obj.pk: admins.get(admin_ids.get(getattr(obj, field)), fallback)
+        for obj in objects
+    }
+
+
+def give_ownership(admin, objects: list, ct, superusers: list):
+    """Make admin the owner of objects which have no owner."""
+    # Existing entries are replaced so the limits counters see the
+    # new owner
+    ObjectAccess.objects.filter(
+        user=admin, content_type=ct, object_id__in=[obj.pk for obj in objects]
+    ).delete()
+    grant_ownership_of_objects(admin, objects, ct, superusers)
+
+
 def fix_owner(qs, dry_run=False, **options):
     """Fix ownership for orphan objects."""
     model = qs.model
-    for obj in qs:
-        kw = {"cls": model.__name__, "obj": obj}
-        if get_object_owner(obj) is not None:
-            continue
+    ct = ContentType.objects.get_for_model(model)
+    orphans = qs.filter(
+        ~Exists(
+            ObjectAccess.objects.filter(
+                content_type=ct, object_id=OuterRef("pk"), is_owner=True
+            )
+        )
+    ).order_by("pk")
+    superusers = list(User.objects.filter(is_superuser=True))
+    fallback = next((user for user in superusers if user.is_active), None)
+    counter = collections.Counter()
+    objects = orphans.iterator(chunk_size=constants.REPAIR_CHUNK_SIZE)
+    while chunk := list(itertools.islice(objects, constants.REPAIR_CHUNK_SIZE)):
         if dry_run:
-            log("  {cls} {obj} has no owner".format(**kw), **options)
+            for obj in chunk:
+                log(f"  {model.__name__} {obj} has no owner", **options)
+            counter[None] += len(chunk)
             continue
-        if isinstance(obj, User):
-            admin = User.objects.filter(is_superuser=True, is_active=True).first()
-        elif isinstance(obj, models.Domain):
-            admin = obj.admins.first()
-        elif isinstance(obj, models.DomainAlias):
-            admin = obj.target.admins.first()
+        objects_by_owner = collections.defaultdict(list)
+        for obj_id, admin in get_new_owners(model, chunk, fallback).items():
+            objects_by_owner[admin].append(obj_id)
+        chunk = {obj.pk: obj for obj in chunk}
+        with transaction.atomic():
+            for admin, obj_ids in objects_by_owner.items():
+                give_ownership(
+                    admin, [chunk[obj_id] for obj_id in obj_ids], ct, superusers
+                )
+                counter[admin] += len(obj_ids)
+    for admin, total in counter.items():
+        if admin is None:
+            log(f"  {total} {model.__name__} object(s) without owner", **options)
         else:
-            admin = obj.domain.admins.first()
-        if not admin:
-            # Fallback: use the first superuser found
-            admin = User.objects.filter(is_superuser=True, is_active=True).first()
-        grant_access_to_object(admin, obj, is_owner=True)
-        kw["admin"] = admin
-        log("  {cls} {obj} is now owned by {admin}".format(**kw), **options)
+            log(
+                f"  {total} {model.__name__} object(s) now owned by {admin}",
+                **options,
+            )
 
 
 @known_problem
@@ -57,18 +129,55 @@ def sometimes_objects_have_no_owner(**options):
         models.Domain.objects.all(),
         models.DomainAlias.objects.all(),
         models.Alias.objects.filter(internal=False, domain__isnull=False),
-        models.Mailbox.objects.filter(domain__isnull=False),
+        models.Mailbox.objects.filter(domain__isnull=False).select_related("domain"),
     )
     for qs in owned_models:
         fix_owner(qs, **options)
 
 
 @known_problem
-def sometimes_mailbox_have_no_alias(**options):
+def sometimes_accesses_target_deleted_objects(dry_run=False, **options):
+    """Sometime object accesses target deleted objects."""
+    content_types = ContentType.objects.filter(
+        pk__in=ObjectAccess.objects.values("content_type")
+    )
+    for ct in content_types:
+        model = ct.model_class()
+        qset = ObjectAccess.objects.filter(content_type=ct)
+        if model is not None:
+            qset = qset.filter(
+                ~Exists(model._default_manager.filter(pk=OuterRef("object_id")))
+            )
+        total = qset.count()
+        if not total:
+            continue
+        if dry_run:
+            log(f"  {total} access(es) to deleted {ct} objects", **options)
+            continue
+        qset.delete()
+        log(f"  {total} access(es) to deleted {ct} objects removed", **options)
+
+
+@known_problem
+def sometimes_mailbox_have_no_alias(dry_run=False, **options):
     """Sometime mailboxes have no alias."""
+    full_address = Concat(OuterRef("address"), Value("@"), OuterRef("domain__name"))
+    mailboxes = models.Mailbox.objects.select_related("domain").filter(
+        ~Exists(
+            models.AliasRecipient.objects.filter(
+                r_mailbox=OuterRef("pk"),
+                address=full_address,
+                alias__address=full_address,
+                alias__internal=True,
+            )
+        )
+    )
     alias_created = 0
     recipient_created = 0
-    for instance in models.Mailbox.objects.select_related("domain").all():
+    for instance in mailboxes:
+        if dry_run:
+            log(f"  Mailbox {instance} has no alias", **options)
+            continue
         alias, created = models.Alias.objects.get_or_create(
             address=instance.full_address, domain=instance.domain, internal=True
         )
@@ -117,4 +226,6 @@ class Repair(BaseCommand):
             title = func.__doc__.strip()
             log("", **options)
             log(f"Checking for... {title}...", **options)
+            start = time.monotonic()
             func(**options)
+            log(f"Done in {time.monotonic() - start:.2f}s", **options)
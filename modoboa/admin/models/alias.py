@@ -190,47 +190,88 @@ class Alias(AdminObject):
           (when a forward is defined) and to create exceptions when a catchall
           is defined on the associated domain
 
+        Domains, mailboxes and aliases are fetched using a few queries,
+        whatever the number of addresses, and recipients are created in
+        bulk.
         """
-        for address in set(address_list):
-            if not address:
-                continue
-            if self.aliasrecipient_set.filter(address=address).exists():
+        addresses = [address for address in set(address_list) if address]
+        existing = set(
+            self.aliasrecipient_set.filter(address__in=addresses).values_list(
+                "address", flat=True
+            )
+        )
+        parsed = []
+        for address in addresses:
+            if address in existing:
                 continue
             local_part, domname, extension = split_mailbox(
                 address, return_extension=True
             )
-            if domname is None:
-                raise BadRequest("{} {}".format(_("Invalid address"), address))
-            domain = Domain.objects.filter(name=domname).first()
-            if not domain and not is_alias_target_allowed(domname):
-                raise BadRequest(f"{_('Target domain not allowed')}: {domname}")
-            kwargs = {"address": address, "alias": self}
-            if (domain is not None) and (
-                any(
-                    r[1]
-                    for r in signals.use_external_recipients.send(
-                        self, recipients=address
+            parsed.append((address, local_part, domname))
+        domnames = {domname for address, local_part, domname in parsed if domname}
+        domains = {
+            domain.name: domain for domain in Domain.objects.filter(name__in=domnames)
+        }
+        mailboxes = {
+            (mailbox.domain_id, mailbox.address): mailbox
+            for mailbox in Mailbox.objects.filter(
+                domain__in=domains.values(),
+                address__in={local_part for address, local_part, domname in parsed},
+            )
+        }
+        aliases = {}
+        for alias in Alias.objects.filter(
+            address__in={
+                f"{local_part}@{domname}"
+                for address, local_part, domname in parsed
+                if domname in domains
+            }
+        ).order_by("address", "pk"):
+            aliases.setdefault(alias.address, alias)
+        allowed_targets = {}
+        recipients = []
+        try:
+            for address, local_part, domname in parsed:
+                if domname is None:
+                    raise BadRequest("{} {}".format(_("Invalid address"), address))
+                domain = domains.get(domname)
+                if not domain:
+                    if domname not in allowed_targets:
+                        allowed_targets[domname] = is_alias_target_allowed(domname)
+                    if not allowed_targets[domname]:
+                        raise BadRequest(f"{_('Target domain not allowed')}: {domname}")
+                kwargs = {"address": address, "alias": self}
+                if (domain is not None) and (
+                    any(
+                        r[1]
+                        for r in signals.use_external_recipients.send(
+                            self, recipients=address, domain=domain
+                        )
                     )
-                )
-                is False
-            ):
-                rcpt = Mailbox.objects.filter(domain=domain, address=local_part).first()
-                if rcpt is None:
-                    rcpt = Alias.objects.filter(
-                        address=f"{local_part}@{domname}"
-                    ).first()
+                    is False
+                ):
+                    rcpt = mailboxes.get((domain.pk, local_part))
                     if rcpt is None:
-                        raise NotFound(
-                            _("Local recipient {}@{} not found").format(
-                                local_part, domname
+                        rcpt = aliases.get(f"{local_part}@{domname}")
+                        if rcpt is None:
+                            raise NotFound(
+                                _("Local recipient {}@{} not found").format(
+                                    local_part, domname
+                                )
                             )
-                        )
-                    if rcpt.address == self.address:
-                        raise Conflict
-                    kwargs["r_alias"] = rcpt
-                else:
-                    kwargs["r_mailbox"] = rcpt
-            AliasRecipient(**kwargs).save()
+                        if rcpt.address == self.address:
+                            raise Conflict
+                        kwargs["r_alias"] = rcpt
+                    else:
+                        kwargs["r_mailbox"] = rcpt
+                recipients.append(AliasRecipient(**kwargs))
+        finally:
+            # Recipients checked before an error are kept, as they
+            # used to be saved one at a time.
+            AliasRecipient.objects.bulk_create(recipients)
+            core_signals.objects_bulk_created.send(
+                sender=AliasRecipient, objects=recipients
+            )
 
     def remove_recipient_or_delete(self, recipient_to_delete: str):
         """
@@ -258,6 +299,8 @@ class Alias(AdminObject):
     @property
     def recipients(self):
         """Return the recipient list."""
+        if "aliasrecipient_set" in getattr(self, "_prefetched_objects_cache", {}):
+            return sorted(rcpt.address for rcpt in self.aliasrecipient_set.all())
         return self.aliasrecipient_set.order_by("address").values_list(
             "address", flat=True
         )
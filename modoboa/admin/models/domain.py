@@ -4,9 +4,12 @@ import datetime
 
 from reversion import revisions as reversion
 
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.core.management import call_command
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.encoding import force_str, smart_str
 from django.utils.functional import cached_property
@@ -15,16 +18,81 @@ from django.utils.translation import gettext as _, gettext_lazy
 import django_rq
 
 from modoboa.core import signals as core_signals
-from modoboa.core.models import User
+from modoboa.core.models import ObjectAccess, User
 from modoboa.lib import validators
 from modoboa.lib.exceptions import BadRequest, Conflict
 from modoboa.parameters import tools as param_tools
 
 from .. import constants
-from .base import AdminObject
+from .base import AdminObject, AdminObjectManager
 from . import mixins
 
 
+def _subquery_aggregate(queryset, aggregate, field="domain"):
+    """Return a correlated subquery computing ``aggregate`` for a domain."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(field).annotate(total=aggregate).values("total")
+        ),
+        0,
+    )
+
+
+class DomainQuerySet(models.QuerySet):
+    """Custom queryset for Domain."""
+
+    def with_statistics(self):
+        """Compute counters and DNS status inputs in the same query.
+
+        Values are read back by the corresponding properties of
+        :class:`Domain`, which avoids a few queries per domain when
+        listing them.
+        """
+        from modoboa.dnstools.models import DNSRecord
+
+        from .alarm import Alarm
+        from .alias import Alias
+        from .domain_alias import DomainAlias
+        from .mailbox import Mailbox
+        from .mxrecord import DNSBLResult, MXRecord
+
+        domain = OuterRef("pk")
+        admins = ObjectAccess.objects.filter(
+            content_type__model="domain",
+            object_id=domain,
+            user__is_superuser=False,
+        )
+        return self.annotate(
+            annotated_mailbox_count=_subquery_aggregate(
+                Mailbox.objects.filter(domain=domain), models.Count("pk")
+            ),
+            annotated_mbalias_count=_subquery_aggregate(
+                Alias.objects.filter(domain=domain, internal=False),
+                models.Count("pk"),
+            ),
+            annotated_domainalias_count=_subquery_aggregate(
+                DomainAlias.objects.filter(target=domain),
+                models.Count("pk"),
+                field="target",
+            ),
+            annotated_allocated_quota=_subquery_aggregate(
+                Mailbox.objects.filter(domain=domain), models.Sum("quota")
+            ),
+            annotated_opened_alarms_count=_subquery_aggregate(
+                Alarm.objects.opened().filter(domain=domain), models.Count("pk")
+            ),
+            annotated_admins_count=_subquery_aggregate(
+                admins, models.Count("pk"), field="object_id"
+            ),
+            has_valid_mx=Exists(MXRecord.objects.filter(domain=domain).valids()),
+            is_blacklisted=Exists(
+                DNSBLResult.objects.filter(domain=domain).blacklisted()
+            ),
+        ).prefetch_related(
+            Prefetch("dnsrecord_set", queryset=DNSRecord.objects.order_by("pk"))
+        )
+
+
 class Domain(mixins.MessageLimitMixin, AdminObject):
     """Mail domain."""
 
@@ -81,6 +149,8 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
     dkim_public_key = models.TextField(blank=True)
     dkim_private_key_path = models.CharField(max_length=254, blank=True)
 
+    objects = AdminObjectManager.from_queryset(DomainQuerySet)()
+
     class Meta:
         ordering = ["name"]
         app_label = "admin"
@@ -94,24 +164,32 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
 
     @property
     def domainalias_count(self) -> int:
+        if hasattr(self, "annotated_domainalias_count"):
+            return self.annotated_domainalias_count
         return self.domainalias_set.count()
 
     @property
     def mailbox_count(self) -> int:
+        if hasattr(self, "annotated_mailbox_count"):
+            return self.annotated_mailbox_count
         return self.mailbox_set.count()
 
     @property
     def mbalias_count(self) -> int:
+        if hasattr(self, "annotated_mbalias_count"):
+            return self.annotated_mbalias_count
         return self.alias_set.filter(internal=False).count()
 
     @property
     def identities_count(self) -> int:
         """Total number of identities in this domain."""
-        return self.mailbox_set.count() + self.alias_set.filter(internal=False).count()
+        return self.mailbox_count + self.mbalias_count
 
     @property
     def opened_alarms_count(self) -> int:
         """Number of alarms currently opened for this domain."""
+        if hasattr(self, "annotated_opened_alarms_count"):
+            return self.annotated_opened_alarms_count
         return self.alarms.opened().count()
 
     @property
@@ -126,6 +204,13 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
             objectaccess__object_id=self.pk,
         )
 
+    @property
+    def admins_count(self) -> int:
+        """Number of administrators of this domain."""
+        if hasattr(self, "annotated_admins_count"):
+            return self.annotated_admins_count
+        return self.admins.count()
+
     @property
     def aliases(self):
         return self.domainalias_set
@@ -143,10 +228,20 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
         delta = datetime.timedelta(days=1)
         return self.creation + delta > now
 
+    def _has_valid_mx(self) -> bool:
+        if hasattr(self, "has_valid_mx"):
+            return self.has_valid_mx
+        return self.mxrecord_set.has_valids()
+
+    def _is_blacklisted(self) -> bool:
+        if hasattr(self, "is_blacklisted"):
+            return self.is_blacklisted
+        return self.dnsblresult_set.blacklisted().exists()
+
     def awaiting_checks(self):
         """Return true if the domain has no valid MX record and was created
         in the latest 24h."""
-        if (not self.mxrecord_set.has_valids()) and self.just_created:
+        if (not self._has_valid_mx()) and self.just_created:
             return True
         return False
 
@@ -159,12 +254,9 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
             return "pending"
         config = dict(param_tools.get_global_parameters("admin"))
         errors = []
-        if config["enable_mx_checks"] and not self.mxrecord_set.has_valids():
+        if config["enable_mx_checks"] and not self._has_valid_mx():
             errors.append("mx")
-        if (
-            config["enable_dnsbl_checks"]
-            and self.dnsblresult_set.blacklisted().exists()
-        ):
+        if config["enable_dnsbl_checks"] and self._is_blacklisted():
             errors.append("dnsbl")
         if config["enable_spf_checks"] and (
             self.spf_record is None or not self.spf_record.is_valid
@@ -188,36 +280,45 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
             return "ok"
         return "critical"
 
+    def _get_dns_record(self, rtype):
+        prefetched = getattr(self, "_prefetched_objects_cache", {})
+        if "dnsrecord_set" in prefetched:
+            records = prefetched["dnsrecord_set"]
+            return next((record for record in records if record.type == rtype), None)
+        return self.dnsrecord_set.filter(type=rtype).first()
+
     @property
     def spf_record(self):
         """Return SPF record."""
-        return self.dnsrecord_set.filter(type="spf").first()
+        return self._get_dns_record("spf")
 
     @property
     def dkim_record(self):
         """Return DKIM record."""
-        return self.dnsrecord_set.filter(type="dkim").first()
+        return self._get_dns_record("dkim")
 
     @property
     def dmarc_record(self):
         """Return DMARC record."""
-        return self.dnsrecord_set.filter(type="dmarc").first()
+        return self._get_dns_record("dmarc")
 
     @property
     def autoconfig_record(self):
         """Return autoconfig record."""
-        return self.dnsrecord_set.filter(type="autoconfig").first()
+        return self._get_dns_record("autoconfig")
 
     @property
     def autodiscover_record(self):
         """Return autodiscover record."""
-        return self.dnsrecord_set.filter(type="autodiscover").first()
+        return self._get_dns_record("autodiscover")
 
     @cached_property
     def allocated_quota(self) -> int:
         """Return current quota allocation."""
         if not self.quota:
             return 0
+        if hasattr(self, "annotated_allocated_quota"):
+            return self.annotated_allocated_quota
         if not self.mailbox_set.exists():
             return 0
         return self.mailbox_set.aggregate(total=models.Sum("quota"))["total"]
@@ -257,20 +358,36 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
 
         :param User account: the administrator
         """
-        from modoboa.lib.permissions import grant_access_to_object
+        from modoboa.lib.permissions import (
+            grant_access_to_object,
+            grant_access_to_objects,
+        )
 
         # Check if domain's limit for domain admins is not reached yet
         core_signals.can_create_object.send(
             sender=self.__class__, context=self, object_type="domain_admins"
         )
         grant_access_to_object(account, self)
-        for mb in self.mailbox_set.all():
-            if mb.user.has_perm("admin.add_domain"):
-                continue
-            grant_access_to_object(account, mb)
-            grant_access_to_object(account, mb.user)
-        for al in self.alias_set.filter(internal=False):
-            grant_access_to_object(account, al)
+        mailboxes = [
+            mb
+            for mb in self.mailbox_set.select_related("user")
+            if not mb.user.has_perm("admin.add_domain")
+        ]
+        grant_access_to_objects(
+            account,
+            mailboxes,
+            ContentType.objects.get_for_model(self.mailbox_set.model),
+        )
+        grant_access_to_objects(
+            account,
+            [mb.user for mb in mailboxes],
+            ContentType.objects.get_for_model(User),
+        )
+        grant_access_to_objects(
+            account,
+            self.alias_set.filter(internal=False),
+            ContentType.objects.get_for_model(self.alias_set.model),
+        )
 
     def remove_admin(self, account):
         """Remove an administrator of this domain.
@@ -334,6 +451,30 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
         """
         from .. import lib
 
+        self.load_csv_row(row)
+        if Domain.objects.filter(name=self.name).exists():
+            raise Conflict
+        domains_must_have_authorized_mx = param_tools.get_global_parameter(
+            "domains_must_have_authorized_mx"
+        )
+        if domains_must_have_authorized_mx and not user.is_superuser:
+            if not lib.domain_has_authorized_mx(self.name):
+                raise BadRequest(
+                    _("{}: no authorized MX record found for domain").format(self.name)
+                )
+        core_signals.can_create_object.send(
+            sender=self.__class__, context=user, klass=Domain, instance=self
+        )
+        self.save(creator=user)
+
+    def load_csv_row(self, row):
+        """Load domain's definition from a CSV entry.
+
+        Only the content of the row is validated here, see
+        :meth:`from_csv` for the expected order.
+
+        :param str row: a list containing domain's definition
+        """
         if len(row) < 5:
             raise BadRequest(_("Invalid line"))
         self.name = row[1].strip().lower()
@@ -345,16 +486,6 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
             validators.validate_hostname(self.name)
         except ValidationError:
             raise BadRequest(_("{}: invalid domain name").format(self.name)) from None
-        if Domain.objects.filter(name=self.name).exists():
-            raise Conflict
-        domains_must_have_authorized_mx = param_tools.get_global_parameter(
-            "domains_must_have_authorized_mx"
-        )
-        if domains_must_have_authorized_mx and not user.is_superuser:
-            if not lib.domain_has_authorized_mx(self.name):
-                raise BadRequest(
-                    _("{}: no authorized MX record found for domain").format(self.name)
-                )
         try:
             self.quota = int(row[2].strip())
         except ValueError:
@@ -376,10 +507,6 @@ class Domain(mixins.MessageLimitMixin, AdminObject):
                 ).format(self.name)
             )
         self.enabled = row[4].strip().lower() in ["true", "1", "yes", "y"]
-        core_signals.can_create_object.send(
-            sender=self.__class__, context=user, klass=Domain, instance=self
-        )
-        self.save(creator=user)
 
     def to_csv_rows(self):
         """Return a row to include in a CSV file."""
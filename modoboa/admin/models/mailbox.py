@@ -107,7 +107,8 @@ class Mailbox(mixins.MessageLimitMixin, AdminObject):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.__mail_home = None
-        self.old_full_address = self.full_address
+        # Resolved lazily so loading mailboxes does not fetch their domain
+        self.__old_address = (self.address, self.domain_id)
         self.old_message_limit = self.message_limit
 
     def __str__(self):
@@ -120,6 +121,15 @@ class Mailbox(mixins.MessageLimitMixin, AdminObject):
     def full_address(self):
         return self.__full_address(self.address)
 
+    @property
+    def old_full_address(self):
+        """Address of this mailbox when it was loaded."""
+        address, domain_id = self.__old_address
+        if domain_id == self.domain_id:
+            return self.__full_address(address)
+        domain = Domain.objects.get(pk=domain_id)
+        return f"{address}@{domain.name}"
+
     @property
     def enabled(self):
         return self.user.is_active
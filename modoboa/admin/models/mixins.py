@@ -2,7 +2,19 @@
 
 from typing import Optional
 
-from modoboa.policyd.utils import get_message_counter
+from modoboa.policyd.utils import get_message_counter, get_message_counters
+
+
+def fetch_message_counters(objects):
+    """Attach message counters to the given objects.
+
+    Counters of all objects are retrieved with a single Redis request
+    instead of one per object.
+    """
+    objects = [obj for obj in objects if obj.message_limit is not None]
+    counters = get_message_counters([obj.message_counter_key for obj in objects])
+    for obj, counter in zip(objects, counters):
+        obj._message_counter = counter
 
 
 class MessageLimitMixin:
@@ -17,7 +29,10 @@ class MessageLimitMixin:
         """Return number of sent messages for the current day."""
         if self.message_limit is None:
             return None
-        counter = get_message_counter(self.message_counter_key)
+        if hasattr(self, "_message_counter"):
+            counter = self._message_counter
+        else:
+            counter = get_message_counter(self.message_counter_key)
         if counter is None:
             return 0
         return self.message_limit - counter
@@ -11,12 +11,16 @@ from modoboa.parameters import tools as param_tools
 class MXRecordQuerySet(models.QuerySet):
     """Custom manager for MXRecord."""
 
-    def has_valids(self):
-        """Return managed results."""
+    def valids(self):
+        """Return valid records (managed ones if valid MXs are defined)."""
         valid_mxs = param_tools.get_global_parameter("valid_mxs")
         if valid_mxs and valid_mxs.strip():
-            return self.filter(managed=True).exists()
-        return self.exists()
+            return self.filter(managed=True)
+        return self
+
+    def has_valids(self):
+        """Return managed results."""
+        return self.valids().exists()
 
 
 class MXRecordManager(models.Manager):
@@ -36,20 +40,25 @@ class MXRecordManager(models.Manager):
                 yield record
             return
 
-        self.get_queryset().filter(domain=domain).delete()
-
-        delta = datetime.timedelta(seconds=ttl)
         domain_mxs = lib.get_domain_mx_list(domain.name)
-        if len(domain_mxs) == 0:
-            return
-        for mx_addr, mx_ip_addr in domain_mxs:
-            record = self.get_queryset().create(
+        yield from self.store_for_domain(domain, domain_mxs, ttl)
+
+    def store_for_domain(self, domain, domain_mxs, ttl=7200):
+        """Replace MX record(s) of given domain by already resolved ones.
+
+        :param domain_mxs: a list of (name, IP address) tuples
+        """
+        self.get_queryset().filter(domain=domain).delete()
+        updated = timezone.now() + datetime.timedelta(seconds=ttl)
+        return [
+            self.get_queryset().create(
                 domain=domain,
                 name="{}".format(mx_addr.strip(".")),
                 address=f"{mx_ip_addr}",
-                updated=now + delta,
+                updated=updated,
             )
-            yield record
+            for mx_addr, mx_ip_addr in domain_mxs
+        ]
 
 
 class MXRecord(models.Model):
@@ -5,7 +5,7 @@ import django.dispatch
 extra_domain_filters = django.dispatch.Signal()
 extra_domain_qset_filters = django.dispatch.Signal()  # Provides domfilter, extrafilters
 import_object = django.dispatch.Signal()  # Provides objtype
-use_external_recipients = django.dispatch.Signal()  # Provides recipients
+use_external_recipients = django.dispatch.Signal()  # Provides recipients, domain
 extra_account_identities_actions = django.dispatch.Signal()  # Provides account
 dkim_keys_created = django.dispatch.Signal()  # Provides domains
 # Receivers must return a dict of {field_name: serializer_field_instance}
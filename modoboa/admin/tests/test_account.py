@@ -1,12 +1,19 @@
 from unittest import skipIf
 import string
 
+from django.contrib.contenttypes.models import ContentType
 from django.test import override_settings
 from django.urls import reverse
 
 from modoboa.core import factories as core_factories
-from modoboa.core.models import User
+from modoboa.core.models import ObjectAccess, User
 from modoboa.core.tests import test_ldap
+from modoboa.lib.permissions import (
+    grant_access_to_object,
+    grant_access_to_objects,
+    ungrant_access_to_object,
+    ungrant_access_to_objects,
+)
 from modoboa.lib.tests import NO_LDAP, ModoAPITestCase
 from modoboa.limits import utils as limits_utils
 from .. import factories, models, lib
@@ -274,6 +281,79 @@ class PermissionsTestCase(ModoAPITestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json()["role"][0], "Invalid choice")
 
+    def test_can_access(self):
+        dadmin = User.objects.get(username="admin@test.com")
+        domain = models.Domain.objects.get(name="test.com")
+        mailbox = models.Mailbox.objects.select_related("user").get(
+            user__username="user@test.com"
+        )
+        other_domain = models.Domain.objects.get(name="test2.com")
+        # Reload to get a fresh instance without cached access
+        reseller = User.objects.get(pk=self.reseller.pk)
+        with self.assertNumQueries(1):
+            self.assertFalse(reseller.can_access(mailbox))
+            self.assertFalse(reseller.can_access(dadmin))
+            self.assertTrue(reseller.can_access(reseller))
+
+        grant_access_to_object(reseller, dadmin, is_owner=True)
+        grant_access_to_object(dadmin, mailbox, is_owner=True)
+        grant_access_to_object(reseller, other_domain)
+        with self.assertNumQueries(1):
+            self.assertTrue(reseller.can_access(dadmin))
+            self.assertTrue(reseller.can_access(mailbox))
+            self.assertTrue(reseller.can_access(other_domain))
+            # Domain admin has access but is not the owner
+            self.assertFalse(reseller.can_access(domain))
+            # Users are only reachable through direct access
+            self.assertFalse(reseller.can_access(mailbox.user))
+
+        ungrant_access_to_object(other_domain, reseller)
+        self.assertFalse(reseller.can_access(other_domain))
+
+    def test_grant_access_to_objects(self):
+        domain = models.Domain.objects.get(name="test.com")
+        for i in range(10):
+            factories.MailboxFactory(
+                domain=domain, address=f"user{i}", user__username=f"user{i}@test.com"
+            )
+        mailboxes = list(models.Mailbox.objects.filter(domain=domain))
+        ct = ContentType.objects.get_for_model(models.Mailbox)
+        grant_access_to_object(self.reseller, mailboxes[0], is_owner=True)
+        with self.assertNumQueries(1):
+            grant_access_to_objects(self.reseller, mailboxes, ct)
+        self.assertEqual(
+            ObjectAccess.objects.filter(user=self.reseller, content_type=ct).count(),
+            len(mailboxes),
+        )
+        # Existing entries are left untouched
+        self.assertTrue(
+            ObjectAccess.objects.get(
+                user=self.reseller, content_type=ct, object_id=mailboxes[0].pk
+            ).is_owner
+        )
+        self.assertTrue(self.reseller.can_access(mailboxes[-1]))
+
+        # Collect, delete and recount limits of the 2 owners once
+        with self.assertNumQueries(4):
+            ungrant_access_to_objects(mailboxes)
+        self.assertFalse(
+            ObjectAccess.objects.filter(
+                content_type=ct, object_id__in=[mb.pk for mb in mailboxes]
+            ).exists()
+        )
+
+    def test_add_admin(self):
+        domain = models.Domain.objects.get(name="test.com")
+        account = core_factories.UserFactory(
+            username="admin2@test.com", groups=("DomainAdmins",)
+        )
+        domain.add_admin(account)
+        mailbox = models.Mailbox.objects.get(user__username="user@test.com")
+        alias = models.Alias.objects.get(address="forward@test.com")
+        for obj in [domain, mailbox, mailbox.user, alias]:
+            self.assertTrue(account.can_access(obj))
+        self.assertIn(account, domain.admins)
+
     def test_domainadmin_deletes_superadmin(self):
         """Check domain admins restrictions about super admins
 
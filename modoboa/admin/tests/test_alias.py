@@ -1,11 +1,14 @@
 """Admin test cases."""
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from modoboa.core.models import User
+from modoboa.lib.exceptions import BadRequest, Conflict, NotFound
 from modoboa.lib.tests import ModoAPITestCase
 from .. import factories
-from ..models import Alias, AliasRecipient
+from ..models import Alias, AliasRecipient, Domain
 
 
 class AliasTestCase(ModoAPITestCase):
@@ -28,6 +31,58 @@ class AliasTestCase(ModoAPITestCase):
         alias = Alias.objects.get(address="badalias@test.com")
         self.assertEqual(alias.recipients_count, 1)
 
+    def test_add_recipients_query_count(self):
+        """Number of queries must not depend on the number of recipients."""
+        domain = Domain.objects.get(name="test.com")
+        for i in range(20):
+            factories.MailboxFactory(
+                address=f"list{i}",
+                domain=domain,
+                user__username=f"list{i}@test.com",
+                user__groups=("SimpleUsers",),
+            )
+
+        def add_recipients(address, count):
+            alias = factories.AliasFactory(address=address, domain=domain)
+            recipients = [f"list{i}@test.com" for i in range(count)]
+            recipients.append("forward@test.com")
+            with CaptureQueriesContext(connection) as ctx:
+                alias.add_recipients(recipients)
+            self.assertEqual(
+                sorted(alias.aliasrecipient_set.values_list("address", flat=True)),
+                sorted(recipients),
+            )
+            return len(ctx.captured_queries)
+
+        self.assertEqual(
+            add_recipients("small@test.com", 2), add_recipients("big@test.com", 20)
+        )
+        alias = Alias.objects.get(address="big@test.com")
+        self.assertEqual(
+            alias.aliasrecipient_set.get(address="forward@test.com").r_alias.address,
+            "forward@test.com",
+        )
+        self.assertEqual(
+            alias.aliasrecipient_set.get(address="list3@test.com").r_mailbox.address,
+            "list3",
+        )
+
+    def test_add_recipients_errors(self):
+        """Check errors raised when adding recipients."""
+        alias = Alias.objects.get(address="alias@test.com")
+        with self.assertRaises(BadRequest):
+            alias.add_recipients(["invalid"])
+        self.set_global_parameter("alias_target_block_list", "unknown.com")
+        with self.assertRaises(BadRequest):
+            alias.add_recipients(["user@unknown.com"])
+        with self.assertRaises(NotFound):
+            alias.add_recipients(["unknown@test.com"])
+        with self.assertRaises(Conflict):
+            alias.add_recipients(["alias+ext@test.com"])
+        # Known recipients are skipped
+        alias.add_recipients(["user@test.com", ""])
+        self.assertEqual(alias.aliasrecipient_set.count(), 1)
+
     def test_upper_case_alias(self):
         """Try to create an upper case alias."""
         user = User.objects.get(username="user@test.com")
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from unittest import mock
 
 import dns.resolver
@@ -6,16 +7,20 @@ import dns.resolver
 from django.core.files.base import ContentFile
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from django.contrib.auth import authenticate
 
+from modoboa.contacts.models import AddressBook
 from modoboa.core import factories as core_factories
 from modoboa.core.models import User
 from modoboa.lib.tests import ModoAPITestCase
+from modoboa.limits import utils as limits_utils
 from . import utils
 from .. import factories
-from ..models import Alias, Domain
+from ..models import Alias, Domain, Mailbox, Quota
 
 
 class ImportTestCase(ModoAPITestCase):
@@ -338,3 +343,99 @@ alias; alias1@test.com; True; user1@test.com
         call_command("modo", "import", "--crypt-passwords", test_file)
         user = User.objects.get(username="user1@test.com")
         self.assertIsNot(authenticate(username=user.username, password="toto"), None)
+
+    def _write_csv(self, content):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as fp:
+            fp.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_command_bulk(self):
+        test_file = self._write_csv(
+            """domain;bulk.com;0;0;True
+account;user1@bulk.com;toto;User;One;True;SimpleUsers;user1@bulk.com;0
+account;user2@test.com;toto;User;Two;False;SimpleUsers;user2@test.com;10
+account;admin@bulk.com;toto;Admin;Bulk;True;DomainAdmins;admin@bulk.com;0;bulk.com
+alias;alias1@bulk.com;True;user1@bulk.com;alias2@bulk.com
+alias;alias2@bulk.com;True;user2@test.com
+domainalias;bulk.alias;bulk.com;True
+"""
+        )
+        call_command(
+            "modo", "import", "--bulk", "--crypt-passwords", "--chunk-size=4", test_file
+        )
+        admin = User.objects.get(username="admin")
+        domain = Domain.objects.get(name="bulk.com")
+        self.assertTrue(admin.is_owner(domain))
+        self.assertTrue(domain.domainalias_set.filter(name="bulk.alias").exists())
+
+        user = User.objects.get(username="user1@bulk.com")
+        self.assertEqual(user.role, "SimpleUsers")
+        self.assertIsNot(authenticate(username=user.username, password="toto"), None)
+        self.assertTrue(admin.is_owner(user))
+        self.assertTrue(admin.is_owner(user.mailbox))
+        self.assertTrue(Quota.objects.filter(username="user1@bulk.com").exists())
+        self.assertTrue(AddressBook.objects.filter(user=user).exists())
+        self.assertTrue(
+            Alias.objects.filter(
+                address="user1@bulk.com",
+                internal=True,
+                aliasrecipient__r_mailbox=user.mailbox,
+            ).exists()
+        )
+
+        mb = Mailbox.objects.get(address="user2", domain__name="test.com")
+        self.assertEqual(mb.quota, 10)
+        self.assertFalse(Alias.objects.get(address="user2@test.com").enabled)
+        domain_admin = User.objects.get(username="admin@test.com")
+        self.assertTrue(domain_admin.can_access(mb))
+        self.assertTrue(domain_admin.can_access(mb.user))
+
+        domain_admin = User.objects.get(username="admin@bulk.com")
+        self.assertEqual(domain_admin.role, "DomainAdmins")
+        self.assertIn(domain_admin, domain.admins)
+        alias = Alias.objects.get(address="alias1@bulk.com")
+        self.assertTrue(domain_admin.can_access(alias))
+        self.assertEqual(
+            list(alias.recipients), ["alias2@bulk.com", "user1@bulk.com"]
+        )
+        # Limit counters must be up to date
+        self.assertEqual(limits_utils.recount_limits_usage(), (0, 0))
+
+    def test_import_command_bulk_duplicates(self):
+        test_file = self._write_csv(
+            """account;user3@test.com;toto;User;Three;True;SimpleUsers;user3@test.com;0
+account;user@test.com;toto;User;One;True;SimpleUsers;user@test.com;0
+alias;bulk@test.com;True;user3@test.com
+"""
+        )
+        with self.assertRaises(CommandError) as cm:
+            call_command("modo", "import", "--bulk", test_file)
+        self.assertEqual(
+            str(cm.exception),
+            "Object already exists at line 2: account;user@test.com",
+        )
+        self.assertFalse(User.objects.filter(username="user3@test.com").exists())
+
+        call_command("modo", "import", "--bulk", "--continue-if-exists", test_file)
+        self.assertTrue(User.objects.filter(username="user3@test.com").exists())
+        alias = Alias.objects.get(address="bulk@test.com")
+        self.assertEqual(list(alias.recipients), ["user3@test.com"])
+
+    def test_import_command_bulk_query_count(self):
+        """Number of queries must not depend on the number of rows."""
+
+        def import_accounts(start, count):
+            test_file = self._write_csv(
+                "".join(
+                    f"account;user{i}@test2.com;toto;User;{i};True;SimpleUsers;"
+                    f"user{i}@test2.com;0\n"
+                    for i in range(start, start + count)
+                )
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                call_command("modo", "import", "--bulk", test_file)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(import_accounts(100, 2), import_accounts(200, 20))
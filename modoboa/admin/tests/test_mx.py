@@ -1,5 +1,6 @@
 """DNSBL related tests."""
 
+import time
 from unittest import mock
 
 import dns.resolver
@@ -18,10 +19,11 @@ from modoboa.admin.dns_checker import DNSChecker
 from modoboa.core import models as core_models, factories as core_factories
 from modoboa.lib.tests import ModoTestCase
 from . import utils
-from .. import factories, models
+from .. import factories, lib, models
 from ..lib import get_domain_mx_list
 
 
+@override_settings(DNSBL_CACHE_TTL=0)
 class MXTestCase(ModoTestCase):
     """TestCase for DNSBL related features."""
 
@@ -50,14 +52,12 @@ class MXTestCase(ModoTestCase):
         cls.localconfig.save()
         models.MXRecord.objects.all().delete()
 
-    @mock.patch("socket.gethostbyname")
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
-    def test_dns_checker(self, mock_query, mock_getaddrinfo, mock_g_gethostbyname):
+    def test_dns_checker(self, mock_query, mock_getaddrinfo):
         """Check that command works fine."""
         mock_query.side_effect = utils.mock_dns_query_result
         mock_getaddrinfo.side_effect = utils.mock_ip_query_result
-        mock_g_gethostbyname.return_value = "1.2.3.4"
         self.set_global_parameter("enable_dnsbl_checks", False)
 
         self.assertEqual(models.MXRecord.objects.count(), 0)
@@ -81,14 +81,12 @@ class MXTestCase(ModoTestCase):
         qs = models.MXRecord.objects.filter(domain=self.domain)
         self.assertEqual(id_, qs[0].id)
 
-    @mock.patch("socket.gethostbyname")
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
-    def test_invalid_mx(self, mock_query, mock_getaddrinfo, mock_g_gethostbyname):
+    def test_invalid_mx(self, mock_query, mock_getaddrinfo):
         """Test to check if invalid MX records are detected."""
         mock_query.side_effect = utils.mock_dns_query_result
         mock_getaddrinfo.side_effect = utils.mock_ip_query_result
-        mock_g_gethostbyname.return_value = "1.2.3.4"
         self.set_global_parameter("enable_dnsbl_checks", False)
 
         domain = factories.DomainFactory(name="invalid-mx.com")
@@ -108,6 +106,65 @@ class MXTestCase(ModoTestCase):
         self.assertEqual(domain.alarms.count(), 1)
         self.assertEqual(len(mail.outbox), 1)
 
+    @override_settings(DNS_CHECKS_QUERY_TIMEOUT=0.1)
+    @mock.patch("socket.getaddrinfo")
+    @mock.patch.object(dns.resolver.Resolver, "resolve")
+    def test_mx_lookup_timeout(self, mock_query, mock_getaddrinfo):
+        """Check that MX records are kept when the lookup times out."""
+        mock_query.side_effect = utils.mock_dns_query_result
+        mock_getaddrinfo.side_effect = utils.mock_ip_query_result
+        self.set_global_parameter("enable_dnsbl_checks", False)
+        with LogCapture("modoboa.dns"):
+            DNSChecker().run(self.domain, ttl=0)
+        mx_ids = list(
+            models.MXRecord.objects.filter(domain=self.domain).values_list(
+                "pk", flat=True
+            )
+        )
+        self.assertTrue(mx_ids)
+
+        def slow_lookup(*args, **kwargs):
+            time.sleep(0.5)
+            return []
+
+        with mock.patch("modoboa.admin.lib.get_domain_mx_list", slow_lookup):
+            with LogCapture("modoboa.dns") as log:
+                DNSChecker().run(self.domain)
+        self.assertIn("DNS lookup timeout", str(log))
+        self.assertEqual(
+            list(
+                models.MXRecord.objects.filter(domain=self.domain).values_list(
+                    "pk", flat=True
+                )
+            ),
+            mx_ids,
+        )
+        self.assertFalse(
+            self.domain.alarms.filter(internal_name="domain_has_no_mx").exists()
+        )
+
+    @mock.patch("socket.getaddrinfo")
+    @mock.patch.object(dns.resolver.Resolver, "resolve")
+    def test_failing_domain(self, mock_query, mock_getaddrinfo):
+        """Check that an unexpected DNS error only affects its domain."""
+        mock_query.side_effect = utils.mock_dns_query_result
+        mock_getaddrinfo.side_effect = utils.mock_ip_query_result
+        self.set_global_parameter("enable_dnsbl_checks", False)
+        domain = factories.DomainFactory(name="failing.org")
+        get_domain_mx_list = lib.get_domain_mx_list
+
+        def failing_lookup(name, *args, **kwargs):
+            if name == domain.name:
+                raise dns.resolver.YXDOMAIN()
+            return get_domain_mx_list(name, *args, **kwargs)
+
+        with mock.patch("modoboa.admin.lib.get_domain_mx_list", failing_lookup):
+            with LogCapture("modoboa.dns") as log:
+                DNSChecker().run_many([domain, self.domain])
+        self.assertIn(f"DNS checks failed for {domain.name}", str(log))
+        self.assertFalse(models.MXRecord.objects.filter(domain=domain).exists())
+        self.assertTrue(models.MXRecord.objects.filter(domain=self.domain).exists())
+
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
     def test_get_mx_list_dns_server(self, mock_query, mock_getaddrinfo):
@@ -192,7 +249,7 @@ class MXTestCase(ModoTestCase):
         log2.check()
 
 
-@override_settings(DNSBL_PROVIDERS=["zen.spamhaus.org"])
+@override_settings(DNSBL_PROVIDERS=["zen.spamhaus.org"], DNSBL_CACHE_TTL=0)
 class DNSBLTestCase(ModoTestCase):
     """TestCase for DNSBL related features."""
 
@@ -219,14 +276,12 @@ class DNSBLTestCase(ModoTestCase):
         )
         models.DNSBLResult.objects.all().delete()
 
-    @mock.patch("socket.gethostbyname")
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
-    def test_job(self, mock_query, mock_getaddrinfo, mock_g_gethostbyname):
+    def test_job(self, mock_query, mock_getaddrinfo):
         """Check that command works fine."""
-        mock_query.side_effect = utils.mock_dns_query_result
         mock_getaddrinfo.side_effect = utils.mock_ip_query_result
-        mock_g_gethostbyname.return_value = "1.2.3.4"
+        mock_query.side_effect = utils.DNSBLQueryMock("1.2.3.4")
         self.assertEqual(models.DNSBLResult.objects.count(), 0)
 
         with freeze_time(f"2026-01-12 14:{self.domain.id % 60:02}"):
@@ -251,42 +306,162 @@ class DNSBLTestCase(ModoTestCase):
         self.assertFalse(self.domain.uses_a_reserved_tld)
         self.assertTrue(self.domain2.uses_a_reserved_tld)
 
-    @mock.patch("socket.gethostbyname")
+    @override_settings(DNS_CHECKS_BATCH_SIZE=1)
+    @mock.patch("socket.getaddrinfo")
+    @mock.patch.object(dns.resolver.Resolver, "resolve")
+    def test_job_batches(self, mock_query, mock_getaddrinfo):
+        """Check that domains are grouped in batches."""
+        mock_getaddrinfo.side_effect = utils.mock_ip_query_result
+        mock_query.side_effect = utils.DNSBLQueryMock("1.2.3.4")
+        # Same slot as self.domain
+        domain = factories.DomainFactory(id=self.domain.id + 60, name="batch.org")
+        queue = django_rq.get_queue("modoboa")
+        queue.empty()
+        with freeze_time(f"2026-01-12 14:{self.domain.id % 60:02}"):
+            jobs.handle_dns_checks()
+        self.assertEqual(len(queue.jobs), 2)
+
+        with override_settings(DNS_CHECKS_BATCH_SIZE=10):
+            queue.empty()
+            with freeze_time(f"2026-01-12 14:{self.domain.id % 60:02}"):
+                jobs.handle_dns_checks()
+            self.assertEqual(len(queue.jobs), 1)
+            worker = SimpleWorker([queue], connection=queue.connection)
+            worker.work(burst=True)
+        self.assertTrue(models.DNSBLResult.objects.filter(domain=self.domain).exists())
+        self.assertTrue(models.DNSBLResult.objects.filter(domain=domain).exists())
+        self.assertEqual(
+            models.Domain.objects.filter(
+                pk__in=[self.domain.pk, domain.pk],
+                last_dns_check_execution__isnull=False,
+            ).count(),
+            2,
+        )
+
+    @override_settings(DNS_CHECKS_QUERY_TIMEOUT=0.1)
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
-    def test_notifications(self, mock_query, mock_getaddrinfo, mock_g_gethostbyname):
+    def test_dnsbl_timeout(self, mock_query, mock_getaddrinfo):
+        """Check that a slow DNSBL lookup does not block the checks."""
+        mock_getaddrinfo.side_effect = utils.mock_ip_query_result
+
+        def slow_lookup(name):
+            time.sleep(0.5)
+            return "127.0.0.4"
+
+        mock_query.side_effect = utils.DNSBLQueryMock(slow_lookup)
+        with LogCapture("modoboa.dns") as log:
+            DNSChecker().run(self.domain)
+        self.assertIn("DNS lookup timeout", str(log))
+        self.assertFalse(
+            models.DNSBLResult.objects.filter(domain=self.domain)
+            .exclude(status="")
+            .exists()
+        )
+        self.assertEqual(len(mail.outbox), 0)
+
+    @mock.patch("socket.getaddrinfo")
+    @mock.patch.object(dns.resolver.Resolver, "resolve")
+    def test_dnsbl_timeout_keeps_status(self, mock_query, mock_getaddrinfo):
+        """Check that a timed out lookup does not clear a listing."""
+        mock_getaddrinfo.side_effect = utils.mock_ip_query_result
+        mock_query.side_effect = utils.DNSBLQueryMock("127.0.0.2")
+        with LogCapture("modoboa.dns"):
+            DNSChecker().run(self.domain)
+        alarms_count = self.domain.alarms.opened().count()
+        self.assertTrue(alarms_count)
+
+        mock_query.side_effect.status = dns.resolver.Timeout()
+        with LogCapture("modoboa.dns"):
+            DNSChecker().run(self.domain, ttl=0)
+        self.assertEqual(self.domain.alarms.opened().count(), alarms_count)
+        self.assertFalse(
+            models.DNSBLResult.objects.filter(domain=self.domain, status="").exists()
+        )
+
+    @override_settings(DNSBL_CACHE_TTL=60)
+    @mock.patch("socket.getaddrinfo")
+    @mock.patch.object(dns.resolver.Resolver, "resolve")
+    def test_dnsbl_cache(self, mock_query, mock_getaddrinfo):
+        """Check that an IP is queried only once per provider."""
+        mock_getaddrinfo.side_effect = utils.mock_ip_query_result
+        mock_query.side_effect = utils.DNSBLQueryMock("127.0.0.2")
+        utils.clear_dnsbl_cache()
+        self.addCleanup(utils.clear_dnsbl_cache)
+
+        other_domain = factories.DomainFactory(name="other-modoboa.org")
+        with LogCapture("modoboa.dns"):
+            DNSChecker().run_many([self.domain, other_domain])
+        # Both domains share the same MX
+        mx_records = models.MXRecord.objects.filter(
+            domain__in=[self.domain, other_domain]
+        )
+        ips = set(mx_records.values_list("address", flat=True))
+        self.assertEqual(mock_query.side_effect.call_count, len(ips))
+        self.assertEqual(
+            models.DNSBLResult.objects.filter(
+                domain__in=[self.domain, other_domain], status="127.0.0.2"
+            ).count(),
+            mx_records.count(),
+        )
+        alarms_count = self.domain.alarms.opened().count()
+        self.assertEqual(alarms_count, self.domain.mxrecord_set.count())
+        self.assertEqual(len(mail.outbox), 1)
+
+        # Next run uses cached results
+        with LogCapture("modoboa.dns"):
+            DNSChecker().run(self.domain, ttl=0)
+        self.assertEqual(mock_query.side_effect.call_count, len(ips))
+        # Still listed: no new alarm, no new notification
+        self.assertEqual(self.domain.alarms.opened().count(), alarms_count)
+        self.assertEqual(len(mail.outbox), 1)
+
+    @mock.patch("socket.getaddrinfo")
+    @mock.patch.object(dns.resolver.Resolver, "resolve")
+    def test_dnsbl_alarm_closed(self, mock_query, mock_getaddrinfo):
+        """Check that alarms are closed once MXs are not listed anymore."""
+        mock_getaddrinfo.side_effect = utils.mock_ip_query_result
+        mock_query.side_effect = utils.DNSBLQueryMock("127.0.0.2")
+        with LogCapture("modoboa.dns"):
+            DNSChecker().run(self.domain)
+        self.assertTrue(self.domain.alarms.opened().exists())
+        mock_query.side_effect.status = dns.resolver.NXDOMAIN()
+        with LogCapture("modoboa.dns"):
+            DNSChecker().run(self.domain)
+        self.assertEqual(self.domain.alarms.opened().count(), 0)
+        self.assertFalse(
+            models.DNSBLResult.objects.filter(domain=self.domain)
+            .exclude(status="")
+            .exists()
+        )
+
+    @mock.patch("socket.getaddrinfo")
+    @mock.patch.object(dns.resolver.Resolver, "resolve")
+    def test_notifications(self, mock_query, mock_getaddrinfo):
         """Check notifications."""
-        mock_query.side_effect = utils.mock_dns_query_result
         mock_getaddrinfo.side_effect = utils.mock_ip_query_result
-        mock_g_gethostbyname.return_value = "127.0.0.4"
+        mock_query.side_effect = utils.DNSBLQueryMock("127.0.0.4")
         with LogCapture("modoboa.dns"):
             DNSChecker().run(self.domain)
         self.assertEqual(len(mail.outbox), 1)
 
-    @mock.patch("socket.gethostbyname")
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
-    def test_notifications_wrong_dnsbl_response(
-        self, mock_query, mock_getaddrinfo, mock_g_gethostbyname
-    ):
+    def test_notifications_wrong_dnsbl_response(self, mock_query, mock_getaddrinfo):
         """Check notifications."""
         self.set_global_parameter("enable_dnsbl_checks", True)
-        mock_query.side_effect = utils.mock_dns_query_result
         mock_getaddrinfo.side_effect = utils.mock_ip_query_result
-        mock_g_gethostbyname.return_value = "127.255.255.254"  # <--Spamhaus response when querying from an open resolver
+        # Spamhaus response when querying from an open resolver
+        mock_query.side_effect = utils.DNSBLQueryMock("127.255.255.254")
         DNSChecker().run(self.domain)
         self.assertEqual(len(mail.outbox), 0)
 
-    @mock.patch("socket.gethostbyname")
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
-    def test_management_command_no_dnsbl(
-        self, mock_query, mock_getaddrinfo, mock_g_gethostbyname
-    ):
+    def test_management_command_no_dnsbl(self, mock_query, mock_getaddrinfo):
         """Check that command works fine without dnsbl."""
         mock_query.side_effect = utils.mock_dns_query_result
         mock_getaddrinfo.side_effect = utils.mock_ip_query_result
-        mock_g_gethostbyname.return_value = "1.2.3.4"
         self.set_global_parameter("enable_dnsbl_checks", False)
         self.assertEqual(models.DNSBLResult.objects.count(), 0)
         with LogCapture("modoboa.dns"):
@@ -294,6 +469,7 @@ class DNSBLTestCase(ModoTestCase):
         self.assertFalse(models.DNSBLResult.objects.filter(domain=self.domain).exists())
 
 
+@override_settings(DNSBL_CACHE_TTL=0)
 class DNSChecksTestCase(ModoTestCase):
     """A test case for DNS checks."""
 
@@ -303,16 +479,12 @@ class DNSChecksTestCase(ModoTestCase):
         super().setUpTestData()
         cls.domain = factories.DomainFactory(name="dns-checks.com")
 
-    @mock.patch("socket.gethostbyname")
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
-    def test_management_command(
-        self, mock_query, mock_getaddrinfo, mock_g_gethostbyname
-    ):
+    def test_management_command(self, mock_query, mock_getaddrinfo):
         """Check that command works fine."""
         mock_query.side_effect = utils.mock_dns_query_result
         mock_getaddrinfo.side_effect = utils.mock_ip_query_result
-        mock_g_gethostbyname.return_value = "1.2.3.4"
         self.set_global_parameter("enable_dnsbl_checks", False)
 
         self.domain.enable_dkim = True
@@ -328,16 +500,12 @@ class DNSChecksTestCase(ModoTestCase):
         self.assertIsNot(self.domain.autoconfig_record, None)
         self.assertIsNot(self.domain.autodiscover_record, None)
 
-    @mock.patch("socket.gethostbyname")
     @mock.patch("socket.getaddrinfo")
     @mock.patch.object(dns.resolver.Resolver, "resolve")
-    def test_management_command_dkim_disabled(
-        self, mock_query, mock_getaddrinfo, mock_g_gethostbyname
-    ):
+    def test_management_command_dkim_disabled(self, mock_query, mock_getaddrinfo):
         """Check that DKIM record is not checked when signing is disabled."""
         mock_query.side_effect = utils.mock_dns_query_result
         mock_getaddrinfo.side_effect = utils.mock_ip_query_result
-        mock_g_gethostbyname.return_value = "1.2.3.4"
         self.set_global_parameter("enable_dnsbl_checks", False)
 
         # A public key exists but DKIM signing is disabled.
@@ -1,7 +1,10 @@
 """Repair command tests"""
 
+from django.contrib.contenttypes.models import ContentType
 from django.core import management
+from django.db.models import Count
 
+from modoboa.core.models import User
 from modoboa.lib.permissions import ObjectAccess, get_object_owner
 from modoboa.lib.tests import ModoTestCase
 from .. import factories, models
@@ -59,3 +62,49 @@ class RepairTestCase(ModoTestCase):
         self.assertTrue(
             models.Alias.objects.filter(address="user@test.com", internal=True).exists()
         )
+
+    def test_management_command_domain_admin_owner(self):
+        """Check that orphan objects are given to domain administrators."""
+        ObjectAccess.objects.filter(is_owner=True).delete()
+        mbox = models.Mailbox.objects.get(address="user", domain__name="test.com")
+        management.call_command("modo", "repair", "--quiet")
+        self.assertEqual(get_object_owner(mbox).username, "admin@test.com")
+        domain = models.Domain.objects.get(name="test.com")
+        self.assertEqual(get_object_owner(domain).username, "admin@test.com")
+        self.assertFalse(
+            ObjectAccess.objects.filter(is_owner=True)
+            .values("content_type", "object_id")
+            .annotate(total=Count("pk"))
+            .filter(total__gt=1)
+            .exists()
+        )
+
+    def test_management_command_deleted_objects(self):
+        """Check that accesses to deleted objects are removed."""
+        mbox_ct = ContentType.objects.get_for_model(models.Mailbox)
+        mbox_id = models.Mailbox.objects.order_by("-pk").first().pk + 1
+        ObjectAccess.objects.create(
+            user=User.objects.get(username="admin@test.com"),
+            content_type=mbox_ct,
+            object_id=mbox_id,
+        )
+        management.call_command("modo", "repair", "--quiet", "--dry-run")
+        self.assertTrue(
+            ObjectAccess.objects.filter(
+                content_type=mbox_ct, object_id=mbox_id
+            ).exists()
+        )
+        management.call_command("modo", "repair", "--quiet")
+        self.assertFalse(
+            ObjectAccess.objects.filter(
+                content_type=mbox_ct, object_id=mbox_id
+            ).exists()
+        )
+
+    def test_management_command_with_no_alias_dry_run(self):
+        """Check that dry run does not create aliases."""
+        models.Alias.objects.filter(address="user@test.com", internal=True).delete()
+        management.call_command("modo", "repair", "--quiet", "--dry-run")
+        self.assertFalse(
+            models.Alias.objects.filter(address="user@test.com", internal=True).exists()
+        )
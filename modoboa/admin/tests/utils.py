@@ -10,6 +10,9 @@ from dns.rdtypes.ANY.MX import MX
 from dns.rdtypes.ANY.TXT import TXT
 from dns.resolver import NXDOMAIN, NoAnswer, NoNameservers, Timeout
 
+from modoboa.admin import constants
+from modoboa.lib.redis import get_redis_connection
+
 
 class RRset:
 
@@ -130,3 +133,35 @@ def mock_ip_query_result(host, port, *args, **kwargs):
         else:
             return _POSSIBLE_IP_RESULTS[host]
     return _IP_RECORDS
+
+
+class DNSBLQueryMock:
+    """Resolver mock answering DNSBL queries with a given status.
+
+    Status can be an address, an exception or a callable receiving
+    the query name. Other queries are answered by
+    `mock_dns_query_result`.
+    """
+
+    def __init__(self, status):
+        self.status = status
+        self.call_count = 0
+
+    def __call__(self, qname, *args, **kwargs):
+        providers = getattr(settings, "DNSBL_PROVIDERS", constants.DNSBL_PROVIDERS)
+        if not str(qname).endswith(tuple(f".{provider}." for provider in providers)):
+            return mock_dns_query_result(qname, *args, **kwargs)
+        self.call_count += 1
+        status = self.status
+        if callable(status):
+            status = status(qname)
+        if isinstance(status, Exception):
+            raise status
+        return [A("IN", "A", status)]
+
+
+def clear_dnsbl_cache():
+    rclient = get_redis_connection()
+    keys = list(rclient.scan_iter(f"{constants.DNSBL_CACHE_KEY_PREFIX}:*"))
+    if keys:
+        rclient.delete(*keys)
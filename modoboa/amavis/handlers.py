@@ -28,6 +28,13 @@ def manage_domain_policy(sender, instance, **kwargs):
         update_user_and_policy(f"@{instance.oldname}", f"@{instance.name}")
 
 
+@receiver(core_signals.objects_bulk_created, sender=admin_models.Domain)
+def create_domains_policy(sender, objects, **kwargs):
+    """Create users and policies for domains created in bulk."""
+    for domain in objects:
+        create_user_and_policy(f"@{domain.name}")
+
+
 @receiver(signals.pre_delete, sender=admin_models.Domain)
 def on_domain_deleted(sender, instance, **kwargs):
     """Delete user and policy for domain."""
@@ -106,6 +113,16 @@ def on_aliasrecipient_created(sender, instance, **kwargs):
         )
 
 
+@receiver(core_signals.objects_bulk_created, sender=admin_models.AliasRecipient)
+def on_aliasrecipients_created(sender, objects, **kwargs):
+    """Create amavis records for alias recipients created in bulk."""
+    conf = dict(param_tools.get_global_parameters("amavis"))
+    if not conf["manual_learning"] or not conf["user_level_learning"]:
+        return
+    for instance in objects:
+        on_aliasrecipient_created(sender, instance)
+
+
 @receiver(signals.pre_delete, sender=admin_models.Alias)
 def on_mailboxalias_deleted(sender, instance, **kwargs):
     """Clean amavis database when an alias is removed."""
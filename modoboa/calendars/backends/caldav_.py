@@ -1,21 +1,64 @@
 """CalDAV calendar backend."""
 
+import collections
+import concurrent.futures
 import datetime
+import os
+import threading
 import uuid
 
 import caldav
 from caldav.elements import dav, ical
-from caldav import Calendar
 from dateutil.relativedelta import relativedelta
 import vobject
 
+from django.conf import settings
 from django.utils import timezone
 from django.utils.encoding import smart_str
 
+from modoboa.calendars import constants
 from modoboa.parameters import tools as param_tools
 
 from . import CalendarBackend
 
+_clients: collections.OrderedDict = collections.OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def _reset_clients():
+    """Forget clients inherited from the parent process."""
+    global _clients_lock
+
+    _clients.clear()
+    _clients_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_clients)
+
+
+def get_client(server_url: str, username: str, password: str) -> caldav.DAVClient:
+    """Return the CalDAV client of a user.
+
+    Clients are kept by this process so their HTTP connections can be
+    reused by following requests. Least recently used ones are
+    dropped once CALDAV_CLIENT_CACHE_SIZE clients are stored.
+    """
+    key = (server_url, username)
+    with _clients_lock:
+        entry = _clients.pop(key, None)
+        if entry is None or entry[0] != password:
+            entry = (
+                password,
+                caldav.DAVClient(server_url, username=username, password=password),
+            )
+        _clients[key] = entry
+        max_size = getattr(
+            settings, "CALDAV_CLIENT_CACHE_SIZE", constants.CALDAV_CLIENT_CACHE_SIZE
+        )
+        while len(_clients) > max_size:
+            _clients.popitem(last=False)
+    return entry[1]
+
 
 class Caldav_Backend(CalendarBackend):
     """CalDAV calendar backend."""
@@ -24,11 +67,9 @@ class Caldav_Backend(CalendarBackend):
         """Constructor."""
         super().__init__(calendar)
         server_url = smart_str(param_tools.get_global_parameter("server_location"))
-        self.client = caldav.DAVClient(
-            server_url, username=username, password=str(password)
-        )
+        self.client = get_client(server_url, username, str(password))
         if self.calendar:
-            self.remote_cal = Calendar(self.client, calendar.encoded_path)
+            self.remote_cal = caldav.Calendar(self.client, calendar.encoded_path)
 
     def _serialize_event(self, event):
         """Convert a vevent to a dictionary."""
@@ -75,7 +116,7 @@ class Caldav_Backend(CalendarBackend):
 
     def update_calendar(self, calendar):
         """Update an existing calendar."""
-        remote_cal = Calendar(self.client, calendar.encoded_path)
+        remote_cal = caldav.Calendar(self.client, calendar.encoded_path)
         remote_cal.set_properties(
             [dav.DisplayName(calendar.name), ical.CalendarColor(calendar.color)]
         )
@@ -128,7 +169,7 @@ class Caldav_Backend(CalendarBackend):
         if "calendar" in data and self.calendar.pk != data["calendar"].pk:
             # Calendar has been changed, remove old event first.
             self.remote_cal.client.delete(url)
-            remote_cal = Calendar(self.client, data["calendar"].encoded_path)
+            remote_cal = caldav.Calendar(self.client, data["calendar"].encoded_path)
             url = f"{remote_cal.url.geturl()}/{uid}.ics"
         else:
             remote_cal = self.remote_cal
@@ -142,9 +183,13 @@ class Caldav_Backend(CalendarBackend):
         return self._serialize_event(event)
 
     def get_events(self, start, end):
-        """Retrieve a list of events."""
+        """Retrieve a list of events.
+
+        The server filters events, so a single calendar-query REPORT
+        is sent.
+        """
         orig_events = self.remote_cal.search(
-            server_expand=False, start=start, end=end, event=True
+            server_expand=False, start=start, end=end, event=True, post_filter=False
         )
         events = []
         for event in orig_events:
@@ -157,13 +202,30 @@ class Caldav_Backend(CalendarBackend):
         self.remote_cal.client.delete(url)
 
     def import_events(self, fp):
-        """Import events from file."""
+        """Import events from file.
+
+        Events sharing the same UID (recurrence exceptions) are
+        uploaded together, as a single calendar object. Objects are
+        uploaded concurrently (see CALDAV_IMPORT_WORKERS).
+        """
         content = smart_str(fp.read())
         counter = 0
+        events_by_uid = {}
         for cal in vobject.base.readComponents(content):
             for event in cal.vevent_list:
-                ical = vobject.iCalendar()
-                ical.add(event)
-                self.remote_cal.add_event(ical.serialize())
+                uid = event.uid.value if "uid" in event.contents else uuid.uuid4()
+                events_by_uid.setdefault(uid, []).append(event)
                 counter += 1
+        objects = []
+        for events in events_by_uid.values():
+            ical = vobject.iCalendar()
+            # The master event must come first
+            for event in sorted(events, key=lambda e: "recurrence-id" in e.contents):
+                ical.add(event)
+            objects.append(ical.serialize())
+        max_workers = getattr(
+            settings, "CALDAV_IMPORT_WORKERS", constants.CALDAV_IMPORT_WORKERS
+        )
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(self.remote_cal.add_event, objects))
         return counter
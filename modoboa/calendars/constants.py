@@ -0,0 +1,7 @@
+"""Calendars constants."""
+
+# Maximum number of authenticated CalDAV clients kept by a process
+CALDAV_CLIENT_CACHE_SIZE = 100
+
+# Number of events uploaded concurrently during imports
+CALDAV_IMPORT_WORKERS = 4
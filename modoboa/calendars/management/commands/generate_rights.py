@@ -1,10 +1,11 @@
 """Management command to handle file generation."""
 
-import os
 import datetime
+import hashlib
+import os
+import tempfile
 
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 
 from modoboa.admin.models import Domain
 from modoboa.core.models import User
@@ -12,6 +13,8 @@ from modoboa.parameters import tools as param_tools
 
 from ... import models
 
+MARKER_PREFIX = "# Change marker: "
+
 
 class Command(BaseCommand):
     """Management command to handle file generation."""
@@ -30,8 +33,8 @@ class Command(BaseCommand):
     def _generate_acr(self, name, user, collection, perm="RrWw", comment=None):
         """Write a new access control rule to the config file."""
         if comment is not None:
-            self._cfgfile.write(f"\n# {comment}")
-        self._cfgfile.write(
+            self._content.append(f"\n# {comment}")
+        self._content.append(
             f"""
 [{name}]
 user: {user}
@@ -77,26 +80,56 @@ permissions: {perm}
 
     def _domain_admin_rules(self):
         """Generate access rules for domain adminstrators."""
-        for da in User.objects.filter(groups__name="DomainAdmins"):
-            for domain in Domain.objects.get_for_admin(da):
-                section = f"da-{da.email}-to-{domain.name}-acr"
-                self._generate_acr(section, da.email, f"{domain.name}/user/.*")
-
-    def _generate_file(self, target):
+        domain_admins = (
+            Domain.objects.filter(owners__user__groups__name="DomainAdmins")
+            .values_list("owners__user__email", "name")
+            .order_by("owners__user__email", "name")
+        )
+        for email, domain_name in domain_admins:
+            section = f"da-{email}-to-{domain_name}-acr"
+            self._generate_acr(section, email, f"{domain_name}/user/.*")
+
+    def _read_marker(self, path) -> str | None:
+        """Return the marker of an existing rights file."""
+        try:
+            with open(path) as fp:
+                for line in fp:
+                    if line.startswith(MARKER_PREFIX):
+                        return line[len(MARKER_PREFIX) :].strip()
+                    if not line.startswith("#"):
+                        break
+        except OSError:
+            pass
+        return None
+
+    def _write_file(self, target, content):
+        """Replace target file atomically with content."""
+        try:
+            mode = os.stat(target).st_mode & 0o777
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(target) or None, prefix=".rights-"
+        )
+        try:
+            with os.fdopen(fd, "w") as fp:
+                fp.write(content)
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _generate_rules(self, allow_calendars_administration) -> str:
         """
         A user must not declare a rule for his direct admin!
         """
-        self._cfgfile = open(target, "w")
-        self._cfgfile.write(
-            f"""# Rights management file for Radicale
-# This file was generated by Modoboa on {datetime.datetime.today()}
-# DO NOT EDIT MANUALLY!
-        """
-        )
+        self._content = []
 
-        allow_calendars_administration = param_tools.get_global_parameter(
-            "allow_calendars_administration", app="calendars"
-        )
         if allow_calendars_administration:
             self._super_admin_rules()
             self._domain_admin_rules()
@@ -123,21 +156,31 @@ permissions: {perm}
 
         self._user_access_rules()
         self._token_access_rules()
-        self._cfgfile.close()
+        return "".join(self._content)
 
     def handle(self, *args, **options):
-        """Command entry point."""
+        """Command entry point.
+
+        The file is only written again if the generated rules differ
+        from the existing ones (the marker stored in the header is a
+        hash of the rules).
+
+        Rules are always built in memory to compute that hash: it only
+        takes a few queries, while counts and modification dates miss
+        changes such as queryset updates of addresses or regenerated
+        calendar tokens (calendars have no modification date).
+        """
         path = param_tools.get_global_parameter("rights_file_path", app="calendars")
-        if not options["force"]:
-            try:
-                mtime = datetime.datetime.fromtimestamp(int(os.path.getmtime(path)))
-            except OSError:
-                pass
-            else:
-                tz = timezone.get_current_timezone()
-                qset = models.AccessRule.objects.filter(
-                    last_update__gt=mtime.replace(tzinfo=tz)
-                )
-                if not qset.exists():
-                    return
-        self._generate_file(path)
+        allow_calendars_administration = param_tools.get_global_parameter(
+            "allow_calendars_administration", app="calendars"
+        )
+        rules = self._generate_rules(allow_calendars_administration)
+        marker = hashlib.sha256(rules.encode()).hexdigest()
+        if not options["force"] and self._read_marker(path) == marker:
+            return
+        header = f"""# Rights management file for Radicale
+# This file was generated by Modoboa on {datetime.datetime.today()}
+# DO NOT EDIT MANUALLY!
+{MARKER_PREFIX}{marker}
+        """
+        self._write_file(path, header + rules)
@@ -6,6 +6,7 @@ from unittest import mock
 
 from configparser import ConfigParser
 
+from django.test import SimpleTestCase, override_settings
 from django.urls import reverse
 from django.core import management
 
@@ -21,6 +22,7 @@ from . import factories
 from . import jobs
 from . import models
 from . import mocks
+from .backends import caldav_
 
 
 class TestDataMixin:
@@ -133,6 +135,64 @@ class AccessRuleTestCase(ModoAPITestCase):
             "da-admin@test2.com-to-test2.com-acr",
         ]:
             self.assertTrue(cfg.has_section(section))
+        self.assertFalse(cfg.has_section("da-admin@test.com-to-test2.com-acr"))
+
+    def test_rights_file_generation_only_on_change(self):
+        management.call_command("generate_rights", verbosity=False)
+        os.chmod(self.rights_file_path, 0o640)
+        inode = os.stat(self.rights_file_path).st_ino
+        management.call_command("generate_rights", verbosity=False)
+        self.assertEqual(os.stat(self.rights_file_path).st_ino, inode)
+
+        # New calendar
+        mbox = admin_models.Mailbox.objects.get(
+            address="admin", domain__name="test.com"
+        )
+        cal = factories.UserCalendarFactory(mailbox=mbox)
+        management.call_command("generate_rights", verbosity=False)
+        stat = os.stat(self.rights_file_path)
+        self.assertNotEqual(stat.st_ino, inode)
+        self.assertEqual(stat.st_mode & 0o777, 0o640)
+        with open(self.rights_file_path) as fp:
+            self.assertIn(f"[token-{cal._path}-access]", fp.read())
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.rights_file_path)).count(
+                os.path.basename(self.rights_file_path)
+            ),
+            1,
+        )
+
+        # Access rule removal
+        acr = factories.AccessRuleFactory(
+            mailbox=admin_models.Mailbox.objects.get(
+                address="user", domain__name="test.com"
+            ),
+            calendar=cal,
+            read=True,
+        )
+        management.call_command("generate_rights", verbosity=False)
+        inode = os.stat(self.rights_file_path).st_ino
+        acr.delete()
+        management.call_command("generate_rights", verbosity=False)
+        self.assertNotEqual(os.stat(self.rights_file_path).st_ino, inode)
+        with open(self.rights_file_path) as fp:
+            self.assertNotIn("user@test.com-to-", fp.read())
+
+        # Mailbox rename
+        mbox = admin_models.Mailbox.objects.get(address="user", domain__name="test.com")
+        factories.AccessRuleFactory(mailbox=mbox, calendar=cal, read=True)
+        management.call_command("generate_rights", verbosity=False)
+        inode = os.stat(self.rights_file_path).st_ino
+        admin_models.Mailbox.objects.filter(pk=mbox.pk).update(address="user2")
+        management.call_command("generate_rights", verbosity=False)
+        self.assertNotEqual(os.stat(self.rights_file_path).st_ino, inode)
+        with open(self.rights_file_path) as fp:
+            self.assertIn("user2@test.com-to-", fp.read())
+
+        # Forced generation
+        inode = os.stat(self.rights_file_path).st_ino
+        management.call_command("generate_rights", force=True, verbosity=False)
+        self.assertNotEqual(os.stat(self.rights_file_path).st_ino, inode)
 
 
 class UserCalendarViewSetTestCase(TestDataMixin, ModoAPITestCase):
@@ -142,6 +202,7 @@ class UserCalendarViewSetTestCase(TestDataMixin, ModoAPITestCase):
         """Initiate test context."""
         self.client.force_authenticate(self.account)
         self.set_global_parameter("server_location", "http://localhost:5232")
+        self.addCleanup(caldav_._reset_clients)
 
     def test_get_calendars(self):
         """List or retrieve calendars."""
@@ -239,6 +300,7 @@ class SharedCalendarViewSetTestCase(TestDataMixin, ModoAPITestCase):
         """Initiate test context."""
         self.client.force_authenticate(self.admin_account)
         self.set_global_parameter("server_location", "http://localhost:5232")
+        self.addCleanup(caldav_._reset_clients)
 
     def test_get_calendars(self):
         """List or retrieve calendars."""
@@ -551,6 +613,7 @@ class EventViewSetTestCase(TestDataMixin, ModoAPITestCase):
 
         self.client.force_authenticate(self.account)
         self.set_global_parameter("server_location", "http://localhost")
+        self.addCleanup(caldav_._reset_clients)
 
     def test_get_user_events(self):
         """Test event(s) retrieval."""
@@ -738,6 +801,56 @@ class EventViewSetTestCase(TestDataMixin, ModoAPITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["counter"], 2)
 
+    def test_import_recurring_event(self):
+        """Check events sharing the same UID are imported together."""
+        url = reverse("api:user-event-import-from-file", args=[self.calendar.pk])
+        path = os.path.join(
+            os.path.abspath(os.path.dirname(__file__)), "test_data/recurring.ics"
+        )
+        self.set_global_parameter("max_ics_file_size", "2048")
+        with mock.patch.object(mocks.Calendar, "add_event") as add_event:
+            with open(path) as fp:
+                response = self.client.post(url, {"ics_file": fp})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["counter"], 3)
+        self.assertEqual(add_event.call_count, 2)
+        objects = sorted(
+            (call.args[0] for call in add_event.call_args_list),
+            key=lambda obj: obj.count("BEGIN:VEVENT"),
+        )
+        self.assertEqual(objects[0].count("BEGIN:VEVENT"), 1)
+        self.assertEqual(objects[1].count("BEGIN:VEVENT"), 2)
+        master, override = objects[1].split("BEGIN:VEVENT")[1:]
+        self.assertNotIn("RECURRENCE-ID", master)
+        self.assertIn("RECURRENCE-ID", override)
+
+
+class CaldavClientTestCase(SimpleTestCase):
+    """CalDAV client cache tests."""
+
+    def setUp(self):
+        patcher = mock.patch("caldav.DAVClient")
+        self.client_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(caldav_._reset_clients)
+
+    def test_client_reused(self):
+        url = "http://localhost"
+        client = caldav_.get_client(url, "user@test.com", "toto")
+        self.assertIs(caldav_.get_client(url, "user@test.com", "toto"), client)
+        self.assertEqual(self.client_mock.call_count, 1)
+        # Password has changed
+        caldav_.get_client(url, "user@test.com", "titi")
+        self.assertEqual(self.client_mock.call_count, 2)
+
+    @override_settings(CALDAV_CLIENT_CACHE_SIZE=1)
+    def test_client_cache_size(self):
+        url = "http://localhost"
+        caldav_.get_client(url, "user@test.com", "toto")
+        caldav_.get_client(url, "admin@test.com", "toto")
+        caldav_.get_client(url, "user@test.com", "toto")
+        self.assertEqual(self.client_mock.call_count, 3)
+
 
 class AttendeeViewSetTestCase(ModoAPITestCase):
     """Attendee viewset test case."""
@@ -23,3 +23,12 @@ CDAV_TO_MODEL_FIELDS_MAP = {
     "title": "position",
     "note": "note",
 }
+
+# Number of cards fetched per addressbook-multiget request during sync
+CDAV_MULTIGET_CHUNK_SIZE = 100
+
+# Number of contacts created per query during CSV imports
+CONTACT_IMPORT_CHUNK_SIZE = 500
+
+# Number of cards uploaded concurrently to the CardDAV server
+CDAV_UPLOAD_WORKERS = 4
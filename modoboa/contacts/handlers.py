@@ -4,6 +4,7 @@ from django.db.models import signals
 from django.dispatch import receiver
 
 from modoboa.admin import models as admin_models
+from modoboa.core import signals as core_signals
 
 from . import models
 
@@ -16,3 +17,14 @@ def create_addressbook(sender, instance, created, **kwargs):
     models.AddressBook.objects.create(
         user=instance.user, name="Contacts", _path="contacts"
     )
+
+
+@receiver(core_signals.objects_bulk_created, sender=admin_models.Mailbox)
+def create_addressbooks(sender, objects, **kwargs):
+    """Create default address books for mailboxes created in bulk."""
+    models.AddressBook.objects.bulk_create(
+        [
+            models.AddressBook(user=mb.user, name="Contacts", _path="contacts")
+            for mb in objects
+        ]
+    )
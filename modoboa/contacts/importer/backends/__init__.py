@@ -1,4 +1,10 @@
-from modoboa.contacts import models, tasks
+import itertools
+
+from django.conf import settings
+from django.db import transaction
+
+from modoboa.lib.db_utils import bulk_insert
+from modoboa.contacts import constants, models, tasks
 
 
 class ImporterBackend:
@@ -21,38 +27,61 @@ class ImporterBackend:
     def get_phone_number(self, values: dict):
         return None
 
+    def import_contacts(self, rows: list) -> list[models.Contact]:
+        """Create contacts, with their email address and phone number."""
+        contacts = []
+        emails = []
+        phone_numbers = []
+        for row in rows:
+            contact = models.Contact(addressbook=self.addressbook)
+            for local_name, row_name in self.field_names.items():
+                method_name = f"get_{local_name}"
+                if hasattr(self, method_name):
+                    value = getattr(self, method_name)(row)
+                else:
+                    value = row[row_name]
+                setattr(contact, local_name, value)
+            contacts.append(contact)
+            email = self.get_email(row)
+            if email:
+                emails.append(
+                    models.EmailAddress(contact=contact, address=email, type="work")
+                )
+            phone_number = self.get_phone_number(row)
+            if phone_number:
+                phone_numbers.append(
+                    models.PhoneNumber(
+                        contact=contact, number=phone_number, type="work"
+                    )
+                )
+        with transaction.atomic():
+            bulk_insert(models.Contact, contacts, "uid")
+            models.EmailAddress.objects.bulk_create(emails)
+            models.PhoneNumber.objects.bulk_create(phone_numbers)
+        return contacts
+
     def import_contact(self, row) -> models.Contact:
-        contact = models.Contact(addressbook=self.addressbook)
-        for local_name, row_name in self.field_names.items():
-            method_name = f"get_{local_name}"
-            if hasattr(self, method_name):
-                value = getattr(self, method_name)(row)
-            else:
-                value = row[row_name]
-            setattr(contact, local_name, value)
-        contact.save()
-        if self.get_email(row):
-            models.EmailAddress.objects.create(
-                contact=contact, address=self.get_email(row), type="work"
-            )
-        if self.get_phone_number(row):
-            models.PhoneNumber.objects.create(
-                contact=contact, number=self.get_phone_number(row), type="work"
-            )
-        return contact
+        return self.import_contacts([row])[0]
 
     def proceed(self, rows: list, carddav_password: str = None):
-        for row in rows:
-            contact = self.import_contact(row)
-            if carddav_password:
-                # FIXME: refactor CDAV tasks to allow connection from
-                # credentials and not only request
-                clt = tasks.get_cdav_client(
-                    self.addressbook,
-                    self.addressbook.user.email,
-                    carddav_password,
-                    True,
+        clt = None
+        if carddav_password:
+            clt = tasks.get_cdav_client(
+                self.addressbook,
+                self.addressbook.user.email,
+                carddav_password,
+                True,
+            )
+        chunk_size = getattr(
+            settings, "CONTACT_IMPORT_CHUNK_SIZE", constants.CONTACT_IMPORT_CHUNK_SIZE
+        )
+        rows = iter(rows)
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            contacts = self.import_contacts(chunk)
+            if clt:
+                tasks.upload_new_contacts(
+                    clt,
+                    models.Contact.objects.filter(
+                        pk__in=[contact.pk for contact in contacts]
+                    ).prefetch_related("emails", "phone_numbers"),
                 )
-                path, etag = clt.upload_new_card(contact.uid, contact.to_vcard())
-                contact.etag = etag
-                contact.save(update_fields=["etag"])
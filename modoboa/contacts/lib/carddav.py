@@ -80,6 +80,10 @@ class AddressBookQuery(elements_base.BaseElement):
     tag = ns("CARD", "addressbook-query")
 
 
+class AddressBookMultiget(elements_base.BaseElement):
+    tag = ns("CARD", "addressbook-multiget")
+
+
 class AddressData(elements_base.BaseElement):
     tag = ns("CARD", "address-data")
 
@@ -237,6 +241,29 @@ class PyCardDAV:
         response.raise_for_status()
         return response.content
 
+    def get_vcards(self, hrefs):
+        """
+        pulls several vcards from server using a single
+        addressbook-multiget REPORT
+
+        :param hrefs: paths of the vcards
+        :returns: dict of cards (etag and content) indexed by href, cards
+                  that could not be retrieved are not included
+        """
+        data = (
+            AddressBookMultiget()
+            + [elements_dav.Prop() + [Etag(), AddressData()]]
+            + [elements_dav.Href(value=href) for href in hrefs]
+        )
+        body = ET.tostring(data.xmlelement(), encoding="utf-8", xml_declaration=True)
+        headers = self.headers
+        headers["Depth"] = "1"
+        response = self.session.request(
+            "REPORT", self.url.resource, data=body, headers=headers, **self._settings
+        )
+        response.raise_for_status()
+        return self.__process_multiget_result(response.content)
+
     def get_sync_token(self):
         """Retrieve the current sync token."""
         headers = self.headers
@@ -334,7 +361,7 @@ class PyCardDAV:
         headers["content-type"] = "text/vcard"  # TODO perhaps this should
         # be set to the value this carddav server uses itself
         headers["If-None-Match"] = "*"
-        response = requests.put(
+        response = self.session.put(
             remotepath, data=card, headers=headers, **self._settings
         )
         if response.ok:
@@ -363,6 +390,21 @@ class PyCardDAV:
             result["cards"].append(card)
         return result
 
+    def __process_multiget_result(self, xml):
+        """Parse addressbook-multiget result and return a dict."""
+        result = {}
+        element = _safe_xml(xml)
+        for item in element.iterchildren(ns("D", "response")):
+            href = item.findtext(ns("D", "href"))
+            content = item.findtext(f".//{ns('CARD', 'address-data')}")
+            if href is None or content is None:
+                continue
+            result[href] = {
+                "etag": item.findtext(f".//{ns('D', 'getetag')}"),
+                "content": content,
+            }
+        return result
+
     def _get_xml_props(self):
         """PROPFIND method
 
@@ -1,7 +1,47 @@
 """Mocks to test the contacts plugin."""
 
+import re
+
 import httmock
 
+VCARD_TEMPLATE = """
+BEGIN:VCARD
+VERSION:3.0
+UID:{uid}
+N:Gump;Forrest
+FN:Forrest Gump
+ORG:Bubba Gump Shrimp Co.
+TITLE:Shrimp Man
+TEL;TYPE=WORK;VOICE:(111) 555-1212
+TEL;TYPE=HOME;VOICE:(404) 555-1212
+ADR;TYPE=HOME:;;42 Plantation St.;Baytown;LA;30314;United States of America
+EMAIL;TYPE=PREF,INTERNET:forrestgump@example.com
+END:VCARD
+"""
+
+
+def multiget_response(body: bytes) -> bytes:
+    """Return an addressbook-multiget response for requested cards."""
+    responses = ""
+    for href in re.findall(r"<(?:\w+:)?href>([^<]+)</", body.decode()):
+        uid = href.split("/")[-1]
+        responses += f"""
+    <d:response>
+        <d:href>{href}</d:href>
+        <d:propstat>
+            <d:prop>
+                <d:getetag>"{uid}-etag"</d:getetag>
+                <card:address-data>{VCARD_TEMPLATE.format(uid=uid)}</card:address-data>
+            </d:prop>
+            <d:status>HTTP/1.1 200 OK</d:status>
+        </d:propstat>
+    </d:response>"""
+    return f"""
+<d:multistatus xmlns:d="DAV:" xmlns:card="urn:ietf:params:xml:ns:carddav">
+{responses}
+</d:multistatus>
+""".encode()
+
 
 @httmock.urlmatch(method="OPTIONS")
 def options_mock(url, request):
@@ -49,7 +89,9 @@ def propfind_mock(url, request):
 @httmock.urlmatch(method="REPORT")
 def report_mock(url, request):
     """Simulate a REPORT request."""
-    if url.path.endswith(".vcf"):
+    if request.body and b"addressbook-multiget" in request.body:
+        content = multiget_response(request.body)
+    elif url.path.endswith(".vcf"):
         content = b"""
 <d:multistatus xmlns:d="DAV:">
     <d:response>
@@ -98,18 +140,5 @@ def report_mock(url, request):
 def get_mock(url, request):
     """Simulate a GET request."""
     uid = url.path.split("/")[-1]
-    content = f"""
-BEGIN:VCARD
-VERSION:3.0
-UID:{uid}
-N:Gump;Forrest
-FN:Forrest Gump
-ORG:Bubba Gump Shrimp Co.
-TITLE:Shrimp Man
-TEL;TYPE=WORK;VOICE:(111) 555-1212
-TEL;TYPE=HOME;VOICE:(404) 555-1212
-ADR;TYPE=HOME:;;42 Plantation St.;Baytown;LA;30314;United States of America
-EMAIL;TYPE=PREF,INTERNET:forrestgump@example.com
-END:VCARD
-"""
+    content = VCARD_TEMPLATE.format(uid=uid)
     return {"status_code": 200, "content": content}
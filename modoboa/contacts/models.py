@@ -110,18 +110,23 @@ class Contact(models.Model):
         if self.birth_date:
             card.add("bday").value = self.birth_date.isoformat()
         card.add("note").value = self.note
-        for email in EmailAddress.objects.filter(contact=self):
+        for email in self.emails.all():
             attr = card.add("email")
             attr.value = email.address
             attr.type_param = email.type
-        for phone in PhoneNumber.objects.filter(contact=self):
+        for phone in self.phone_numbers.all():
             attr = card.add("tel")
             attr.value = phone.number
             attr.type_param = phone.type
         return card.serialize()
 
-    def update_from_vcard(self, content):
-        """Update this contact according to given vcard."""
+    def load_vcard(self, content) -> tuple[list, list]:
+        """Update fields of this contact according to given vcard.
+
+        Nothing is saved.
+
+        :return: new email addresses and phone numbers of this contact
+        """
         vcard = vobject.readOne(content)
         self.uid = vcard.uid.value
         name = getattr(vcard, "n", None)
@@ -145,25 +150,28 @@ class Contact(models.Model):
                     setattr(self, mfield, value.value[0])
                 else:
                     setattr(self, mfield, value.value)
-        self.save()
-        email_list = getattr(vcard, "email_list", [])
-        EmailAddress.objects.filter(contact=self).delete()
-        to_create = []
-        for email in email_list:
+        emails = []
+        for email in getattr(vcard, "email_list", []):
             addr = EmailAddress(contact=self, address=email.value.lower())
             if hasattr(email, "type_param"):
                 addr.type = email.type_param.lower()
-            to_create.append(addr)
-        EmailAddress.objects.bulk_create(to_create)
-        PhoneNumber.objects.filter(contact=self).delete()
-        to_create = []
-        phone_list = getattr(vcard, "tel_list", [])
-        for tel in phone_list:
+            emails.append(addr)
+        phone_numbers = []
+        for tel in getattr(vcard, "tel_list", []):
             pnum = PhoneNumber(contact=self, number=tel.value.lower())
             if hasattr(tel, "type_param"):
                 pnum.type = tel.type_param.lower()
-            to_create.append(pnum)
-        PhoneNumber.objects.bulk_create(to_create)
+            phone_numbers.append(pnum)
+        return emails, phone_numbers
+
+    def update_from_vcard(self, content):
+        """Update this contact according to given vcard."""
+        emails, phone_numbers = self.load_vcard(content)
+        self.save()
+        EmailAddress.objects.filter(contact=self).delete()
+        EmailAddress.objects.bulk_create(emails)
+        PhoneNumber.objects.filter(contact=self).delete()
+        PhoneNumber.objects.bulk_create(phone_numbers)
 
 
 class EmailAddress(models.Model):
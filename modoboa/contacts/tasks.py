@@ -1,9 +1,17 @@
 """Async tasks."""
 
+import concurrent.futures
+from urllib.parse import unquote, urlparse
+
+import requests
+
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
+from modoboa.lib.db_utils import bulk_insert
 from .lib import carddav
-from . import models
+from . import constants, models
 
 
 def get_cdav_client(addressbook, user: str, passwd: str, write_support=False):
@@ -34,23 +42,120 @@ def create_cdav_addressbook(addressbook, password):
     clt.create_abook()
 
 
+def upload_new_contacts(clt, contacts: list):
+    """Upload new contacts to the CardDAV collection and save their etag.
+
+    Uploads are run concurrently (see CDAV_UPLOAD_WORKERS). Etags of
+    uploaded contacts are saved even if some uploads fail, the first
+    error being raised afterwards.
+    """
+    max_workers = getattr(
+        settings, "CDAV_UPLOAD_WORKERS", constants.CDAV_UPLOAD_WORKERS
+    )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            (contact, pool.submit(clt.upload_new_card, contact.uid, contact.to_vcard()))
+            for contact in contacts
+        ]
+    uploaded = []
+    error = None
+    for contact, future in futures:
+        try:
+            path, contact.etag = future.result()
+        except requests.RequestException as exc:
+            error = error or exc
+        else:
+            uploaded.append(contact)
+    models.Contact.objects.bulk_update(uploaded, ["etag"])
+    if error:
+        raise error
+
+
 def push_addressbook_to_carddav(request, addressbook):
     """Push every addressbook item to carddav collection.
 
     Use only once.
     """
     clt = get_cdav_client_from_request(request, addressbook, write_support=True)
-    for contact in addressbook.contact_set.all():
-        href, etag = clt.upload_new_card(contact.uid, contact.to_vcard())
-        contact.etag = etag
-        contact.save(update_fields=["etag"])
+    upload_new_contacts(
+        clt, addressbook.contact_set.prefetch_related("emails", "phone_numbers")
+    )
     addressbook.last_sync = timezone.now()
     addressbook.sync_token = clt.get_sync_token()
     addressbook.save(update_fields=["last_sync", "sync_token"])
 
 
+def normalize_href(href: str) -> str:
+    """Return the decoded path of a card href, to compare hrefs."""
+    return unquote(urlparse(href).path)
+
+
+def get_card_uids(href: str) -> tuple[str, str]:
+    """Return the possible contact UIDs of a card."""
+    # UID sometimes embded .vcf extension, sometimes not...
+    long_uid = normalize_href(href).split("/")[-1]
+    short_uid = long_uid.split(".")[0]
+    return long_uid, short_uid
+
+
+def apply_cdav_changes(addressbook, clt, cards: list):
+    """Download given cards and update the matching contacts in bulk."""
+    contacts = {}
+    for contact in models.Contact.objects.filter(
+        uid__in=[uid for card in cards for uid in get_card_uids(card["href"])]
+    ):
+        contacts[contact.uid] = contact
+    cards_to_fetch = {}
+    for card in cards:
+        long_uid, short_uid = get_card_uids(card["href"])
+        contact = contacts.get(long_uid) or contacts.get(short_uid)
+        if contact is None or contact.etag != card["etag"]:
+            cards_to_fetch[normalize_href(card["href"])] = card
+    if not cards_to_fetch:
+        return
+    new_contacts = []
+    updated_contacts = []
+    emails = []
+    phone_numbers = []
+    hrefs = [card["href"] for card in cards_to_fetch.values()]
+    for href, vcard in clt.get_vcards(hrefs).items():
+        href = normalize_href(href)
+        if href not in cards_to_fetch:
+            # Not requested (or unexpected href format)
+            continue
+        long_uid, short_uid = get_card_uids(href)
+        contact = contacts.get(long_uid) or contacts.get(short_uid)
+        if contact is None:
+            contact = models.Contact(addressbook=addressbook)
+            new_contacts.append(contact)
+        else:
+            updated_contacts.append(contact)
+        contact.etag = cards_to_fetch[href]["etag"]
+        contact_emails, contact_phone_numbers = contact.load_vcard(vcard["content"])
+        emails += contact_emails
+        phone_numbers += contact_phone_numbers
+    with transaction.atomic():
+        if new_contacts:
+            bulk_insert(models.Contact, new_contacts, "uid")
+        if updated_contacts:
+            fields = [
+                field.name
+                for field in models.Contact._meta.concrete_fields
+                if not field.primary_key and field.name != "addressbook"
+            ]
+            models.Contact.objects.bulk_update(updated_contacts, fields)
+            models.EmailAddress.objects.filter(contact__in=updated_contacts).delete()
+            models.PhoneNumber.objects.filter(contact__in=updated_contacts).delete()
+        models.EmailAddress.objects.bulk_create(emails)
+        models.PhoneNumber.objects.bulk_create(phone_numbers)
+
+
 def sync_addressbook_from_cdav(addressbook_id: int, access_token: str):
-    """Fetch changes from CardDAV server."""
+    """Fetch changes from CardDAV server.
+
+    Modified cards are downloaded by chunks, using one
+    addressbook-multiget request per chunk.
+    """
     addressbook = models.AddressBook.objects.get(id=addressbook_id)
     if addressbook.syncing:
         return
@@ -60,22 +165,20 @@ def sync_addressbook_from_cdav(addressbook_id: int, access_token: str):
         return
     addressbook.syncing = True
     addressbook.save()
+    deleted_uids = []
+    modified_cards = []
     for card in changes["cards"]:
-        # UID sometimes embded .vcf extension, sometimes not...
-        long_uid = card["href"].split("/")[-1]
-        short_uid = long_uid.split(".")[0]
         if "200" in card["status"]:
-            content = clt.get_vcard(card["href"]).decode()
-            contact = models.Contact.objects.filter(
-                uid__in=[long_uid, short_uid]
-            ).first()
-            if not contact:
-                contact = models.Contact(addressbook=addressbook)
-            if contact.etag != card["etag"]:
-                contact.etag = card["etag"]
-                contact.update_from_vcard(content)
+            modified_cards.append(card)
         elif "404" in card["status"]:
-            models.Contact.objects.filter(uid__in=[long_uid, short_uid]).delete()
+            deleted_uids += get_card_uids(card["href"])
+    if deleted_uids:
+        models.Contact.objects.filter(uid__in=deleted_uids).delete()
+    chunk_size = getattr(
+        settings, "CDAV_MULTIGET_CHUNK_SIZE", constants.CDAV_MULTIGET_CHUNK_SIZE
+    )
+    for pos in range(0, len(modified_cards), chunk_size):
+        apply_cdav_changes(addressbook, clt, modified_cards[pos : pos + chunk_size])
     addressbook.last_sync = timezone.now()
     addressbook.sync_token = changes["token"]
     addressbook.syncing = False
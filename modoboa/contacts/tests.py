@@ -1,8 +1,10 @@
 """Contacts backend tests."""
 
 import os
+from unittest import mock
 
 import httmock
+import requests
 from rq import SimpleWorker
 
 from django.core import management
@@ -19,6 +21,7 @@ from modoboa.lib.tests import ModoAPITestCase
 from . import factories
 from . import mocks
 from . import models
+from . import tasks
 from .lib.carddav import _safe_xml
 
 
@@ -142,6 +145,10 @@ class AddressBookViewSetTestCase(TestDataMixin, ModoAPITestCase):
         self.user.addressbook_set.update(last_sync=last_sync)
         addressbook = self.user.addressbook_set.first()
         self.assertEqual(addressbook.sync_token, "")
+        models.Contact.objects.filter(pk=self.contact.pk).update(
+            uid="updatedcard", etag='"old-etag"'
+        )
+        models.Contact.objects.filter(first_name="Marge").update(uid="deletedcard")
         with httmock.HTTMock(mocks.options_mock, mocks.report_mock, mocks.get_mock):
             response = self.client.get(reverse("api:addressbook-sync-from-cdav"))
             queue = django_rq.get_queue("modoboa")
@@ -150,6 +157,40 @@ class AddressBookViewSetTestCase(TestDataMixin, ModoAPITestCase):
         self.assertEqual(response.status_code, 200)
         addressbook.refresh_from_db()
         self.assertNotEqual(addressbook.sync_token, "")
+        self.assertFalse(models.Contact.objects.filter(uid="deletedcard").exists())
+        contact = models.Contact.objects.get(uid="newcard.vcf")
+        self.assertEqual(contact.addressbook, addressbook)
+        self.assertEqual(contact.etag, '"33441-34321"')
+        self.assertEqual(contact.first_name, "Forrest")
+        self.assertEqual(contact.phone_numbers.count(), 2)
+        contact = models.Contact.objects.get(pk=self.contact.pk)
+        self.assertEqual(contact.uid, "updatedcard.vcf")
+        self.assertEqual(contact.etag, '"33541-34696"')
+        self.assertEqual(contact.last_name, "Gump")
+        self.assertEqual(
+            list(contact.emails.values_list("address", flat=True)),
+            ["forrestgump@example.com"],
+        )
+
+    def test_apply_cdav_changes_hrefs(self):
+        """Check that hrefs returned by the server are compared decoded."""
+        base = "/radicale/user@test.com/contacts"
+        clt = mock.Mock()
+        clt.get_vcards.return_value = {
+            f"http://example.test{base}/new%20card.vcf".replace("@", "%40"): {
+                "etag": '"returned-etag"',
+                "content": mocks.VCARD_TEMPLATE.format(uid="new card.vcf"),
+            },
+            f"{base}/unknown.vcf": {
+                "etag": '"unknown-etag"',
+                "content": mocks.VCARD_TEMPLATE.format(uid="unknown.vcf"),
+            },
+        }
+        cards = [{"href": f"{base}/new%20card.vcf", "etag": '"new-etag"'}]
+        tasks.apply_cdav_changes(self.addressbook, clt, cards)
+        contact = models.Contact.objects.get(uid="new card.vcf")
+        self.assertEqual(contact.etag, '"new-etag"')
+        self.assertFalse(models.Contact.objects.filter(uid="unknown.vcf").exists())
 
 
 class CategoryViewSetTestCase(TestDataMixin, ModoAPITestCase):
@@ -395,6 +436,24 @@ class ImportTestCase(TestDataMixin, ModoAPITestCase):
         self.assertEqual(address.contact.first_name, "Toto Tata")
         self.assertEqual(address.contact.addressbook.user.email, "user@test.com")
         self.assertEqual(address.contact.address, "Street 1 Street 2")
+        self.assertEqual(address.contact.etag, '"12345"')
+
+    def test_upload_new_contacts_with_error(self):
+        @httmock.urlmatch(method="PUT")
+        def put_mock(url, request):
+            if self.contact.uid in url.path:
+                return {"status_code": 500}
+            return mocks.put_mock(url, request)
+
+        with httmock.HTTMock(mocks.options_mock, put_mock):
+            clt = tasks.get_cdav_client(self.addressbook, "user@test.com", "toto", True)
+            with self.assertRaises(requests.HTTPError):
+                tasks.upload_new_contacts(clt, self.addressbook.contact_set.all())
+        self.assertEqual(
+            self.addressbook.contact_set.filter(etag='"12345"').count(), 2
+        )
+        self.contact.refresh_from_db()
+        self.assertEqual(self.contact.etag, "")
 
 
 class CardDavSecurityTestCase(TestCase):
@@ -406,7 +406,9 @@ LOGGING = {
             'formatter': 'syslog'
         },
         'modoboa': {
-            'class': 'modoboa.core.loggers.SQLHandler',
+            'class': 'modoboa.core.loggers.BufferedSQLHandler',
+            'batch_size': 100,
+            'flush_interval': 1,
         }
     },
     'loggers': {
@@ -118,3 +118,10 @@ TFA_PRE_VERIFY_USER_PK = "tfa_pre_verify_user_pk"
 TFA_PRE_VERIFY_USER_BACKEND = "tfa_pre_verify_user_backend"
 
 DOVEADM_PASS_SCHEME_ALARM = "doveadm_password_scheme_fail"
+
+# Number of ObjectAccess rows inserted per query by bulk grants
+OBJECT_ACCESS_BATCH_SIZE = 1000
+
+# Number of entries fetched per page by LDAP imports (can be overridden
+# in settings)
+LDAP_IMPORT_PAGE_SIZE = 500
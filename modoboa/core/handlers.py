@@ -84,6 +84,14 @@ def create_local_config(sender, **kwargs):
     models.LocalConfig.objects.create(site=sites_models.Site.objects.get_current())
 
 
+@receiver(signals.post_save, sender=models.ObjectAccess)
+@receiver(signals.post_delete, sender=models.ObjectAccess)
+@receiver(core_signals.objects_bulk_created, sender=models.ObjectAccess)
+def invalidate_access_caches(sender, **kwargs):
+    """Cached access sets are outdated."""
+    models.ObjectAccess.invalidate_caches()
+
+
 @receiver(signals.pre_delete, sender=models.User)
 def update_permissions(sender, instance, **kwargs):
     """Permissions cleanup."""
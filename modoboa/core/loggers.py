@@ -1,4 +1,9 @@
 import logging
+import os
+import threading
+import traceback
+
+from django.db import connection
 
 
 class SQLHandler(logging.Handler):
@@ -9,3 +14,106 @@ class SQLHandler(logging.Handler):
         Log.objects.create(
             message=record.getMessage(), level=record.levelname, logger=record.name
         )
+
+
+class BufferedSQLHandler(logging.Handler):
+    """Save log records in database, by batches.
+
+    Records are buffered and saved with a single query by a background
+    thread, either when ``batch_size`` records are waiting or every
+    ``flush_interval`` seconds. Pending records are also saved when the
+    process exits (see :func:`logging.shutdown`).
+
+    Records which could not be saved are kept for the next attempt, up
+    to ``max_buffer_size`` records (oldest ones are dropped first).
+    """
+
+    def __init__(
+        self,
+        level=logging.NOTSET,
+        batch_size=100,
+        flush_interval=1.0,
+        max_buffer_size=10000,
+    ):
+        super().__init__(level)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer_size = max_buffer_size
+        self.buffer: list = []
+        self.buffer_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.pid = None
+        self.thread = None
+
+    def _start_thread(self):
+        """Start the writer thread if needed (must be called with the lock)."""
+        if self.pid == os.getpid():
+            return
+        # Records buffered before a fork belong to the parent process
+        self.buffer = []
+        self.pid = os.getpid()
+        self.thread = threading.Thread(
+            target=self._run, name="BufferedSQLHandler", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            if self.closed:
+                # close() takes care of pending records
+                break
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+                connection.close()
+
+    def emit(self, record):
+        from .models import Log
+
+        try:
+            entry = Log(
+                message=record.getMessage(), level=record.levelname, logger=record.name
+            )
+            with self.buffer_lock:
+                self._start_thread()
+                self.buffer.append(entry)
+                full = len(self.buffer) >= self.batch_size
+            if self.closed:
+                self.flush()
+            elif full:
+                self.wakeup.set()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Save buffered records.
+
+        If saving fails, records are put back in the buffer before the
+        error is raised.
+        """
+        from .models import Log
+
+        with self.buffer_lock:
+            entries, self.buffer = self.buffer, []
+        if not entries:
+            return
+        try:
+            Log.objects.bulk_create(entries)
+        except Exception:
+            with self.buffer_lock:
+                self.buffer[:0] = entries
+                del self.buffer[: -self.max_buffer_size]
+            raise
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        try:
+            self.flush()
+        except Exception:
+            traceback.print_exc()
+        super().close()
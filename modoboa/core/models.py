@@ -1,5 +1,6 @@
 """Core models."""
 
+import itertools
 import re
 from email.header import Header
 
@@ -236,36 +237,49 @@ class User(AbstractUser):
             return False
         return ooentry.is_owner
 
+    def get_accessible_objects(self) -> set:
+        """Return the objects this user can access.
+
+        The result is a set of ``(content type id, object id)`` tuples
+        containing objects the user has been granted access to, plus
+        objects owned by the accounts he administrates. It is computed
+        with a single query and cached on this instance until access
+        entries change.
+        """
+        generation = ObjectAccess.generation
+        cached = getattr(self, "_accessible_objects", None)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        user_ct = ContentType.objects.get_for_model(self)
+        administrated = self.objectaccess_set.filter(content_type=user_ct).values(
+            "object_id"
+        )
+        result = set(
+            ObjectAccess.objects.filter(
+                models.Q(user=self)
+                | (
+                    models.Q(user__in=administrated, is_owner=True)
+                    & ~models.Q(content_type=user_ct)
+                )
+            ).values_list("content_type_id", "object_id")
+        )
+        self._accessible_objects = (generation, result)
+        return result
+
     def can_access(self, obj):
         """Check if the user can access a specific object
 
-        This function is recursive: if the given user hasn't got
-        direct access to this object and if he has got access to other
-        ``User`` objects, we check if one of those users owns the
-        object.
+        If the given user hasn't got direct access to this object and
+        if he has got access to other ``User`` objects, we check if one
+        of those users owns the object.
 
         :param obj: a admin object
         :return: a boolean
         """
         if self.is_superuser:
             return True
-
         ct = ContentType.objects.get_for_model(obj)
-        try:
-            ooentry = self.objectaccess_set.get(content_type=ct, object_id=obj.id)
-        except ObjectAccess.DoesNotExist:
-            pass
-        else:
-            return True
-        if ct.model == "user":
-            return False
-
-        ct = ContentType.objects.get_for_model(self)
-        qs = self.objectaccess_set.filter(content_type=ct)
-        for ooentry in qs.all():
-            if ooentry.content_object.is_owner(obj):
-                return True
-        return False
+        return (ct.id, obj.id) in self.get_accessible_objects()
 
     @property
     def role(self):
@@ -360,14 +374,29 @@ class User(AbstractUser):
                     _("You can't import an account with a role greater than yours")
                 )
 
-        self.username = row[1].strip().lower()
-        try:
-            User.objects.get(username=self.username)
-        except User.DoesNotExist:
-            pass
-        else:
+        if User.objects.filter(username=row[1].strip().lower()).exists():
             raise Conflict
+        self.load_csv_row(row, crypt_password)
+        self.save()
+        self.role = desired_role
+        self.post_create(user)
+        if len(row) < 8:
+            return
+        signals.account_imported.send(
+            sender=self.__class__, user=user, account=self, row=row[7:]
+        )
+
+    def load_csv_row(self, row, crypt_password=True):
+        """Load account's definition from a CSV file entry.
 
+        Only the content of the row is validated here, see
+        :meth:`from_csv` for the expected order.
+
+        :param row: a list containing at least 7 fields
+        :param crypt_password:
+        """
+        desired_role = row[6].strip()
+        self.username = row[1].strip().lower()
         if desired_role == "SimpleUsers":
             if len(row) < 8 or not row[7].strip():
                 raise BadRequest(
@@ -394,14 +423,6 @@ class User(AbstractUser):
         self.last_name = row[4].strip()
         self.is_active = row[5].strip().lower() in ["true", "1", "yes", "y"]
         self.language = settings.LANGUAGE_CODE
-        self.save()
-        self.role = desired_role
-        self.post_create(user)
-        if len(row) < 8:
-            return
-        signals.account_imported.send(
-            sender=self.__class__, user=user, account=self, row=row[7:]
-        )
 
     def to_csv_row(self):
         """Return row that can be included in a CSV file."""
@@ -464,6 +485,9 @@ def populate_callback(user, group="SimpleUsers"):
     signals.account_auto_created.send(sender="populate_callback", user=user)
 
 
+_access_generations = itertools.count(1)
+
+
 class ObjectAccess(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
@@ -471,8 +495,29 @@ class ObjectAccess(models.Model):
     content_object = GenericForeignKey("content_type", "object_id")
     is_owner = models.BooleanField(default=False)
 
+    # Changes each time entries are modified in this process (see
+    # User.get_accessible_objects)
+    generation = 0
+
     class Meta:
         unique_together = (("user", "content_type", "object_id"),)
+        indexes = [models.Index(fields=["content_type", "object_id"])]
+
+    @classmethod
+    def invalidate_caches(cls):
+        """Invalidate access sets cached on User instances."""
+        cls.generation = next(_access_generations)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_values = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Store loaded values."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values, strict=False))
+        return instance
 
     def __str__(self):
         return f"{self.user} => {self.content_object} ({self.content_type})"
@@ -17,6 +17,8 @@ extra_role_permissions = django.dispatch.Signal()  # Provides role
 get_announcements = django.dispatch.Signal()  # Provides location
 get_theme_parameters = django.dispatch.Signal()  # Provides current_values
 get_top_notifications = django.dispatch.Signal()  # Provides include_all
+# Sent instead of post_save when objects are created using bulk_create
+objects_bulk_created = django.dispatch.Signal()  # Provides objects
 initial_data_loaded = django.dispatch.Signal()  # Provides extname
 register_postfix_maps = django.dispatch.Signal()
 user_can_set_role = django.dispatch.Signal()  # Provides user, role, account
@@ -0,0 +1,114 @@
+"""Tests for log handlers."""
+
+import logging
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from modoboa.core import loggers, models
+from modoboa.lib.tests import ModoTestCase
+
+
+class LoggersMixin:
+
+    def get_logger(self, handler, name="modoboa.tests.loggers"):
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(handler.close)
+        return logger
+
+    def wait_for_logs(self, count, timeout=5):
+        start = time.monotonic()
+        while time.monotonic() - start < timeout:
+            if models.Log.objects.count() == count:
+                return
+            time.sleep(0.05)
+        self.assertEqual(models.Log.objects.count(), count)
+
+
+class BufferedSQLHandlerTestCase(LoggersMixin, ModoTestCase):
+
+    def test_queries(self):
+        """Compare the cost of logging with both handlers."""
+        logger = self.get_logger(loggers.SQLHandler(), "modoboa.tests.sqlhandler")
+        with CaptureQueriesContext(connection) as ctx:
+            for i in range(50):
+                logger.info("Domain 'test%d.com' added by user admin", i)
+        self.assertEqual(len(ctx), 50)
+
+        models.Log.objects.all().delete()
+        handler = loggers.BufferedSQLHandler(batch_size=1000, flush_interval=3600)
+        logger = self.get_logger(handler)
+        with self.assertNumQueries(0):
+            for i in range(50):
+                logger.info("Domain 'test%d.com' added by user admin", i)
+        self.assertEqual(models.Log.objects.count(), 0)
+        with self.assertNumQueries(1):
+            handler.flush()
+        log = models.Log.objects.get(message="Domain 'test49.com' added by user admin")
+        self.assertEqual(log.level, "INFO")
+        self.assertEqual(log.logger, "modoboa.tests.loggers")
+
+    def test_flush_on_close(self):
+        handler = loggers.BufferedSQLHandler(batch_size=1000, flush_interval=3600)
+        logger = self.get_logger(handler)
+        logger.warning("Pending")
+        handler.close()
+        self.assertTrue(models.Log.objects.filter(message="Pending").exists())
+        # Records emitted after close are saved right away
+        logger.warning("Late")
+        self.assertTrue(models.Log.objects.filter(message="Late").exists())
+
+    def test_failed_flush_keeps_records(self):
+        handler = loggers.BufferedSQLHandler(
+            batch_size=1000, flush_interval=3600, max_buffer_size=2
+        )
+        logger = self.get_logger(handler)
+        for i in range(3):
+            logger.info("Message %d", i)
+        with mock.patch.object(
+            models.Log.objects, "bulk_create", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                handler.flush()
+        self.assertEqual(
+            [entry.message for entry in handler.buffer], ["Message 1", "Message 2"]
+        )
+        handler.flush()
+        self.assertEqual(models.Log.objects.count(), 2)
+
+    def test_emit_after_close_error(self):
+        """Check that a failed save does not reach the logging call."""
+        handler = loggers.BufferedSQLHandler(batch_size=1000, flush_interval=3600)
+        logger = self.get_logger(handler)
+        handler.close()
+        with mock.patch.object(
+            models.Log.objects, "bulk_create", side_effect=RuntimeError
+        ):
+            with mock.patch.object(handler, "handleError") as handle_error:
+                logger.warning("Late")
+        handle_error.assert_called_once()
+
+
+class BufferedSQLHandlerThreadTestCase(LoggersMixin, TransactionTestCase):
+
+    def test_flush_on_size(self):
+        logger = self.get_logger(
+            loggers.BufferedSQLHandler(batch_size=10, flush_interval=3600)
+        )
+        for i in range(10):
+            logger.info("Message %d", i)
+        self.wait_for_logs(10)
+
+    def test_flush_on_interval(self):
+        logger = self.get_logger(
+            loggers.BufferedSQLHandler(batch_size=1000, flush_interval=0.1)
+        )
+        logger.info("Message")
+        self.wait_for_logs(1)
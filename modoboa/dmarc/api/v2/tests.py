@@ -1,10 +1,18 @@
 """API v2 tests."""
 
+import datetime
+from unittest import mock
+
+import tldextract
+
+from django.core.cache import cache
 from django.urls import reverse
+from django.utils import timezone
 
 from modoboa.lib.tests import ModoAPITestCase
 
 from modoboa.admin import factories as admin_factories
+from modoboa.dmarc import lib, models
 from modoboa.dmarc.tests import mixins
 
 
@@ -34,3 +42,69 @@ class DmarcViewSetTestCase(mixins.CallCommandMixin, ModoAPITestCase):
         url = reverse("v2:dmarc-alignment-stats", args=[self.domain.pk])
         response = self.client.get(f"{url}?period=toto-titi")
         self.assertEqual(response.status_code, 400)
+
+    def test_alignment_stats_cleared_on_delete(self):
+        key = lib.get_alignment_stats_key(self.domain.pk, 2015, 26)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_reports()
+        self.assertTrue(cache.get(key))
+        models.Report.objects.all().delete()
+        self.assertIsNone(cache.get(key))
+        url = reverse("v2:dmarc-alignment-stats", args=[self.domain.pk])
+        response = self.client.get(f"{url}?period=2015-26")
+        self.assertEqual(response.status_code, 204)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_reports()
+        self.assertTrue(cache.get(key))
+        models.Record.objects.filter(header_from=self.domain).first().delete()
+        self.assertIsNone(cache.get(key))
+
+    def test_alignment_stats_aggregated(self):
+        self.import_reports()
+        url = reverse("v2:dmarc-alignment-stats", args=[self.domain.pk])
+        response = self.client.get(f"{url}?period=2015-26")
+        self.assertEqual(
+            response.json()["failed"],
+            {
+                "Not resolved": {
+                    "71.19.156.177": {
+                        "total": 2,
+                        "spf": {"success": 0, "failure": 2},
+                        "dkim": {"success": 0, "failure": 2},
+                    }
+                }
+            },
+        )
+
+    @mock.patch(
+        "modoboa.dmarc.lib.tldextract.extract",
+        tldextract.TLDExtract(suffix_list_urls=()),
+    )
+    @mock.patch("dns.resolver.Resolver.resolve")
+    def test_alignment_stats_rlookups(self, resolve):
+        """Check PTR results are computed at import and cached."""
+        resolve.return_value = [mock.Mock(target="mail.ngyn.org.")]
+        self.set_global_parameter("enable_rlookups", True, app="dmarc")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_reports()
+        call_count = resolve.call_count
+        self.assertGreater(call_count, 0)
+        self.assertTrue(
+            models.ReverseLookup.objects.filter(
+                ip="71.19.156.177", name="ngyn.org"
+            ).exists()
+        )
+
+        url = reverse("v2:dmarc-alignment-stats", args=[self.domain.pk])
+        response = self.client.get(f"{url}?period=2015-26")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("71.19.156.177", response.json()["failed"]["ngyn.org"])
+        self.assertEqual(resolve.call_count, call_count)
+
+        # Expired entries are resolved again
+        models.ReverseLookup.objects.update(
+            last_update=timezone.now() - datetime.timedelta(days=2)
+        )
+        self.client.get(f"{url}?period=2015-26")
+        self.assertGreater(resolve.call_count, call_count)
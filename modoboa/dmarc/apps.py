@@ -12,4 +12,6 @@ class DmarcConfig(AppConfig):
     verbose_name = "Modoboa DMARC tools"
 
     def ready(self):
+        from . import handlers  # noqa
+
         load_settings()
@@ -8,3 +8,18 @@ ALLOWED_REASON_TYPES = (
     "local_policy",
     "other",
 )
+
+# Lifetime (in seconds) of cached reverse lookup results
+RLOOKUP_CACHE_TTL = 86400
+
+# Lifetime (in seconds) of precomputed weekly alignment statistics
+ALIGNMENT_STATS_CACHE_TIMEOUT = 7 * 86400
+
+# Number of records inserted per query when importing a report
+IMPORT_BATCH_SIZE = 500
+
+# Number of messages fetched per IMAP command when importing reports
+IMAP_BATCH_SIZE = 100
+
+# Number of IMAP connections used to fetch reports
+IMAP_CONNECTIONS = 4
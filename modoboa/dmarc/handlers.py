@@ -0,0 +1,29 @@
+"""DMARC handlers."""
+
+from django.db.models import signals
+from django.dispatch import receiver
+
+from . import lib, models
+
+
+@receiver(signals.pre_delete, sender=models.Report)
+def clear_report_alignment_stats(sender, instance, **kwargs):
+    """Drop cached statistics built from the records of a report."""
+    domain_ids = set(instance.record_set.values_list("header_from", flat=True))
+    lib.clear_alignment_stats(domain_ids, instance)
+
+
+@receiver(signals.post_delete, sender=models.Record)
+def clear_record_alignment_stats(sender, instance, origin=None, **kwargs):
+    """Drop cached statistics built from a deleted record.
+
+    Records deleted along with their report are already handled by
+    ``clear_report_alignment_stats``.
+    """
+    deleted_directly = (
+        isinstance(origin, models.Record)
+        or getattr(origin, "model", None) is models.Record
+    )
+    if not deleted_directly:
+        return
+    lib.clear_alignment_stats([instance.header_from_id], instance.report)
@@ -1,14 +1,18 @@
 """Internal library."""
 
+import base64
 import concurrent.futures
 import datetime
 import email
+import functools
 import fileinput
 import getpass
 import imaplib
 import zipfile
 import gzip
+import quopri
 import sys
+import threading
 import tldextract
 
 from defusedxml.ElementTree import fromstring
@@ -17,14 +21,17 @@ import magic
 import io
 
 from django.conf import settings
-from django.db import transaction
-from django.db.models import Q
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Q, Sum, Value, When
 from django.utils import timezone
 from django.utils.encoding import smart_str
 from django.utils.translation import gettext as _
 
 from modoboa.admin import models as admin_models
 from modoboa.parameters import tools as param_tools
+from modoboa.webmail.lib import imaputils
+from modoboa.webmail.lib.fetch_parser import FetchResponseParser
 
 from . import constants
 from . import models
@@ -70,8 +77,32 @@ def _read_bounded(fileobj, limit):
     return data
 
 
-def import_record(xml_node, report):
-    """Import a record."""
+def get_parent_domain_names(name: str) -> list:
+    """Return name and its parent domains, most specific first."""
+    labels = name.lower().split(".")
+    return [".".join(labels[pos:]) for pos in range(len(labels) - 1)]
+
+
+def get_local_domains(xml_nodes) -> dict:
+    """Return local domains referenced by records, indexed by name.
+
+    One query is issued whatever the number of records.
+    """
+    names = set()
+    for xml_node in xml_nodes:
+        header_from = xml_node.find("identifiers").find("header_from").text
+        names.update(get_parent_domain_names(header_from))
+    return {
+        domain.name: domain
+        for domain in admin_models.Domain.objects.filter(name__in=names)
+    }
+
+
+def import_record(xml_node, report, domains: dict):
+    """Build a record and its results.
+
+    Nothing is saved, see :func:`import_report`.
+    """
     record = models.Record(report=report)
     row = xml_node.find("row")
     record.source_ip = row.find("source_ip").text
@@ -90,19 +121,15 @@ def import_record(xml_node, report):
         record.reason_comment = comment
 
     identifiers = xml_node.find("identifiers")
-    header_from = identifiers.find("header_from").text.split(".")
-    domain = None
-    while len(header_from) >= 2:
-        domain = admin_models.Domain.objects.filter(name=".".join(header_from)).first()
-        if domain is not None:
-            record.header_from = domain
+    for name in get_parent_domain_names(identifiers.find("header_from").text):
+        if name in domains:
+            record.header_from = domains[name]
             break
-        header_from = header_from[1:]
-    if domain is None:
+    else:
         print("Invalid record found (domain not local)")
         return None
 
-    record.save()
+    results = []
     auth_results = xml_node.find("auth_results")
     for rtype in ["spf", "dkim"]:
         rnode = auth_results.find(rtype)
@@ -112,17 +139,37 @@ def import_record(xml_node, report):
         if not domain:
             domain = record.header_from.name
         result = (rnode.findtext("result") or "").strip()
-        models.Result.objects.create(
-            record=record,
-            type=rtype,
-            domain=domain,
-            result=result,
+        results.append(
+            models.Result(
+                record=record,
+                type=rtype,
+                domain=domain,
+                result=result,
+            )
         )
+    return record, results
+
+
+def save_records(records: list, results: list) -> None:
+    """Save records and their results using as few queries as possible."""
+    batch_size = getattr(
+        settings, "DMARC_IMPORT_BATCH_SIZE", constants.IMPORT_BATCH_SIZE
+    )
+    if connection.features.can_return_rows_from_bulk_insert:
+        models.Record.objects.bulk_create(records, batch_size=batch_size)
+    else:
+        # Primary keys are required to create results
+        for record in records:
+            record.save()
+    models.Result.objects.bulk_create(results, batch_size=batch_size)
 
 
 @transaction.atomic
-def import_report(content):
-    """Import an aggregated report."""
+def import_report(content) -> int:
+    """Import an aggregated report.
+
+    Return the number of imported records.
+    """
     root = fromstring(content, forbid_dtd=True)
     metadata = root.find("report_metadata")
     print(
@@ -139,7 +186,7 @@ def import_report(content):
     )
     if qs.exists():
         print("Report already imported.")
-        return
+        return 0
     report = models.Report(reporter=reporter)
 
     report.report_id = metadata.find("report_id").text
@@ -159,25 +206,43 @@ def import_report(content):
                 node = fromstring("<sp>unstated</sp>", forbid_dtd=True)
             else:
                 print(f"Report skipped because of malformed data (empty {attr})")
-                return
+                return 0
         setattr(report, f"policy_{attr}", node.text)
     report.save()
-    for record in root.findall("record"):
-        import_record(record, report)
+    nodes = root.findall("record")
+    domains = get_local_domains(nodes)
+    records = []
+    results = []
+    for node in nodes:
+        imported = import_record(node, report, domains)
+        if imported is not None:
+            records.append(imported[0])
+            results += imported[1]
+    save_records(records, results)
+    for domain in {record.header_from for record in records}:
+        # Don't cache uncommitted data nor run PTR lookups inside the
+        # import transaction
+        transaction.on_commit(
+            functools.partial(update_alignment_stats, domain, report), robust=True
+        )
+    return len(records)
 
 
-def import_archive(archive, content_type=None):
+def import_archive(archive, content_type=None) -> int:
     """Import reports contained inside (file pointer)
     - a zip archive,
     - a gzip file,
     - a xml file.
+
+    Return the number of imported records.
     """
     if content_type == "text/xml":
-        import_report(_read_bounded(archive, MAX_DECOMPRESSED_SIZE))
+        count = import_report(_read_bounded(archive, MAX_DECOMPRESSED_SIZE))
     elif content_type in ["application/gzip", "application/octet-stream"]:
         with gzip.GzipFile(mode="r", fileobj=archive) as zfile:
-            import_report(_read_bounded(zfile, MAX_DECOMPRESSED_SIZE))
+            count = import_report(_read_bounded(zfile, MAX_DECOMPRESSED_SIZE))
     else:
+        count = 0
         with zipfile.ZipFile(archive, "r") as zfile:
             infos = zfile.infolist()
             if len(infos) > MAX_ZIP_MEMBERS:
@@ -194,11 +259,36 @@ def import_archive(archive, content_type=None):
                 with zfile.open(info, "r") as member:
                     # Enforce the cap on the real stream too: the declared
                     # file_size above cannot be fully trusted.
-                    import_report(_read_bounded(member, MAX_DECOMPRESSED_SIZE))
+                    count += import_report(
+                        _read_bounded(member, MAX_DECOMPRESSED_SIZE)
+                    )
+    return count
+
+
+def import_attachment(payload: bytes, content_type: str) -> int:
+    """Import reports contained inside an attachment.
+
+    Return the number of imported records.
+    """
+    if len(payload) > MAX_COMPRESSED_SIZE:
+        raise ValueError("Compressed attachment exceeds the allowed size")
+    with io.BytesIO(payload) as fpo:
+        # Try to get the actual file type of the buffer
+        # required to make sure we are dealing with an XML file
+        file_type = magic.Magic(uncompress=True, mime=True).from_buffer(
+            fpo.read(2048)
+        )
+        fpo.seek(0)
+        if file_type not in FILE_TYPES:
+            return 0
+        return import_archive(fpo, content_type=content_type)
 
 
-def import_report_from_email(content):
-    """Import a report from an email."""
+def import_report_from_email(content) -> int:
+    """Import a report from an email.
+
+    Return the number of imported records.
+    """
     if isinstance(content, str):
         msg = email.message_from_string(content)
     elif isinstance(content, bytes):
@@ -206,6 +296,7 @@ def import_report_from_email(content):
     else:
         msg = email.message_from_file(content)
     err = False
+    count = 0
     for part in msg.walk():
         if part.get_content_type() not in ZIP_CONTENT_TYPES:
             continue
@@ -213,30 +304,19 @@ def import_report_from_email(content):
             payload = part.get_payload(decode=True)
             if payload is None:
                 continue
-            if len(payload) > MAX_COMPRESSED_SIZE:
-                raise ValueError("Compressed attachment exceeds the allowed size")
-            fpo = io.BytesIO(payload)
-            # Try to get the actual file type of the buffer
-            # required to make sure we are dealing with an XML file
-            file_type = magic.Magic(uncompress=True, mime=True).from_buffer(
-                fpo.read(2048)
-            )
-            fpo.seek(0)
-            if file_type in FILE_TYPES:
-                import_archive(fpo, content_type=part.get_content_type())
+            count += import_attachment(payload, part.get_content_type())
         except (OSError, ValueError, zipfile.BadZipFile):
             print("Error: the attachment does not match the mimetype")
             err = True
-        else:
-            fpo.close()
     if err:
         # Return EX_DATAERR code <data format error> available
         # at sysexits.h file
         # (see http://www.postfix.org/pipe.8.html)
         sys.exit(65)
+    return count
 
 
-def import_report_from_stdin():
+def import_report_from_stdin() -> int:
     """Parse a report from stdin."""
     content = io.StringIO()
     for line in fileinput.input([]):
@@ -244,25 +324,175 @@ def import_report_from_stdin():
     content.seek(0)
 
     if not content:
-        return
-    import_report_from_email(content)
+        return 0
+    return import_report_from_email(content)
+
+
+def decode_part(data, encoding: str) -> bytes:
+    """Decode a message part fetched from an IMAP server."""
+    if isinstance(data, str):
+        data = data.encode()
+    encoding = (encoding or "").lower()
+    if encoding == "base64":
+        return base64.b64decode(data)
+    if encoding == "quoted-printable":
+        return quopri.decodestring(data)
+    return data
+
 
+def find_report_parts(bodystructure: list) -> list:
+    """Return the parts of a message which may contain a report."""
+    return [
+        attachment
+        for attachment in imaputils.BodyStructure(bodystructure).attachments
+        if attachment["Content-Type"] in ZIP_CONTENT_TYPES
+    ]
 
-def import_from_imap(options):
-    """Import reports from an IMAP mailbox."""
-    obj = imaplib.IMAP4_SSL if options["ssl"] else imaplib.IMAP4
-    conn = obj(options["host"])
+
+class IMAPReportsFetcher:
+    """Fetch report attachments using a pool of IMAP connections.
+
+    Each thread uses its own connection since imaplib is not thread
+    safe.
+    """
+
+    def __init__(self, options: dict, username: str, password: str):
+        self.options = options
+        self.username = username
+        self.password = password
+        self.local = threading.local()
+        self.connections: list = []
+        self.lock = threading.Lock()
+
+    def connect(self):
+        obj = imaplib.IMAP4_SSL if self.options["ssl"] else imaplib.IMAP4
+        conn = obj(self.options["host"])
+        conn.login(self.username, self.password)
+        conn.select(self.options["mailbox"], readonly=True)
+        with self.lock:
+            self.connections.append(conn)
+        return conn
+
+    @property
+    def connection(self):
+        """Return the connection of the current thread."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+        return conn
+
+    def _fetch(self, uids: list, items: str) -> dict:
+        typ, data = self.connection.uid(
+            "FETCH", imaputils.compress_uid_set(uids), items
+        )
+        if typ != "OK":
+            raise imaplib.IMAP4.error(data)
+        return FetchResponseParser().parse(data)
+
+    def fetch(self, uids: list) -> list:
+        """Fetch report attachments of the given messages.
+
+        BODYSTRUCTURE is used to locate attachments, so only them are
+        downloaded. Messages sharing the same structure are fetched
+        together.
+
+        :return: a list of (uid, [(content type, payload), ...]) sorted by uid
+        """
+        parts = {}
+        groups: dict = {}
+        for uid, item in self._fetch(uids, "(BODYSTRUCTURE)").items():
+            parts[uid] = []
+            for attachment in find_report_parts(item["BODYSTRUCTURE"]):
+                # Base64 makes encoded parts 33% bigger
+                if attachment["size"] > MAX_COMPRESSED_SIZE * 4 // 3 + 4:
+                    print(f"Message {uid}: attachment too big, skipping")
+                    continue
+                parts[uid].append(attachment)
+            if parts[uid]:
+                pnums = tuple(attachment["pnum"] for attachment in parts[uid])
+                groups.setdefault(pnums, []).append(uid)
+        bodies: dict = {}
+        for pnums, group in groups.items():
+            items = " ".join(f"BODY.PEEK[{pnum}]" for pnum in pnums)
+            bodies.update(self._fetch(group, f"({items})"))
+        result = []
+        for uid in sorted(parts):
+            payloads = []
+            for attachment in parts[uid]:
+                body = bodies.get(uid, {}).get(f"BODY[{attachment['pnum']}]")
+                if body is None:
+                    continue
+                payloads.append(
+                    (
+                        attachment["Content-Type"],
+                        decode_part(body, attachment["encoding"]),
+                    )
+                )
+            result.append((uid, payloads))
+        return result
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.logout()
+            except (OSError, imaplib.IMAP4.error):
+                pass
+
+
+def import_from_imap(options) -> int:
+    """Import reports from an IMAP mailbox.
+
+    Messages are fetched by batches using a pool of connections. The
+    highest processed UID is saved so messages are not imported
+    twice.
+
+    Return the number of imported records.
+    """
     username = input("Username: ")
     password = getpass.getpass(prompt="Password: ")
-    conn.login(username, password)
-    conn.select(options["mailbox"])
-    type, msg_ids = conn.search(None, "ALL")
-    for msg_id in msg_ids[0].split():
-        typ, content = conn.fetch(msg_id, "(RFC822)")
-        for response_part in content:
-            if isinstance(response_part, tuple):
-                import_report_from_email(response_part[1])
-    conn.close()
+    fetcher = IMAPReportsFetcher(options, username, password)
+    count = 0
+    try:
+        conn = fetcher.connection
+        uid_validity = conn.response("UIDVALIDITY")[1][0]
+        lookup = {
+            "host": options["host"],
+            "username": username,
+            "mailbox": options["mailbox"],
+        }
+        if uid_validity is None:
+            # UIDs can't be trusted across sessions: rescan everything
+            # and don't save the state
+            state = models.ImportedMailbox(**lookup)
+        else:
+            uid_validity = int(uid_validity)
+            state, created = models.ImportedMailbox.objects.get_or_create(**lookup)
+        if uid_validity is not None and state.uid_validity != uid_validity:
+            state.uid_validity = uid_validity
+            state.last_uid = 0
+            state.save()
+        typ, data = conn.uid("SEARCH", "UID", f"{state.last_uid + 1}:*")
+        # n:* always matches the last message, even if its UID is lower
+        uids = sorted(uid for uid in map(int, data[0].split()) if uid > state.last_uid)
+        batch_size = options.get("batch_size") or constants.IMAP_BATCH_SIZE
+        batches = [
+            uids[pos : pos + batch_size] for pos in range(0, len(uids), batch_size)
+        ]
+        max_workers = options.get("connections") or constants.IMAP_CONNECTIONS
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for batch, messages in zip(batches, pool.map(fetcher.fetch, batches)):
+                for uid, payloads in messages:
+                    for content_type, payload in payloads:
+                        try:
+                            count += import_attachment(payload, content_type)
+                        except (OSError, ValueError, zipfile.BadZipFile):
+                            print(f"Error: invalid attachment in message {uid}")
+                state.last_uid = batch[-1]
+                if uid_validity is not None:
+                    state.save(update_fields=["last_uid"])
+    finally:
+        fetcher.close()
+    return count
 
 
 def week_range(year, weeknumber):
@@ -274,22 +504,159 @@ def week_range(year, weeknumber):
     return start_week.replace(tzinfo=tz), end_week.replace(tzinfo=tz)
 
 
-def insert_record(target: dict, record, name: str) -> None:
-    """Add a record."""
+def get_organizational_domain(dns_resolver, ip: str) -> str | None:
+    """Return the organizational domain the PTR record of ip points to.
+
+    An empty string is returned if no valid PTR record exists, None
+    in case of transient error.
+    """
+    addr = reversename.from_address(ip)
+    try:
+        resp = dns_resolver.resolve(addr, "PTR")
+    except (resolver.NXDOMAIN, resolver.YXDOMAIN, resolver.NoAnswer):
+        return ""
+    except (resolver.NoNameservers, resolver.Timeout):
+        return None
+    ext = tldextract.extract(str(resp[0].target))
+    if not ext.suffix:  # invalid PTR record
+        return ""
+    return ".".join((ext.domain, ext.suffix)).lower()
+
+
+def resolve_source_ips(ips) -> dict:
+    """Return organizational domains of the given IP addresses.
+
+    Results are kept in database for ``DMARC_RLOOKUP_CACHE_TTL``
+    seconds, so only unknown or expired addresses are resolved. IP
+    addresses without a valid PTR record are not included.
+    """
+    ttl = getattr(settings, "DMARC_RLOOKUP_CACHE_TTL", constants.RLOOKUP_CACHE_TTL)
+    now = timezone.now()
+    ips = set(ips)
+    names = dict(
+        models.ReverseLookup.objects.filter(
+            ip__in=ips, last_update__gte=now - datetime.timedelta(seconds=ttl)
+        ).values_list("ip", "name")
+    )
+    missing = list(ips - names.keys())
+    if missing:
+        dns_resolver = resolver.Resolver()
+        dns_resolver.timeout = 1.0
+        dns_resolver.lifetime = 1.0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as pool:
+            results = pool.map(
+                functools.partial(get_organizational_domain, dns_resolver), missing
+            )
+            lookups = [
+                models.ReverseLookup(ip=ip, name=name, last_update=now)
+                for ip, name in zip(missing, results)
+                if name is not None
+            ]
+        kwargs = {}
+        if connection.features.supports_update_conflicts_with_target:
+            kwargs["unique_fields"] = ["ip"]
+        models.ReverseLookup.objects.bulk_create(
+            lookups,
+            update_conflicts=True,
+            update_fields=["name", "last_update"],
+            **kwargs,
+        )
+        names.update((lookup.ip, lookup.name) for lookup in lookups)
+    return {ip: name for ip, name in names.items() if name}
+
+
+def get_report_weeks(report) -> set:
+    """Return the (year, week) pairs covered by report."""
+    return {
+        timezone.localtime(date).isocalendar()[:2]
+        for date in (report.start_date, report.end_date)
+    }
+
+
+def get_alignment_stats_key(domain_id: int, year: int, week: int) -> str:
+    return f"dmarc:alignment_stats:{domain_id}:{year}-{week}"
+
+
+def get_alignment_rows(domain, year: int, week: int, refresh: bool = False) -> list:
+    """Return records of the given week aggregated by source and results.
+
+    Rows are kept in cache (they are refreshed each time a report
+    concerning this week is imported and dropped when one is deleted).
+    """
+    key = get_alignment_stats_key(domain.pk, year, week)
+    if not refresh:
+        rows = cache.get(key)
+        if rows is not None:
+            return rows
+    daterange = week_range(year, week)
+    qargs = (
+        Q(report__start_date__gte=daterange[0], report__start_date__lte=daterange[1])
+        | Q(report__end_date__gte=daterange[0], report__end_date__lte=daterange[1])
+    ) & Q(header_from=domain)
+    category = Case(
+        When(dkim_result="pass", spf_result="pass", then=Value("aligned")),
+        When(Q(dkim_result="pass") | Q(spf_result="pass"), then=Value("trusted")),
+        When(
+            reason_type="local_policy",
+            reason_comment__startswith="arc=pass",
+            then=Value("forwarded"),
+        ),
+        default=Value("failed"),
+    )
+    rows = list(
+        models.Record.objects.filter(qargs)
+        .annotate(category=category)
+        .values("category", "source_ip", "dkim_result", "spf_result")
+        .annotate(total=Sum("count"))
+        .order_by()
+    )
+    cache.set(
+        key,
+        rows,
+        getattr(
+            settings,
+            "DMARC_STATS_CACHE_TIMEOUT",
+            constants.ALIGNMENT_STATS_CACHE_TIMEOUT,
+        ),
+    )
+    return rows
+
+
+def update_alignment_stats(domain, report) -> None:
+    """Precompute alignment statistics of the weeks covered by report."""
+    for year, week in get_report_weeks(report):
+        rows = get_alignment_rows(domain, year, week, refresh=True)
+        if param_tools.get_global_parameter("enable_rlookups"):
+            resolve_source_ips(row["source_ip"] for row in rows)
+
+
+def clear_alignment_stats(domain_ids, report) -> None:
+    """Drop cached statistics of the weeks covered by report."""
+    cache.delete_many(
+        [
+            get_alignment_stats_key(domain_id, year, week)
+            for domain_id in domain_ids
+            for year, week in get_report_weeks(report)
+        ]
+    )
+
+
+def insert_record(target: dict, row: dict, name: str) -> None:
+    """Add an aggregated record."""
     if name not in target:
         target[name] = {}
 
-    if record.source_ip not in target[name]:
-        target[name][record.source_ip] = {
+    if row["source_ip"] not in target[name]:
+        target[name][row["source_ip"]] = {
             "total": 0,
             "spf": {"success": 0, "failure": 0},
             "dkim": {"success": 0, "failure": 0},
         }
-    target[name][record.source_ip]["total"] += record.count
+    target[name][row["source_ip"]]["total"] += row["total"]
     for typ in ["spf", "dkim"]:
-        result = getattr(record, f"{typ}_result")
+        result = row[f"{typ}_result"]
         key = "success" if result == "pass" else "failure"
-        target[name][record.source_ip][typ][key] += record.count
+        target[name][row["source_ip"]][typ][key] += row["total"]
 
 
 def get_aligment_stats(domain, period=None) -> dict:
@@ -297,60 +664,17 @@ def get_aligment_stats(domain, period=None) -> dict:
     if not period:
         year, week, day = timezone.now().isocalendar()
         week -= 1
-        period = f"{year}-{week}"
     else:
         year, week = period.split("-")
-        if not year or not week:
-            period = f"{year}-{week}"
-
-    daterange = week_range(year, week)
-    qargs = (
-        Q(report__start_date__gte=daterange[0], report__start_date__lte=daterange[1])
-        | Q(report__end_date__gte=daterange[0], report__end_date__lte=daterange[1])
-    ) & Q(header_from=domain)
-    all_records = models.Record.objects.filter(qargs)
+    rows = get_alignment_rows(domain, int(year), int(week))
     stats: dict = {"aligned": {}, "trusted": {}, "forwarded": {}, "failed": {}}
 
     dns_names = {}
     if param_tools.get_global_parameter("enable_rlookups"):
-        dns_resolver = resolver.Resolver()
-        dns_resolver.timeout = 1.0
-        dns_resolver.lifetime = 1.0
+        dns_names = resolve_source_ips(row["source_ip"] for row in rows)
 
-        def get_domain_name_from_ip(ip):
-            addr = reversename.from_address(ip)
-            try:
-                resp = dns_resolver.query(addr, "PTR")
-                ext = tldextract.extract(str(resp[0].target))
-                if not ext.suffix:  # invalid PTR record
-                    raise resolver.NXDOMAIN()
-                return (ip, ".".join((ext.domain, ext.suffix)).lower())
-            except (
-                resolver.NXDOMAIN,
-                resolver.YXDOMAIN,
-                resolver.NoAnswer,
-                resolver.NoNameservers,
-                resolver.Timeout,
-            ):
-                return (None, None)
-
-        ips = (r.source_ip for r in all_records)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as pool:
-            dns_names = {
-                i: n for (i, n) in list(pool.map(get_domain_name_from_ip, ips))
-            }
-
-    for record in all_records:
-        name = dns_names.get(record.source_ip, _("Not resolved"))
-        if record.dkim_result == "pass" and record.spf_result == "pass":
-            insert_record(stats["aligned"], record, name)
-        elif record.dkim_result == "pass" or record.spf_result == "pass":
-            insert_record(stats["trusted"], record, name)
-        elif record.reason_type == "local_policy" and record.reason_comment.startswith(
-            "arc=pass"
-        ):
-            insert_record(stats["forwarded"], record, name)
-        else:
-            insert_record(stats["failed"], record, name)
+    for row in rows:
+        name = dns_names.get(row["source_ip"], _("Not resolved"))
+        insert_record(stats[row["category"]], row, name)
 
     return stats
@@ -1,8 +1,10 @@
 """Import a DMARC aggregated report."""
 
+import time
+
 from django.core.management.base import BaseCommand
 
-from ... import lib
+from ... import constants, lib
 
 
 class Command(BaseCommand):
@@ -31,12 +33,31 @@ class Command(BaseCommand):
         parser.add_argument(
             "--mailbox", default="INBOX", help="IMAP mailbox to import reports from"
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=constants.IMAP_BATCH_SIZE,
+            help="Number of messages fetched per IMAP command",
+        )
+        parser.add_argument(
+            "--connections",
+            type=int,
+            default=constants.IMAP_CONNECTIONS,
+            help="Number of IMAP connections used to fetch messages",
+        )
 
     def handle(self, *args, **options):
         """Entry point."""
+        start = time.monotonic()
         if options.get("pipe"):
-            lib.import_report_from_stdin()
+            count = lib.import_report_from_stdin()
         elif options.get("imap"):
-            lib.import_from_imap(options)
+            count = lib.import_from_imap(options)
         else:
             print("Nothing to do.")
+            return
+        elapsed = time.monotonic() - start
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{count} record(s) imported in {elapsed:.2f}s ({rate:.0f} rows/sec)"
+        )
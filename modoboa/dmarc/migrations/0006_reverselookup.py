@@ -0,0 +1,30 @@
+# Generated by Django 5.2.17 on 2026-10-19 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dmarc", "0005_auto_20230418_1201"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReverseLookup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ip", models.GenericIPAddressField(unique=True)),
+                ("name", models.CharField(blank=True, max_length=253)),
+                ("last_update", models.DateTimeField()),
+            ],
+        ),
+    ]
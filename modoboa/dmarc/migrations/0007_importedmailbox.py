@@ -0,0 +1,35 @@
+# Generated by Django 5.2.17 on 2026-10-19 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dmarc", "0006_reverselookup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportedMailbox",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("host", models.CharField(max_length=255)),
+                ("username", models.CharField(max_length=255)),
+                ("mailbox", models.CharField(max_length=255)),
+                ("uid_validity", models.BigIntegerField(default=0)),
+                ("last_uid", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "unique_together": {("host", "username", "mailbox")},
+            },
+        ),
+    ]
@@ -89,3 +89,38 @@ class Result(models.Model):
     type = models.CharField(max_length=4, choices=RECORD_TYPES)
     domain = models.CharField(max_length=100)
     result = models.CharField(max_length=9)
+
+
+class ReverseLookup(models.Model):
+    """Cached reverse lookup results.
+
+    ``name`` is the organizational domain the PTR record of ``ip``
+    points to, or an empty string if it can't be resolved.
+    """
+
+    ip = models.GenericIPAddressField(unique=True)
+    name = models.CharField(max_length=253, blank=True)
+    last_update = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.ip} -> {self.name}"
+
+
+class ImportedMailbox(models.Model):
+    """Import state of an IMAP mailbox.
+
+    Messages up to ``last_uid`` have already been processed, as long as
+    the UIDVALIDITY of the mailbox doesn't change.
+    """
+
+    host = models.CharField(max_length=255)
+    username = models.CharField(max_length=255)
+    mailbox = models.CharField(max_length=255)
+    uid_validity = models.BigIntegerField(default=0)
+    last_uid = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("host", "username", "mailbox")
+
+    def __str__(self):
+        return f"{self.username}@{self.host}/{self.mailbox}"
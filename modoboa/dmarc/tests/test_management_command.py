@@ -1,5 +1,14 @@
 """Management command tests."""
 
+import base64
+import io
+import os
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from modoboa.admin import factories as admin_factories
 from modoboa.lib.tests import ModoTestCase
 
@@ -7,6 +16,61 @@ from . import mixins
 from .. import models
 
 
+BODYSTRUCTURE = (
+    '(("TEXT" "PLAIN" ("CHARSET" "us-ascii") NIL NIL "7BIT" 10 1 NIL NIL NIL NIL)'
+    '("TEXT" "XML" ("NAME" "report.xml") NIL NIL "BASE64" {size} 10 NIL '
+    '("ATTACHMENT" ("FILENAME" "report.xml")) NIL NIL) '
+    '"MIXED" ("BOUNDARY" "xx") NIL NIL NIL)'
+)
+
+
+class IMAP4Mock:
+    """Fake IMAP server containing report messages."""
+
+    messages: dict = {}
+    commands: list = []
+    uid_validity: bytes | None = b"42"
+
+    def __init__(self, host):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def select(self, mailbox, readonly=False):
+        return "OK", [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        return code, [self.uid_validity]
+
+    def logout(self):
+        pass
+
+    def _uids(self, uidset):
+        result = []
+        for item in uidset.split(","):
+            start, _sep, stop = item.partition(":")
+            result += range(int(start), int(stop or start) + 1)
+        return [uid for uid in result if uid in self.messages]
+
+    def uid(self, command, *args):
+        self.commands.append((command,) + args)
+        if command == "SEARCH":
+            start = int(args[1].split(":")[0])
+            uids = [uid for uid in sorted(self.messages) if uid >= start]
+            uids = uids or [max(self.messages)]
+            return "OK", [" ".join(str(uid) for uid in uids).encode()]
+        data = []
+        for uid in self._uids(args[0]):
+            body = self.messages[uid]
+            if args[1] == "(BODYSTRUCTURE)":
+                bs = BODYSTRUCTURE.format(size=len(body))
+                data.append(f"{uid} (UID {uid} BODYSTRUCTURE {bs})".encode())
+                continue
+            data += [(f"{uid} (UID {uid} BODY[2] {{{len(body)}}}".encode(), body), b")"]
+        return "OK", data
+
+
 class ManagementCommandTestCase(mixins.CallCommandMixin, ModoTestCase):
     """Test management command."""
 
@@ -135,3 +199,132 @@ class ManagementCommandTestCase(mixins.CallCommandMixin, ModoTestCase):
         spf_result2 = results2.get(type="spf")
         self.assertEqual(spf_result2.domain, "ngyn.org")
         self.assertEqual(spf_result2.result, "pass")
+
+    def _build_report(self, report_id, count):
+        records = "".join(
+            f"""
+  <record>
+    <row>
+      <source_ip>203.0.113.{i}</source_ip>
+      <count>1</count>
+      <policy_evaluated>
+        <disposition>none</disposition>
+        <dkim>pass</dkim>
+        <spf>fail</spf>
+      </policy_evaluated>
+    </row>
+    <identifiers>
+      <header_from>{"mail." if i % 2 else ""}ngyn.org</header_from>
+    </identifiers>
+    <auth_results>
+      <dkim><domain>ngyn.org</domain><result>pass</result></dkim>
+      <spf><domain>ngyn.org</domain><result>fail</result></spf>
+    </auth_results>
+  </record>"""
+            for i in range(count)
+        )
+        return f"""<?xml version="1.0" encoding="UTF-8" ?>
+<feedback>
+  <report_metadata>
+    <org_name>testprovider.com</org_name>
+    <email>noreply-dmarc@testprovider.com</email>
+    <report_id>{report_id}</report_id>
+    <date_range><begin>1622592000</begin><end>1622678399</end></date_range>
+  </report_metadata>
+  <policy_published>
+    <domain>ngyn.org</domain><adkim>r</adkim><aspf>r</aspf>
+    <p>none</p><sp>none</sp><pct>100</pct>
+  </policy_published>{records}
+</feedback>""".encode()
+
+    def test_import_report_query_count(self):
+        """The number of queries must not depend on the number of records."""
+        from ..lib import import_report
+
+        # Reporter creation
+        import_report(self._build_report("first", 1))
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(import_report(self._build_report("small", 1)), 1)
+        with CaptureQueriesContext(connection) as big:
+            self.assertEqual(import_report(self._build_report("big", 100)), 100)
+        self.assertEqual(len(small), len(big))
+        report = models.Report.objects.get(report_id="big")
+        self.assertEqual(models.Record.objects.filter(report=report).count(), 100)
+        self.assertEqual(
+            models.Result.objects.filter(record__report=report).count(), 200
+        )
+        self.assertFalse(
+            models.Record.objects.exclude(header_from=self.domain).exists()
+        )
+
+    def test_import_rate(self):
+        out = self.import_report(
+            os.path.join(
+                os.path.dirname(__file__),
+                "reports",
+                "Report_Domain_ngyn.org_Submitter_fastmail.com_"
+                "Report-ID_2015.06.23.5672770.eml",
+            )
+        )
+        self.assertIn("rows/sec", out)
+
+    def test_import_from_imap(self):
+        IMAP4Mock.messages = {
+            uid: base64.b64encode(self._build_report(f"imap-{uid}", 2))
+            for uid in range(1, 8)
+        }
+        IMAP4Mock.commands = []
+        with (
+            mock.patch("imaplib.IMAP4", IMAP4Mock),
+            mock.patch("builtins.input", return_value="user@ngyn.org"),
+            mock.patch("getpass.getpass", return_value="password"),
+        ):
+            call_command(
+                "import_aggregated_report", "--imap", "--batch-size", "3"
+            )
+            self.assertEqual(
+                models.Report.objects.filter(report_id__startswith="imap-").count(),
+                7,
+            )
+            fetches = [cmd for cmd in IMAP4Mock.commands if cmd[0] == "FETCH"]
+            # 3 batches, 2 commands per batch
+            self.assertEqual(len(fetches), 6)
+            self.assertIn(("FETCH", "4:6", "(BODYSTRUCTURE)"), fetches)
+            self.assertIn(("FETCH", "4:6", "(BODY.PEEK[2])"), fetches)
+            state = models.ImportedMailbox.objects.get(username="user@ngyn.org")
+            self.assertEqual(state.last_uid, 7)
+
+            # Already processed messages are skipped
+            IMAP4Mock.commands = []
+            IMAP4Mock.messages[8] = base64.b64encode(self._build_report("imap-8", 1))
+            out = io.StringIO()
+            call_command("import_aggregated_report", "--imap", stdout=out)
+            self.assertIn("1 record(s) imported", out.getvalue())
+            self.assertIn(("FETCH", "8", "(BODYSTRUCTURE)"), IMAP4Mock.commands)
+            self.assertEqual(
+                models.ImportedMailbox.objects.get(pk=state.pk).last_uid, 8
+            )
+
+    def test_import_from_imap_without_uid_validity(self):
+        IMAP4Mock.messages = {
+            uid: base64.b64encode(self._build_report(f"imap-{uid}", 1))
+            for uid in range(1, 3)
+        }
+        IMAP4Mock.commands = []
+        with (
+            mock.patch("imaplib.IMAP4", IMAP4Mock),
+            mock.patch.object(IMAP4Mock, "uid_validity", None),
+            mock.patch("builtins.input", return_value="user@ngyn.org"),
+            mock.patch("getpass.getpass", return_value="password"),
+        ):
+            call_command("import_aggregated_report", "--imap")
+            self.assertEqual(
+                models.Report.objects.filter(report_id__startswith="imap-").count(),
+                2,
+            )
+            self.assertFalse(models.ImportedMailbox.objects.exists())
+
+            # Every message is scanned again
+            IMAP4Mock.commands = []
+            call_command("import_aggregated_report", "--imap")
+            self.assertIn(("FETCH", "1:2", "(BODYSTRUCTURE)"), IMAP4Mock.commands)
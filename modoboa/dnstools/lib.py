@@ -22,33 +22,35 @@ def _get_record_type_value(records, rr_type):
     return None
 
 
-def get_spf_record(domain):
+def get_spf_record(domain, resolver=None):
     """Return SPF record for domain (if any)."""
-    records = admin_lib.get_dns_records(domain, "TXT")
+    records = admin_lib.get_dns_records(domain, "TXT", resolver)
     return _get_record_type_value(records, "spf1")
 
 
-def get_dkim_record(domain, selector):
+def get_dkim_record(domain, selector, resolver=None):
     """Return DKIM records form domain (if any)."""
     name = f"{selector}._domainkey.{domain}"
-    records = admin_lib.get_dns_records(name, "TXT")
+    records = admin_lib.get_dns_records(name, "TXT", resolver)
     return _get_record_type_value(records, "DKIM1")
 
 
-def get_dmarc_record(domain):
+def get_dmarc_record(domain, resolver=None):
     """Return DMARC record for domain (if any)."""
     name = f"_dmarc.{domain}"
-    records = admin_lib.get_dns_records(name, "TXT")
+    records = admin_lib.get_dns_records(name, "TXT", resolver)
     return _get_record_type_value(records, "DMARC1")
 
 
-def _get_simple_record(name):
+def _get_simple_record(name, resolver=None, ipv6=None):
     """We just want to know if name is declared."""
     rtypes = ["A", "CNAME"]
-    if param_tools.get_global_parameter("enable_ipv6_mx_checks", app="admin"):
+    if ipv6 is None:
+        ipv6 = param_tools.get_global_parameter("enable_ipv6_mx_checks", app="admin")
+    if ipv6:
         rtypes.append("AAAA")
     for rdtype in rtypes:
-        records = admin_lib.get_dns_records(name, rdtype)
+        records = admin_lib.get_dns_records(name, rdtype, resolver)
         if records is not None:
             break
     else:
@@ -59,14 +61,23 @@ def _get_simple_record(name):
     return value
 
 
-def get_autoconfig_record(domain):
+def get_autoconfig_record(domain, resolver=None, ipv6=None):
     """Return autoconfig record for domain (if any)."""
-    return _get_simple_record(f"autoconfig.{domain}")
+    return _get_simple_record(f"autoconfig.{domain}", resolver, ipv6)
 
 
-def get_autodiscover_record(domain):
+def get_autodiscover_record(domain, resolver=None, ipv6=None):
     """Return autodiscover record for domain (if any)."""
-    return _get_simple_record(f"autodiscover.{domain}")
+    return _get_simple_record(f"autodiscover.{domain}", resolver, ipv6)
+
+
+def get_record(rtype, domain, selector=None, resolver=None, ipv6=None):
+    """Return the value of the given record type for domain (if any)."""
+    if rtype == "dkim":
+        return get_dkim_record(domain, selector, resolver)
+    if rtype in ["autoconfig", "autodiscover"]:
+        return _get_simple_record(f"{rtype}.{domain}", resolver, ipv6)
+    return globals()[f"get_{rtype}_record"](domain, resolver)
 
 
 class DNSSyntaxError(Exception):
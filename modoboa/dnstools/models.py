@@ -27,11 +27,16 @@ class DNSRecordManager(models.Manager):
         if record:
             return record
 
-        self.get_queryset().filter(domain=domain, type=rtype).delete()
         record = DNSRecord(domain=domain, type=rtype)
         record.get_dns_record()
-        if not record.value:
-            return
+        return self.store_for_domain(domain, rtype, record.value, ttl)
+
+    def store_for_domain(self, domain, rtype, value, ttl=7200):
+        """Replace DNS record of given type for domain by an already resolved value."""
+        self.get_queryset().filter(domain=domain, type=rtype).delete()
+        if not value:
+            return None
+        record = DNSRecord(domain=domain, type=rtype, value=value)
         record.check_syntax(ttl)
         record.save()
         return record
@@ -54,13 +59,9 @@ class DNSRecord(models.Model):
 
     def get_dns_record(self):
         """Retrieve corresponding DNS record."""
-        if self.type == "dkim":
-            self.value = lib.get_dkim_record(
-                self.domain.name, self.domain.dkim_key_selector
-            )
-        else:
-            func = getattr(lib, f"get_{self.type}_record")
-            self.value = func(self.domain.name)
+        self.value = lib.get_record(
+            self.type, self.domain.name, selector=self.domain.dkim_key_selector
+        )
 
     def check_syntax(self, ttl=7200):
         """Check record syntax."""
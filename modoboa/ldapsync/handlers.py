@@ -22,7 +22,7 @@ def sync_ldap_account(sender, instance, created, **kwargs):
     update_fields = kwargs.get("update_fields")
     if update_fields and "last_login" in update_fields:
         return
-    lib.update_ldap_account(instance, config)
+    lib.defer_account_write(lib.update_ldap_account, instance, config)
 
 
 @receiver(signals.pre_delete, sender=core_models.User)
@@ -33,4 +33,4 @@ def delete_ldap_account(sender, instance, **kwargs):
         return
     if instance.role != "SimpleUsers":
         return
-    lib.delete_ldap_account(instance, config)
+    lib.defer_account_write(lib.delete_ldap_account, instance, config)
@@ -1,20 +1,28 @@
 """LDAP related functions."""
 
+import functools
+import logging
 import os
+import threading
 
 import ldap
 import ldap.modlist as modlist
-from ldap.dn import escape_dn_chars
+from ldap.controls import SimplePagedResultsControl
+from ldap.dn import dn2str, escape_dn_chars, str2dn
 from ldap.filter import escape_filter_chars
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower
 from django.utils.encoding import force_bytes, force_str
 from django.utils.translation import gettext as _
 
-from modoboa.core import models as core_models
+from modoboa.core import constants as core_constants, models as core_models
 from modoboa.lib.email_utils import split_mailbox
 from modoboa.lib.exceptions import InternalError
 
+logger = logging.getLogger("modoboa.admin")
+
 
 def create_connection(srv_address, srv_port, config, username, password):
     """Create a new connection with given server."""
@@ -55,6 +63,58 @@ def get_connection(config, username=None, password=None):
     return conn
 
 
+# Errors meaning a connection must be opened again
+CONNECTION_ERRORS = (ldap.SERVER_DOWN, ldap.CONNECT_ERROR)
+
+# Settings used to open sync connections
+SYNC_CONNECTION_PARAMETERS = (
+    "ldap_server_address",
+    "ldap_server_port",
+    "ldap_enable_secondary_server",
+    "ldap_secondary_server_address",
+    "ldap_secondary_server_port",
+    "ldap_secured",
+    "ldap_sync_bind_dn",
+    "ldap_sync_bind_password",
+)
+
+_sync_connections: dict = {}
+_sync_connections_lock = threading.Lock()
+
+
+def _reset_sync_connections():
+    """Forget connections inherited from the parent process."""
+    global _sync_connections_lock
+
+    _sync_connections.clear()
+    _sync_connections_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_sync_connections)
+
+
+def get_sync_connection(config, reconnect=False):
+    """Return the connection shared by this process to write accounts.
+
+    It is opened and bound on first use, and opened again if
+    ``reconnect`` is True or if sync settings have changed.
+    """
+    key = tuple(config[name] for name in SYNC_CONNECTION_PARAMETERS)
+    with _sync_connections_lock:
+        conn = None if reconnect else _sync_connections.get(key)
+        if conn is None:
+            conn = _sync_connections[key] = get_connection(config)
+    return conn
+
+
+def call_with_sync_connection(config, func, *args):
+    """Call func with the shared connection, reconnecting once if lost."""
+    try:
+        return func(*args, get_sync_connection(config))
+    except CONNECTION_ERRORS:
+        return func(*args, get_sync_connection(config, reconnect=True))
+
+
 def get_user_password(user, disable=False):
     """Return ready-to-use password from user instance."""
     scheme, password = user.password.split("}")
@@ -82,6 +142,8 @@ def create_ldap_account(user, dn, conn):
     ldif = modlist.addModlist(attrs)
     try:
         conn.add_s(dn, ldif)
+    except CONNECTION_ERRORS:
+        raise
     except ldap.LDAPError as e:
         raise InternalError(_("Failed to create LDAP account: {}").format(e)) from None
 
@@ -95,6 +157,8 @@ def check_if_dn_exists(conn, dn):
             force_str("(&(objectClass=inetOrgPerson))"),
         )
         res = res[0][0]
+    except CONNECTION_ERRORS:
+        raise
     except ldap.LDAPError:
         return False
     return True
@@ -109,10 +173,11 @@ def _account_dn(config, username):
     return config["ldap_sync_account_dn_template"] % {"user": escape_dn_chars(username)}
 
 
-def update_ldap_account(user, config):
-    """Update existing account."""
+def update_ldap_account(user, config, conn=None):
+    """Update existing account (using the shared connection by default)."""
+    if conn is None:
+        return call_with_sync_connection(config, update_ldap_account, user, config)
     dn = _account_dn(config, user.username)
-    conn = get_connection(config)
     if not check_if_dn_exists(conn, dn):
         create_ldap_account(user, dn, conn)
         return
@@ -130,19 +195,24 @@ def update_ldap_account(user, config):
         ldif.append((ldap.MOD_REPLACE, "userPassword", password))
     try:
         conn.modify_s(dn, ldif)
+    except CONNECTION_ERRORS:
+        raise
     except ldap.LDAPError as e:
         raise InternalError(_("Failed to update LDAP account: {}").format(e)) from None
 
 
-def delete_ldap_account(user, config):
-    """Delete remote LDAP account."""
+def delete_ldap_account(user, config, conn=None):
+    """Delete remote LDAP account (using the shared connection by default)."""
+    if conn is None:
+        return call_with_sync_connection(config, delete_ldap_account, user, config)
     dn = _account_dn(config, user.username)
-    conn = get_connection(config)
     if not check_if_dn_exists(conn, dn):
         return
     if config["ldap_sync_delete_remote_account"]:
         try:
             conn.delete_s(dn)
+        except CONNECTION_ERRORS:
+            raise
         except ldap.LDAPError as e:
             raise InternalError(
                 _("Failed to delete LDAP account: {}").format(e)
@@ -152,31 +222,144 @@ def delete_ldap_account(user, config):
         ldif = [(ldap.MOD_REPLACE, "userPassword", password)]
         try:
             conn.modify_s(dn, ldif)
+        except CONNECTION_ERRORS:
+            raise
         except ldap.LDAPError as e:
             raise InternalError(
                 _("Failed to disable LDAP account: {}").format(e)
             ) from None
 
 
-def find_user_groups(conn, config, dn, entry):
-    """Retrieve groups for given user."""
+def _write_account(func, user, config):
+    """Call func(user, config), logging directory errors.
+
+    The database change is already committed: a failure can't roll it
+    back, so it is only reported.
+    """
+    try:
+        func(user, config)
+    except (InternalError, ldap.LDAPError) as err:
+        logger.error(
+            _("Failed to synchronize LDAP account %s: %s"), user.username, err
+        )
+
+
+def defer_account_write(func, user, config):
+    """Call func(user, config) once the current transaction is committed.
+
+    Nothing is written if the transaction (or the savepoint the write
+    belongs to) is rolled back. Errors are logged and don't reach the
+    caller since the transaction is already committed.
+    """
+    transaction.on_commit(
+        functools.partial(_write_account, func, user, config), robust=True
+    )
+
+
+def search_by_pages(conn, base, flt, attrlist=None):
+    """Search the directory using the paged results control.
+
+    :return: a generator of entry lists, one per page
+    """
+    page_size = getattr(
+        settings, "LDAP_IMPORT_PAGE_SIZE", core_constants.LDAP_IMPORT_PAGE_SIZE
+    )
+    control = SimplePagedResultsControl(True, size=page_size, cookie="")
+    while True:
+        msgid = conn.search_ext(
+            base, ldap.SCOPE_SUBTREE, flt, attrlist, serverctrls=[control]
+        )
+        _rtype, rdata, _rmsgid, serverctrls = conn.result3(msgid)
+        # Skip referrals
+        yield [(dn, entry) for dn, entry in rdata if dn]
+        cookie = next(
+            (
+                ctrl.cookie
+                for ctrl in serverctrls
+                if ctrl.controlType == SimplePagedResultsControl.controlType
+            ),
+            None,
+        )
+        if not cookie:
+            break
+        control.cookie = cookie
+
+
+def normalize_dn(dn):
+    """Return a canonical form of dn, suitable for comparisons."""
+    return dn2str(
+        [
+            [(attr.lower(), value.lower(), flags) for attr, value, flags in rdn]
+            for rdn in str2dn(dn)
+        ]
+    )
+
+
+def get_group_members(conn, dn, entry, attr):
+    """Return every value of the membership attribute of a group.
+
+    Active Directory returns large attributes in ranges (for example
+    ``member;range=0-1499``) so they are fetched until the last one.
+    """
+    members = list(entry.get(attr, []))
+    while True:
+        ranged = next(
+            (key for key in entry if key.lower().startswith(f"{attr.lower()};range=")),
+            None,
+        )
+        if ranged is None:
+            break
+        members += entry[ranged]
+        end = ranged.split("-")[-1]
+        if end == "*":
+            break
+        rattr = f"{attr};range={int(end) + 1}-*"
+        result = conn.search_s(dn, ldap.SCOPE_BASE, attrlist=[rattr])
+        entry = result[0][1] if result else {}
+    return [force_str(member) for member in members]
+
+
+def find_admin_group_members(conn, config):
+    """Retrieve the members of the admin groups using a single search.
+
+    :return: a set of normalized member DNs (or uids for posix groups)
+    """
+    names = [
+        grp.strip() for grp in config["ldap_admin_groups"].split(";") if grp.strip()
+    ]
+    if not names:
+        return set()
     condition = (
         config["ldap_is_active_directory"]
         or config["ldap_group_type"] == "groupofnames"
     )
-    if condition:
-        flt = f"(member={escape_filter_chars(dn)})"
-    elif config["ldap_group_type"] == "posixgroup":
-        uid = escape_filter_chars(force_str(entry["uid"][0]))
-        flt = f"(memberUid={uid})"
-
-    result = conn.search_s(config["ldap_groups_search_base"], ldap.SCOPE_SUBTREE, flt)
-    groups = []
-    for dn, _entry in result:
+    attr = "member" if condition else "memberUid"
+    flt = "(|{})".format("".join(f"(cn={escape_filter_chars(name)})" for name in names))
+    # Not paged: servers usually allow a single paged search per
+    # connection and the import search uses it
+    groups = conn.search_s(
+        config["ldap_groups_search_base"], ldap.SCOPE_SUBTREE, flt, [attr]
+    )
+    result = set()
+    for dn, entry in groups:
         if not dn:
             continue
-        groups.append(dn.split(",")[0].split("=")[1])
-    return groups
+        for member in get_group_members(conn, dn, entry, attr):
+            result.add(normalize_dn(member) if condition else member.lower())
+    return result
+
+
+def is_admin_group_member(config, dn, entry, admin_members):
+    """Check if an LDAP entry belongs to one of the admin groups."""
+    condition = (
+        config["ldap_is_active_directory"]
+        or config["ldap_group_type"] == "groupofnames"
+    )
+    if condition:
+        return normalize_dn(dn) in admin_members
+    if "uid" not in entry:
+        return False
+    return force_str(entry["uid"][0]).lower() in admin_members
 
 
 def user_is_disabled(config, entry):
@@ -189,58 +372,78 @@ def user_is_disabled(config, entry):
     return False
 
 
-def import_accounts_from_ldap(config):
-    """Import user accounts from LDAP directory."""
-    conn = get_connection(config)
-    result = conn.search_s(
-        config["ldap_import_search_base"],
-        ldap.SCOPE_SUBTREE,
-        config["ldap_import_search_filter"],
-    )
-    admin_groups = config["ldap_admin_groups"].split(";")
-    for dn, entry in result:
-        if dn is None:
-            continue
-        role = "SimpleUsers"
-        groups = find_user_groups(conn, config, dn, entry)
-        for grp in admin_groups:
-            if grp.strip() in groups:
-                role = "DomainAdmins"
+def get_ldap_username(config, dn, entry, role):
+    """Return the username of an LDAP entry (None if it must be skipped)."""
+    username = force_str(entry[config["ldap_import_username_attr"]][0])
+    lpart, domain = split_mailbox(username)
+    if domain is None:
+        # Try to find associated email
+        email = None
+        for attr in ["mail", "userPrincipalName"]:
+            if attr in entry:
+                email = force_str(entry[attr][0])
                 break
-        username = force_str(entry[config["ldap_import_username_attr"]][0])
-        lpart, domain = split_mailbox(username)
-        if domain is None:
-            # Try to find associated email
-            email = None
-            for attr in ["mail", "userPrincipalName"]:
-                if attr in entry:
-                    email = force_str(entry[attr][0])
-                    break
-            if email is None:
-                if grp == "SimpleUsers":
-                    print(f"Skipping {dn} because no email found")
-                    continue
-            else:
-                username = email
-        defaults = {
-            "username": username.lower(),
-            "is_local": False,
-            "language": settings.LANGUAGE_CODE,
-        }
-        user, created = core_models.User.objects.get_or_create(
-            username__iexact=username, defaults=defaults
-        )
-        if created:
+        if email is None:
+            if role == "SimpleUsers":
+                print(f"Skipping {dn} because no email found")
+                return None
+        else:
+            username = email
+    return username
+
+
+def import_accounts_page(config, entries, admin_members):
+    """Import the accounts of a page of LDAP entries."""
+    accounts = []
+    for dn, entry in entries:
+        role = "SimpleUsers"
+        if is_admin_group_member(config, dn, entry, admin_members):
+            role = "DomainAdmins"
+        username = get_ldap_username(config, dn, entry, role)
+        if username is not None:
+            accounts.append((username.lower(), role, entry))
+    qset = core_models.User.objects.annotate(lower_username=Lower("username")).filter(
+        lower_username__in=[username for username, _role, _entry in accounts]
+    )
+    users = {user.lower_username: user for user in qset}
+    attr_map = {"first_name": "givenName", "email": "mail", "last_name": "sn"}
+    for username, role, entry in accounts:
+        user = users.get(username)
+        if user is None:
+            user = core_models.User.objects.create(
+                username=username, is_local=False, language=settings.LANGUAGE_CODE
+            )
+            users[username] = user
             core_models.populate_callback(user, role)
+        values = {
+            attr: force_str(entry[ldap_attr][0])
+            for attr, ldap_attr in attr_map.items()
+            if ldap_attr in entry
+        }
+        values["is_active"] = not user_is_disabled(config, entry)
+        if all(getattr(user, attr) == value for attr, value in values.items()):
+            continue
+        for attr, value in values.items():
+            setattr(user, attr, value)
+        user.save()
 
-        attr_map = {"first_name": "givenName", "email": "mail", "last_name": "sn"}
-        for attr, ldap_attr in attr_map.items():
-            if ldap_attr in entry:
-                setattr(user, attr, force_str(entry[ldap_attr][0]))
-            user.is_active = not user_is_disabled(config, entry)
-            user.save()
+    # FIXME: handle delete and rename operations?
 
-        # FIXME: handle delete and rename operations?
+
+def import_accounts_from_ldap(config):
+    """Import user accounts from LDAP directory.
+
+    Admin groups members are retrieved first, then entries are
+    fetched and imported one page at a time.
+    """
+    conn = get_connection(config)
+    admin_members = find_admin_group_members(conn, config)
+    pages = search_by_pages(
+        conn, config["ldap_import_search_base"], config["ldap_import_search_filter"]
+    )
+    for entries in pages:
+        if entries:
+            import_accounts_page(config, entries, admin_members)
 
 
 def build_ldap_uri(config, node=""):
@@ -3,11 +3,14 @@
 import os
 import shutil
 import tempfile
-from unittest import skipIf
+from unittest import mock, skipIf
+
+from testfixtures import LogCapture
 
 from django.conf import settings
 from django.core.management import call_command
-from django.test import SimpleTestCase
+from django.db import transaction
+from django.test import SimpleTestCase, override_settings
 from django.utils.encoding import force_bytes, force_str
 
 from modoboa.core import factories as core_factories
@@ -43,6 +46,30 @@ class AccountDNTestCase(SimpleTestCase):
         self.assertTrue(dn.endswith(",ou=users,dc=example,dc=com"))
 
 
+@skipIf(NO_LDAP, "No ldap module installed")
+class AdminGroupMembersTestCase(SimpleTestCase):
+    """Admin groups membership resolution."""
+
+    def test_normalize_dn(self):
+        self.assertEqual(
+            lib.normalize_dn("CN=Mail Admin, OU=Users,DC=example,DC=com"),
+            lib.normalize_dn("cn=mail admin,ou=users,dc=example,dc=com"),
+        )
+
+    def test_ranged_members(self):
+        """Check that Active Directory ranged attributes are followed."""
+        conn = mock.Mock()
+        conn.search_s.return_value = [
+            ("cn=admins", {"member;range=2-*": [b"cn=user3", b"cn=user4"]})
+        ]
+        entry = {"member;range=0-1": [b"cn=user1", b"cn=user2"]}
+        members = lib.get_group_members(conn, "cn=admins", entry, "member")
+        self.assertEqual(members, ["cn=user1", "cn=user2", "cn=user3", "cn=user4"])
+        conn.search_s.assert_called_once_with(
+            "cn=admins", ldap.SCOPE_BASE, attrlist=["member;range=2-*"]
+        )
+
+
 @skipIf(NO_LDAP, "No ldap module installed")
 class DovecotConfFileTestCase(SimpleTestCase):
     """The generated dovecot conf must be protected against injection."""
@@ -132,18 +159,20 @@ class LDAPExportTestCase(ModoTestCase):
 
     def test_sync_user(self):
         self.reset_ldap_directory()
-        user = core_factories.UserFactory(
-            username=self.username,
-            first_name="Test",
-            last_name="LDAP",
-            groups=("SimpleUsers",),
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            user = core_factories.UserFactory(
+                username=self.username,
+                first_name="Test",
+                last_name="LDAP",
+                groups=("SimpleUsers",),
+            )
         self.assertTrue(lib.check_if_dn_exists(self.conn, self.dn))
 
         lib.get_connection(self.config, self.dn, "toto")
 
-        user.last_name = "LDAP Modif"
-        user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.last_name = "LDAP Modif"
+            user.save()
         lib.get_connection(self.config, self.dn, "toto")
 
         res = self.conn.search_s(
@@ -165,13 +194,15 @@ class LDAPExportTestCase(ModoTestCase):
 
     def test_delete_user(self):
         self.reset_ldap_directory()
-        user = core_factories.UserFactory(
-            username=self.username,
-            first_name="Test",
-            last_name="LDAP",
-            groups=("SimpleUsers",),
-        )
-        user.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = core_factories.UserFactory(
+                username=self.username,
+                first_name="Test",
+                last_name="LDAP",
+                groups=("SimpleUsers",),
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
         ldap_record = self.conn.search_s(
             force_str(self.dn),
             ldap.SCOPE_SUBTREE,
@@ -182,14 +213,75 @@ class LDAPExportTestCase(ModoTestCase):
         with self.assertRaises(ldap.INVALID_CREDENTIALS):
             lib.get_connection(self.config, self.dn, "toto")
 
+        with self.captureOnCommitCallbacks(execute=True):
+            user = core_factories.UserFactory(
+                username=self.username,
+                first_name="Test",
+                last_name="LDAP",
+                groups=("SimpleUsers",),
+            )
+        self.set_global_parameter("ldap_sync_delete_remote_account", True, app="core")
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        self.assertFalse(lib.check_if_dn_exists(self.conn, self.dn))
+
+    def test_sync_connection(self):
+        """Check that the sync connection is shared."""
+        conn = lib.get_sync_connection(self.config)
+        self.assertIs(lib.get_sync_connection(self.config), conn)
+        new_conn = lib.get_sync_connection(self.config, reconnect=True)
+        self.assertIsNot(new_conn, conn)
+        self.assertIs(lib.get_sync_connection(self.config), new_conn)
+
+    def test_sync_user_on_commit(self):
+        """Check that writes are sent once the transaction is committed."""
+        self.reset_ldap_directory()
+        with self.captureOnCommitCallbacks() as callbacks:
+            user = core_factories.UserFactory(
+                username=self.username,
+                first_name="Test",
+                last_name="LDAP",
+                groups=("SimpleUsers",),
+            )
+            user.last_name = "LDAP Modif"
+            user.save()
+            self.assertFalse(lib.check_if_dn_exists(self.conn, self.dn))
+        for callback in callbacks:
+            callback()
+        res = self.conn.search_s(
+            force_str(self.dn),
+            ldap.SCOPE_SUBTREE,
+            force_str("(&(objectClass=inetOrgPerson))"),
+        )
+        self.assertEqual(res[0][1]["sn"], [b"LDAP Modif"])
+
+    def test_sync_user_error_after_commit(self):
+        """Check that directory errors are logged once committed."""
+        self.reset_ldap_directory()
         user = core_factories.UserFactory(
-            username=self.username,
-            first_name="Test",
-            last_name="LDAP",
-            groups=("SimpleUsers",),
+            username=self.username, groups=("SimpleUsers",)
         )
-        self.set_global_parameter("ldap_sync_delete_remote_account", True, app="core")
-        user.delete()
+        with mock.patch.object(
+            lib, "update_ldap_account", side_effect=InternalError("error")
+        ):
+            with LogCapture("modoboa.admin") as log:
+                with self.captureOnCommitCallbacks(execute=True):
+                    user.last_name = "LDAP Modif"
+                    user.save()
+        self.assertIn(f"Failed to synchronize LDAP account {self.username}", str(log))
+        user.refresh_from_db()
+        self.assertEqual(user.last_name, "LDAP Modif")
+
+    def test_sync_user_rolled_back(self):
+        """Check that writes of rolled back savepoints are dropped."""
+        self.reset_ldap_directory()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    core_factories.UserFactory(
+                        username=self.username, groups=("SimpleUsers",)
+                    )
+                    raise RuntimeError
         self.assertFalse(lib.check_if_dn_exists(self.conn, self.dn))
 
 
@@ -223,3 +315,16 @@ class LDAPImportTestCase(ModoTestCase):
         )
         admin = core_models.User.objects.get(username="mailadmin@example.com")
         self.assertEqual(admin.role, "DomainAdmins")
+
+    @override_settings(LDAP_IMPORT_PAGE_SIZE=1)
+    def test_import_from_ldap_by_pages(self):
+        """Check import when entries are spread over several pages."""
+        call_command("import_from_ldap_directory")
+        admin = core_models.User.objects.get(username="mailadmin@example.com")
+        self.assertEqual(admin.role, "DomainAdmins")
+        user = core_models.User.objects.get(username="testuser@example.com")
+        self.assertEqual(user.role, "SimpleUsers")
+        # Importing again must not create duplicates
+        count = core_models.User.objects.count()
+        call_command("import_from_ldap_directory")
+        self.assertEqual(core_models.User.objects.count(), count)
@@ -0,0 +1,22 @@
+"""Database related tools."""
+
+from django.db import connection
+
+
+def bulk_insert(model, objects: list, key: str, **filters) -> list:
+    """Insert objects using as few queries as possible.
+
+    Primary keys are set even if the database backend cannot return
+    them from bulk inserts: they are fetched back using ``key``, which
+    must identify objects matching ``filters``.
+    """
+    model.objects.bulk_create(objects)
+    if objects and not connection.features.can_return_rows_from_bulk_insert:
+        pks = dict(
+            model.objects.filter(
+                **{f"{key}__in": [getattr(obj, key) for obj in objects]}, **filters
+            ).values_list(key, "pk")
+        )
+        for obj in objects:
+            obj.pk = pks[getattr(obj, key)]
+    return objects
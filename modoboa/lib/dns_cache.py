@@ -0,0 +1,233 @@
+"""Process-wide cache for DNS answers.
+
+Answers are kept as long as their TTL allows it. Negative answers
+(NXDOMAIN, no answer) are cached too, using the TTL of the SOA record
+returned with them (RFC 2308).
+
+By default, entries are stored in memory. Set ``DNS_CACHE_BACKEND``
+to ``"redis"`` to share them between all processes (RQ workers for
+example).
+"""
+
+import json
+import threading
+import time
+
+import dns.rdataclass
+import dns.rdatatype
+import dns.resolver
+import dns.rrset
+
+from django.conf import settings
+
+from modoboa.lib.redis import get_redis_connection
+
+DEFAULT_MAX_TTL = 86400
+DEFAULT_MAX_ENTRIES = 100000
+KEY_PREFIX = "modoboa:dns"
+
+NEGATIVE_ANSWERS = {
+    "NXDOMAIN": dns.resolver.NXDOMAIN,
+    "NoAnswer": dns.resolver.NoAnswer,
+}
+
+
+def _get_negative_ttl(error: dns.resolver.NXDOMAIN | dns.resolver.NoAnswer):
+    """Return the TTL to apply to a negative answer (if any)."""
+    if isinstance(error, dns.resolver.NXDOMAIN):
+        responses = list((error.kwargs.get("responses") or {}).values())
+    else:
+        responses = [error.kwargs.get("response")]
+    ttls = [
+        min(rrset.ttl, rrset[0].minimum)
+        for response in responses
+        if response is not None
+        for rrset in response.authority
+        if rrset.rdtype == dns.rdatatype.SOA
+    ]
+    if not ttls:
+        return None
+    return min(ttls)
+
+
+class CachedAnswer:
+    """Answer returned from the cache.
+
+    It behaves like the parts of :class:`dns.resolver.Answer` used in
+    modoboa: ``rrset``, iteration, indexing and length.
+    """
+
+    def __init__(self, rrset: dns.rrset.RRset):
+        self.rrset = rrset
+
+    def __iter__(self):
+        return iter(self.rrset)
+
+    def __len__(self):
+        return len(self.rrset)
+
+    def __getitem__(self, index):
+        return self.rrset[index]
+
+
+class DNSCache:
+    """DNS answers cache."""
+
+    def __init__(self):
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, "DNS_CACHE_ENABLED", True)
+
+    @property
+    def use_redis(self) -> bool:
+        return getattr(settings, "DNS_CACHE_BACKEND", "local") == "redis"
+
+    @property
+    def max_ttl(self) -> int:
+        return getattr(settings, "DNS_CACHE_MAX_TTL", DEFAULT_MAX_TTL)
+
+    def _get_key(self, resolver, qname, rdtype, options: dict) -> str:
+        """Return the key of an answer.
+
+        Answers depend on the queried servers and on the options
+        (``search`` for example) too.
+        """
+        name = str(qname).rstrip(".").lower()
+        rdtype = dns.rdatatype.to_text(dns.rdatatype.RdataType.make(rdtype))
+        # The dns.resolver module itself is used for the system resolver
+        nameservers = getattr(resolver, "nameservers", None) or []
+        servers = ",".join(str(server) for server in nameservers)
+        options = ",".join(f"{key}={value}" for key, value in sorted(options.items()))
+        return f"{KEY_PREFIX}:{name}:{rdtype}:{servers}:{options}"
+
+    def _get(self, key: str) -> dict | None:
+        if self.use_redis:
+            value = get_redis_connection(hget_return_type=None).get(key)
+            if value is None:
+                return None
+            entry = json.loads(value)
+            if "records" in entry:
+                entry["records"] = dns.rrset.from_text_list(
+                    entry["name"],
+                    entry["ttl"],
+                    dns.rdataclass.IN,
+                    entry["rdtype"],
+                    entry["records"],
+                )
+            return entry
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry
+
+    def _set(self, key: str, entry: dict, ttl: int) -> None:
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        if self.use_redis:
+            value = dict(entry)
+            if "records" in value:
+                rrset = value["records"]
+                value["name"] = rrset.name.to_text()
+                value["ttl"] = rrset.ttl
+                value["records"] = [record.to_text() for record in rrset]
+            get_redis_connection(hget_return_type=None).set(
+                key, json.dumps(value), ex=ttl
+            )
+            return
+        entry["expires"] = time.monotonic() + ttl
+        max_entries = getattr(settings, "DNS_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        with self._lock:
+            if len(self._entries) >= max_entries:
+                now = time.monotonic()
+                self._entries = {
+                    key: entry
+                    for key, entry in self._entries.items()
+                    if entry["expires"] >= now
+                }
+                if len(self._entries) >= max_entries:
+                    self._entries.clear()
+            self._entries[key] = entry
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        if self.use_redis:
+            get_redis_connection(hget_return_type=None).incr(
+                f"{KEY_PREFIX}:stats:{counter}"
+            )
+
+    def resolve(self, resolver, qname, rdtype="A", **kwargs):
+        """Resolve qname using resolver, unless a valid answer is cached.
+
+        The same exceptions than the ones raised by
+        :meth:`dns.resolver.Resolver.resolve` are raised. Transient
+        errors (timeouts, no nameservers) are never cached.
+        """
+        if not self.enabled:
+            return resolver.resolve(qname, rdtype, **kwargs)
+        key = self._get_key(resolver, qname, rdtype, kwargs)
+        entry = self._get(key)
+        if entry is not None:
+            self._count("hits")
+            if "error" in entry:
+                raise NEGATIVE_ANSWERS[entry["error"]]()
+            return CachedAnswer(entry["records"])
+        self._count("misses")
+        try:
+            answer = resolver.resolve(qname, rdtype, **kwargs)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as error:
+            ttl = _get_negative_ttl(error)
+            if ttl is not None:
+                self._set(key, {"error": type(error).__name__}, ttl)
+            raise
+        rrset = getattr(answer, "rrset", None)
+        if rrset is not None:
+            self._set(key, {"rdtype": int(rrset.rdtype), "records": rrset}, rrset.ttl)
+        return answer
+
+    def get_stats(self) -> dict:
+        """Return hit and miss counters.
+
+        Counters are global when redis is used, process-wide otherwise.
+        """
+        if not self.use_redis:
+            return {"hits": self.hits, "misses": self.misses}
+        rclient = get_redis_connection(hget_return_type=None)
+        return {
+            counter: int(rclient.get(f"{KEY_PREFIX}:stats:{counter}") or 0)
+            for counter in ["hits", "misses"]
+        }
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+        if self.use_redis:
+            rclient = get_redis_connection(hget_return_type=None)
+            keys = list(rclient.scan_iter(f"{KEY_PREFIX}:*"))
+            if keys:
+                rclient.delete(*keys)
+
+
+cache = DNSCache()
+
+
+def resolve(resolver, qname, rdtype="A", **kwargs):
+    """Shortcut to resolve a name through the process-wide cache."""
+    return cache.resolve(resolver, qname, rdtype, **kwargs)
+
+
+def get_stats() -> dict:
+    """Shortcut to get the process-wide cache counters."""
+    return cache.get_stats()
@@ -20,7 +20,10 @@ additional settings:
   (defaults to 10)
 """
 
+import abc
 import base64
+import os
+import threading
 
 from django.conf import settings
 from django.utils.encoding import force_str
@@ -32,23 +35,100 @@ from modoboa.lib.sysutils import doveadm_cmd
 DOVECOT_OPERATION_MODE_CMD = "cmd"
 DOVECOT_OPERATION_MODE_REST = "rest"
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def _reset_session():
+    """Forget the session inherited from the parent process."""
+    global _session, _session_lock
+
+    _session = None
+    _session_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_session)
+
+
+def get_http_session() -> requests.Session:
+    """Return the HTTP session shared by this process.
+
+    Connections to the doveadm HTTP API are kept alive between requests.
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = requests.Session()
+    return _session
+
 
 class DoveadmError(Exception):
     """Raised when a doveadm operation fails, whatever the backend."""
 
 
-class DoveadmCmdBackend:
-    """Talk to Dovecot using the doveadm command line tool."""
+class DoveadmBatch:
+    """Doveadm commands sent to Dovecot at once.
 
-    def get_user_home(self, address: str) -> str:
-        """Return the home directory of the given user."""
-        try:
-            code, output = doveadm_cmd(["user", "-f", "home", address])
-        except OSError as err:
-            raise DoveadmError(str(err)) from err
-        if code:
-            raise DoveadmError(force_str(output))
-        return force_str(output).strip()
+    Commands are queued and sent when the ``with`` block exits (a
+    single request in ``rest`` mode). ``results`` then contains, for
+    each command, its output or the ``DoveadmError`` it raised.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.commands: list = []
+        self.results: list = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def send(self) -> list:
+        """Send queued commands and return their results."""
+        if self.commands:
+            self.results += self.backend.run_commands(self.commands)
+            self.commands = []
+        return self.results
+
+    def move_message(self, *args) -> None:
+        self.commands.append(self.backend.get_move_message_command(*args))
+
+    def delete_mailbox_if_empty(self, user: str, mailbox: str) -> None:
+        self.commands.append(
+            self.backend.get_delete_mailbox_if_empty_command(user, mailbox)
+        )
+
+    def recalculate_quota(self, user: str) -> None:
+        self.commands.append(self.backend.get_recalculate_quota_command(user))
+
+
+class DoveadmBackend(abc.ABC):
+    """Operations shared by all backends.
+
+    Backends build native commands and run them using ``run_commands``.
+    """
+
+    def batch(self) -> DoveadmBatch:
+        """Return a new batch of commands."""
+        return DoveadmBatch(self)
+
+    @abc.abstractmethod
+    def run_commands(self, commands: list) -> list:
+        """Run native commands and return their results.
+
+        A failed command gets a ``DoveadmError`` as result.
+        """
+
+    def _run_command(self, command):
+        result = self.run_commands([command])[0]
+        if isinstance(result, DoveadmError):
+            raise result
+        return result
 
     def move_message(
         self,
@@ -59,44 +139,76 @@ class DoveadmCmdBackend:
         header_value: str,
     ) -> None:
         """Move message(s) matching the given header to destination."""
-        try:
-            code, output = doveadm_cmd(
-                [
-                    "move",
-                    "-u",
-                    user,
-                    destination,
-                    "mailbox",
-                    source_mailbox,
-                    "header",
-                    header_name,
-                    header_value,
-                ]
+        self._run_command(
+            self.get_move_message_command(
+                user, destination, source_mailbox, header_name, header_value
             )
-        except OSError as err:
-            raise DoveadmError(str(err)) from err
-        if code:
-            raise DoveadmError(force_str(output))
+        )
+
+    def recalculate_quota(self, user: str) -> None:
+        """Recalculate the quota usage of the given user."""
+        self._run_command(self.get_recalculate_quota_command(user))
+
+
+class DoveadmCmdBackend(DoveadmBackend):
+    """Talk to Dovecot using the doveadm command line tool."""
+
+    def run_commands(self, commands: list) -> list:
+        """Run commands one after the other."""
+        results = []
+        for args in commands:
+            try:
+                code, output = doveadm_cmd(args)
+            except OSError as err:
+                results.append(DoveadmError(str(err)))
+                continue
+            output = force_str(output)
+            results.append(DoveadmError(output) if code else output)
+        return results
+
+    def get_user_home(self, address: str) -> str:
+        """Return the home directory of the given user."""
+        return self._run_command(["user", "-f", "home", address]).strip()
+
+    def get_move_message_command(
+        self,
+        user: str,
+        destination: str,
+        source_mailbox: str,
+        header_name: str,
+        header_value: str,
+    ) -> list:
+        return [
+            "move",
+            "-u",
+            user,
+            destination,
+            "mailbox",
+            source_mailbox,
+            "header",
+            header_name,
+            header_value,
+        ]
+
+    def get_delete_mailbox_if_empty_command(self, user: str, mailbox: str) -> list:
+        return ["mailbox", "delete", "-u", user, "-s", "-e", mailbox]
+
+    def get_recalculate_quota_command(self, user: str) -> list:
+        return ["quota", "recalc", "-u", user]
 
     def delete_mailbox_if_empty(self, user: str, mailbox: str) -> None:
         """Delete the given mailbox if it is empty. Best effort."""
         try:
-            doveadm_cmd(["mailbox", "delete", "-u", user, "-s", "-e", mailbox])
+            doveadm_cmd(self.get_delete_mailbox_if_empty_command(user, mailbox))
         except OSError as err:
             raise DoveadmError(str(err)) from err
 
     def list_password_schemes(self) -> str:
         """Return password schemes supported by Dovecot."""
-        try:
-            code, output = doveadm_cmd(["pw", "-l"])
-        except OSError as err:
-            raise DoveadmError(str(err)) from err
-        if code:
-            raise DoveadmError(force_str(output))
-        return force_str(output)
+        return self._run_command(["pw", "-l"])
 
 
-class DoveadmHTTPBackend:
+class DoveadmHTTPBackend(DoveadmBackend):
     """Talk to Dovecot using the doveadm HTTP API."""
 
     def __init__(self):
@@ -114,8 +226,8 @@ class DoveadmHTTPBackend:
             )
         self.timeout = getattr(settings, "DOVEADM_API_TIMEOUT", 10)
 
-    def _run_command(self, name: str, parameters: dict) -> list:
-        """Run a doveadm command through the HTTP API.
+    def run_commands(self, commands: list) -> list:
+        """Run doveadm commands through a single HTTP API request.
 
         The API expects a list of commands ([name, parameters, tag]) and
         returns a list of responses ([type, data, tag]).
@@ -125,10 +237,14 @@ class DoveadmHTTPBackend:
             "Authorization": f"X-Dovecot-API {token}",
             "Content-Type": "application/json",
         }
+        payload = [
+            [name, parameters, f"c{index}"]
+            for index, (name, parameters) in enumerate(commands, start=1)
+        ]
         try:
-            response = requests.post(
+            response = get_http_session().post(
                 self.url,
-                json=[[name, parameters, "c1"]],
+                json=payload,
                 headers=headers,
                 timeout=self.timeout,
             )
@@ -137,17 +253,25 @@ class DoveadmHTTPBackend:
         except (requests.RequestException, ValueError) as err:
             raise DoveadmError(f"doveadm HTTP API request failed: {err}") from err
         try:
-            rtype, data = content[0][0], content[0][1]
-        except (IndexError, TypeError) as err:
+            responses = {tag: (rtype, data) for rtype, data, tag in content}
+        except (TypeError, ValueError) as err:
             raise DoveadmError(
                 f"unexpected response from doveadm HTTP API: {content}"
             ) from err
-        if rtype == "error":
-            raise DoveadmError(f"doveadm command {name} failed: {data}")
-        return data
+        results = []
+        for name, _parameters, tag in payload:
+            if tag not in responses:
+                results.append(DoveadmError(f"no response to doveadm command {name}"))
+                continue
+            rtype, data = responses[tag]
+            if rtype == "error":
+                results.append(DoveadmError(f"doveadm command {name} failed: {data}"))
+            else:
+                results.append(data)
+        return results
 
     def get_user_home(self, address: str) -> str:
-        data = self._run_command("user", {"userMask": [address]})
+        data = self._run_command(("user", {"userMask": [address]}))
         # Response is a list of userdb field dicts, possibly keyed by
         # user name depending on the Dovecot version.
         for entry in data:
@@ -160,15 +284,15 @@ class DoveadmHTTPBackend:
                     return value["home"]
         raise DoveadmError(f"failed to retrieve home directory of {address}")
 
-    def move_message(
+    def get_move_message_command(
         self,
         user: str,
         destination: str,
         source_mailbox: str,
         header_name: str,
         header_value: str,
-    ) -> None:
-        self._run_command(
+    ) -> tuple:
+        return (
             "move",
             {
                 "user": user,
@@ -183,8 +307,8 @@ class DoveadmHTTPBackend:
             },
         )
 
-    def delete_mailbox_if_empty(self, user: str, mailbox: str) -> None:
-        self._run_command(
+    def get_delete_mailbox_if_empty_command(self, user: str, mailbox: str) -> tuple:
+        return (
             "mailboxDelete",
             {
                 "user": user,
@@ -194,6 +318,12 @@ class DoveadmHTTPBackend:
             },
         )
 
+    def get_recalculate_quota_command(self, user: str) -> tuple:
+        return ("quotaRecalc", {"user": user})
+
+    def delete_mailbox_if_empty(self, user: str, mailbox: str) -> None:
+        self._run_command(self.get_delete_mailbox_if_empty_command(user, mailbox))
+
     def list_password_schemes(self) -> str:
         # 'doveadm pw' is a local command, not exposed through the HTTP
         # API. Use the DOVECOT_SUPPORTED_SCHEMES setting instead.
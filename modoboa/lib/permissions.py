@@ -80,10 +80,62 @@ def grant_access_to_object(user, obj, is_owner=False):
     entry.save()
     if not created or not is_owner:
         return
-    for su in User.objects.filter(is_superuser=True):
-        if su == user:
-            continue
-        ObjectAccess.objects.get_or_create(user=su, content_type=ct, object_id=obj.id)
+    superusers = User.objects.filter(is_superuser=True).exclude(pk=user.pk)
+    grant_access_to_objects_for_users(superusers, [obj], ct)
+
+
+def grant_access_to_objects_for_users(users, objects, ct):
+    """Grant access to a collection of objects for several users
+
+    Missing entries are inserted using a single query, existing ones
+    are left untouched. Ownership is never granted here since it must
+    go through ``grant_access_to_object``.
+
+    :param users: a list of ``User`` objects
+    :param objects: a list of objects sharing the same type
+    :param ct: the content type
+    """
+    entries = [
+        ObjectAccess(user=user, content_type=ct, object_id=obj.id)
+        for user in users
+        for obj in objects
+    ]
+    if not entries:
+        return
+    ObjectAccess.objects.bulk_create(
+        entries,
+        batch_size=core_constants.OBJECT_ACCESS_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    # bulk_create does not send post_save
+    ObjectAccess.invalidate_caches()
+
+
+def grant_ownership_of_objects(user, objects, ct, superusers=None):
+    """Make a user the owner of a collection of new objects
+
+    Bulk counterpart of ``grant_access_to_object(user, obj, True)``:
+    superusers also get access to the objects and
+    ``objects_bulk_created`` is sent for the new entries.
+
+    :param user: a ``User`` object
+    :param objects: a list of objects sharing the same type
+    :param ct: the content type
+    :param superusers: list of superusers (fetched if not provided)
+    """
+    entries = ObjectAccess.objects.bulk_create(
+        [
+            ObjectAccess(user=user, content_type=ct, object_id=obj.id, is_owner=True)
+            for obj in objects
+        ],
+        batch_size=core_constants.OBJECT_ACCESS_BATCH_SIZE,
+    )
+    core_signals.objects_bulk_created.send(sender=ObjectAccess, objects=entries)
+    if superusers is None:
+        superusers = User.objects.filter(is_superuser=True).exclude(pk=user.pk)
+    else:
+        superusers = [superuser for superuser in superusers if superuser != user]
+    grant_access_to_objects_for_users(superusers, objects, ct)
 
 
 def grant_access_to_objects(user, objects, ct):
@@ -96,8 +148,7 @@ def grant_access_to_objects(user, objects, ct):
     :param objects: a list of objects
     :param ct: the content type
     """
-    for obj in objects:
-        ObjectAccess.objects.get_or_create(user=user, content_type=ct, object_id=obj.id)
+    grant_access_to_objects_for_users([user], objects, ct)
 
 
 def ungrant_access_to_object(obj, user=None):
@@ -133,9 +184,12 @@ def ungrant_access_to_objects(objects):
 
     :param objects: a list of objects inheriting from ``models.Model``
     """
+    ids_by_ct: dict = {}
     for obj in objects:
         ct = ContentType.objects.get_for_model(obj)
-        ObjectAccess.objects.filter(content_type=ct, object_id=obj.id).delete()
+        ids_by_ct.setdefault(ct, []).append(obj.id)
+    for ct, ids in ids_by_ct.items():
+        ObjectAccess.objects.filter(content_type=ct, object_id__in=ids).delete()
 
 
 def get_object_owner(obj):
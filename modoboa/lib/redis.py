@@ -1,17 +1,68 @@
+import os
+import threading
+
 import redis
+import redis.sentinel
 
 from django.conf import settings
 
+_pools: dict = {}
+_pools_lock = threading.Lock()
 
-def get_redis_connection(hget_return_type=int) -> redis.Redis:
-    """Return a client connection to Redis server."""
+
+def _reset_pools():
+    """Forget pools inherited from the parent process."""
+    global _pools_lock
+
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_pools)
+
+
+def _get_pool_key() -> tuple:
+    """Return a key identifying current connection settings."""
     if not getattr(settings, "REDIS_SENTINEL", False):
-        rclient = redis.from_url(settings.REDIS_URL)
-    else:
-        sentinel = redis.sentinel.Sentinel(
-            settings.REDIS_SENTINELS, socket_timeout=0.1, db=settings.REDIS_QUOTA_DB
-        )
-        rclient = sentinel.master_for(settings.REDIS_MASTER, socket_timeout=0.1)
+        return ("url", settings.REDIS_URL)
+    return (
+        "sentinel",
+        tuple(tuple(sentinel) for sentinel in settings.REDIS_SENTINELS),
+        settings.REDIS_MASTER,
+        settings.REDIS_QUOTA_DB,
+    )
+
+
+def _create_pool(key: tuple) -> redis.ConnectionPool:
+    if key[0] == "url":
+        return redis.ConnectionPool.from_url(settings.REDIS_URL)
+    sentinel = redis.sentinel.Sentinel(
+        settings.REDIS_SENTINELS, socket_timeout=0.1, db=settings.REDIS_QUOTA_DB
+    )
+    return sentinel.master_for(
+        settings.REDIS_MASTER, socket_timeout=0.1
+    ).connection_pool
+
+
+def get_connection_pool() -> redis.ConnectionPool:
+    """Return the connection pool shared by this process."""
+    key = _get_pool_key()
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = _create_pool(key)
+    return pool
+
+
+def get_redis_connection(hget_return_type=int) -> redis.Redis:
+    """Return a client connection to Redis server.
+
+    Clients are cheap: they share the connection pool of the current
+    process and only hold their own response callbacks.
+    """
+    rclient = redis.Redis(connection_pool=get_connection_pool())
     if hget_return_type:
         rclient.set_response_callback("HGET", hget_return_type)
     return rclient
@@ -0,0 +1,156 @@
+"""Tests for the DNS answers cache."""
+
+from unittest import mock
+
+import dns.message
+import dns.name
+import dns.rrset
+import dns.resolver
+
+from django.test import SimpleTestCase, override_settings
+
+from modoboa.lib import dns_cache
+
+
+class Answer:
+    """Minimal dns.resolver.Answer replacement."""
+
+    def __init__(self, rrset):
+        self.rrset = rrset
+
+    def __iter__(self):
+        return iter(self.rrset)
+
+    def __getitem__(self, index):
+        return self.rrset[index]
+
+
+def make_answer(name, rdtype, ttl, *records):
+    return Answer(dns.rrset.from_text(name, ttl, "IN", rdtype, *records))
+
+
+def make_nxdomain(name, soa_ttl=3600, minimum=300):
+    qname = dns.name.from_text(name)
+    response = dns.message.make_response(dns.message.make_query(qname, "A"))
+    response.authority.append(
+        dns.rrset.from_text(
+            "example.com.",
+            soa_ttl,
+            "IN",
+            "SOA",
+            f"ns.example.com. admin.example.com. 1 7200 3600 1209600 {minimum}",
+        )
+    )
+    return dns.resolver.NXDOMAIN(qnames=[qname], responses={qname: response})
+
+
+class DNSCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = dns_cache.DNSCache()
+        self.resolver = mock.Mock(nameservers=["192.0.2.53"])
+
+    def test_positive_answer(self):
+        self.resolver.resolve.return_value = make_answer(
+            "example.com.", "MX", 300, "10 mx.example.com."
+        )
+        for _i in range(3):
+            answer = self.cache.resolve(self.resolver, "Example.com", "MX")
+            self.assertEqual(str(answer[0].exchange), "mx.example.com.")
+        self.resolver.resolve.assert_called_once_with("Example.com", "MX")
+        self.assertEqual(self.cache.get_stats(), {"hits": 2, "misses": 1})
+        self.assertEqual(answer.rrset, self.resolver.resolve.return_value.rrset)
+        self.assertEqual(len(answer), 1)
+
+        # Same name and type, different spelling
+        self.cache.resolve(self.resolver, dns.name.from_text("example.com"), "MX")
+        self.assertEqual(self.resolver.resolve.call_count, 1)
+
+    def test_resolver_options(self):
+        """Answers from other servers or with other options are not shared."""
+        self.resolver.resolve.return_value = make_answer(
+            "example.com.", "A", 300, "192.0.2.1"
+        )
+        self.cache.resolve(self.resolver, "example.com")
+        self.cache.resolve(self.resolver, "example.com", search=True)
+        self.assertEqual(self.resolver.resolve.call_count, 2)
+        self.resolver.nameservers = ["192.0.2.54"]
+        self.cache.resolve(self.resolver, "example.com")
+        self.assertEqual(self.resolver.resolve.call_count, 3)
+
+    def test_ttl_expiration(self):
+        self.resolver.resolve.return_value = make_answer(
+            "example.com.", "A", 60, "192.0.2.1"
+        )
+        with mock.patch("time.monotonic", return_value=1000):
+            self.cache.resolve(self.resolver, "example.com")
+        with mock.patch("time.monotonic", return_value=1059):
+            self.cache.resolve(self.resolver, "example.com")
+        self.assertEqual(self.resolver.resolve.call_count, 1)
+        with mock.patch("time.monotonic", return_value=1061):
+            self.cache.resolve(self.resolver, "example.com")
+        self.assertEqual(self.resolver.resolve.call_count, 2)
+
+    def test_negative_answer(self):
+        self.resolver.resolve.side_effect = make_nxdomain("nx.example.com")
+        for _i in range(2):
+            with self.assertRaises(dns.resolver.NXDOMAIN):
+                self.cache.resolve(self.resolver, "nx.example.com")
+        self.assertEqual(self.resolver.resolve.call_count, 1)
+
+    def test_negative_answer_without_soa(self):
+        """Negative answers without SOA must not be cached."""
+        self.resolver.resolve.side_effect = dns.resolver.NoAnswer()
+        for _i in range(2):
+            with self.assertRaises(dns.resolver.NoAnswer):
+                self.cache.resolve(self.resolver, "example.com", "TXT")
+        self.assertEqual(self.resolver.resolve.call_count, 2)
+
+    def test_transient_errors(self):
+        self.resolver.resolve.side_effect = dns.resolver.LifetimeTimeout()
+        for _i in range(2):
+            with self.assertRaises(dns.resolver.Timeout):
+                self.cache.resolve(self.resolver, "example.com")
+        self.assertEqual(self.resolver.resolve.call_count, 2)
+
+    @override_settings(DNS_CACHE_ENABLED=False)
+    def test_disabled(self):
+        self.resolver.resolve.return_value = make_answer(
+            "example.com.", "A", 60, "192.0.2.1"
+        )
+        self.cache.resolve(self.resolver, "example.com")
+        self.cache.resolve(self.resolver, "example.com")
+        self.assertEqual(self.resolver.resolve.call_count, 2)
+        self.assertEqual(self.cache.get_stats(), {"hits": 0, "misses": 0})
+
+
+@override_settings(DNS_CACHE_BACKEND="redis")
+class RedisDNSCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = dns_cache.DNSCache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        self.resolver = mock.Mock(nameservers=["192.0.2.53"])
+
+    def test_shared_answers(self):
+        self.resolver.resolve.return_value = make_answer(
+            "example.com.", "TXT", 300, '"v=spf1 mx -all"'
+        )
+        self.cache.resolve(self.resolver, "example.com", "TXT")
+        # Another process
+        other_cache = dns_cache.DNSCache()
+        answer = other_cache.resolve(self.resolver, "example.com", "TXT")
+        self.assertEqual(str(answer[0]), '"v=spf1 mx -all"')
+        self.assertEqual(answer.rrset, self.resolver.resolve.return_value.rrset)
+        self.assertEqual(answer.rrset.ttl, 300)
+        self.assertEqual(self.resolver.resolve.call_count, 1)
+        self.assertEqual(other_cache.get_stats(), {"hits": 1, "misses": 1})
+
+    def test_shared_negative_answers(self):
+        self.resolver.resolve.side_effect = make_nxdomain("nx.example.com")
+        with self.assertRaises(dns.resolver.NXDOMAIN):
+            self.cache.resolve(self.resolver, "nx.example.com")
+        with self.assertRaises(dns.resolver.NXDOMAIN):
+            dns_cache.DNSCache().resolve(self.resolver, "nx.example.com")
+        self.assertEqual(self.resolver.resolve.call_count, 1)
@@ -1,5 +1,8 @@
 """Tests for the dovecot access layer."""
 
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest import mock
 
 from django.test import SimpleTestCase, TestCase, override_settings
@@ -91,6 +94,21 @@ class DoveadmCmdBackendTestCase(SimpleTestCase):
             ["mailbox", "delete", "-u", "user@domain", "-s", "-e", "Scheduled"]
         )
 
+    @mock.patch("modoboa.lib.dovecot.doveadm_cmd")
+    def test_batch(self, doveadm_cmd_mock):
+        doveadm_cmd_mock.side_effect = [(0, b""), (68, b"error"), (0, b"")]
+        with self.backend.batch() as batch:
+            batch.move_message("user@domain", "Sent", "Scheduled", "X-Hdr", "12")
+            batch.delete_mailbox_if_empty("user@domain", "Scheduled")
+            batch.recalculate_quota("user@domain")
+        self.assertEqual(batch.results[0], "")
+        self.assertIsInstance(batch.results[1], dovecot.DoveadmError)
+        self.assertEqual(batch.results[2], "")
+        doveadm_cmd_mock.assert_any_call(
+            ["mailbox", "delete", "-u", "user@domain", "-s", "-e", "Scheduled"]
+        )
+        doveadm_cmd_mock.assert_any_call(["quota", "recalc", "-u", "user@domain"])
+
     @mock.patch("modoboa.lib.dovecot.doveadm_cmd")
     def test_list_password_schemes(self, doveadm_cmd_mock):
         doveadm_cmd_mock.return_value = (0, b"SHA512-CRYPT PLAIN")
@@ -100,7 +118,7 @@ class DoveadmCmdBackendTestCase(SimpleTestCase):
 
 @override_settings(**REST_SETTINGS)
 class DoveadmHTTPBackendTestCase(SimpleTestCase):
-    @mock.patch("modoboa.lib.dovecot.requests.post")
+    @mock.patch("modoboa.lib.dovecot.requests.Session.post")
     def test_get_user_home(self, post_mock):
         post_mock.return_value = http_response(
             [["doveadmResponse", [{"home": "/srv/vmail/domain/user"}], "c1"]]
@@ -114,7 +132,7 @@ class DoveadmHTTPBackendTestCase(SimpleTestCase):
         )
         self.assertTrue(kwargs["headers"]["Authorization"].startswith("X-Dovecot-API "))
 
-    @mock.patch("modoboa.lib.dovecot.requests.post")
+    @mock.patch("modoboa.lib.dovecot.requests.Session.post")
     def test_get_user_home_nested_response(self, post_mock):
         post_mock.return_value = http_response(
             [
@@ -128,14 +146,14 @@ class DoveadmHTTPBackendTestCase(SimpleTestCase):
         backend = dovecot.DoveadmHTTPBackend()
         self.assertEqual(backend.get_user_home("user@domain"), "/srv/vmail/domain/user")
 
-    @mock.patch("modoboa.lib.dovecot.requests.post")
+    @mock.patch("modoboa.lib.dovecot.requests.Session.post")
     def test_get_user_home_not_found(self, post_mock):
         post_mock.return_value = http_response([["doveadmResponse", [], "c1"]])
         backend = dovecot.DoveadmHTTPBackend()
         with self.assertRaises(dovecot.DoveadmError):
             backend.get_user_home("user@domain")
 
-    @mock.patch("modoboa.lib.dovecot.requests.post")
+    @mock.patch("modoboa.lib.dovecot.requests.Session.post")
     def test_command_error(self, post_mock):
         post_mock.return_value = http_response(
             [["error", {"type": "exitCode", "exitCode": 68}, "c1"]]
@@ -144,7 +162,7 @@ class DoveadmHTTPBackendTestCase(SimpleTestCase):
         with self.assertRaises(dovecot.DoveadmError):
             backend.get_user_home("user@domain")
 
-    @mock.patch("modoboa.lib.dovecot.requests.post")
+    @mock.patch("modoboa.lib.dovecot.requests.Session.post")
     def test_network_error(self, post_mock):
         import requests
 
@@ -153,7 +171,7 @@ class DoveadmHTTPBackendTestCase(SimpleTestCase):
         with self.assertRaises(dovecot.DoveadmError):
             backend.get_user_home("user@domain")
 
-    @mock.patch("modoboa.lib.dovecot.requests.post")
+    @mock.patch("modoboa.lib.dovecot.requests.Session.post")
     def test_move_message(self, post_mock):
         post_mock.return_value = http_response([["doveadmResponse", [], "c1"]])
         backend = dovecot.DoveadmHTTPBackend()
@@ -174,7 +192,7 @@ class DoveadmHTTPBackendTestCase(SimpleTestCase):
             ],
         )
 
-    @mock.patch("modoboa.lib.dovecot.requests.post")
+    @mock.patch("modoboa.lib.dovecot.requests.Session.post")
     def test_delete_mailbox_if_empty(self, post_mock):
         post_mock.return_value = http_response([["doveadmResponse", [], "c1"]])
         backend = dovecot.DoveadmHTTPBackend()
@@ -196,12 +214,106 @@ class DoveadmHTTPBackendTestCase(SimpleTestCase):
             ],
         )
 
+    @mock.patch("modoboa.lib.dovecot.requests.Session.post")
+    def test_batch(self, post_mock):
+        post_mock.return_value = http_response(
+            [
+                ["doveadmResponse", [], "c1"],
+                ["error", {"type": "exitCode", "exitCode": 68}, "c2"],
+                ["doveadmResponse", [], "c3"],
+            ]
+        )
+        backend = dovecot.DoveadmHTTPBackend()
+        with backend.batch() as batch:
+            batch.delete_mailbox_if_empty("user1@domain", "Scheduled")
+            batch.delete_mailbox_if_empty("user2@domain", "Scheduled")
+            batch.recalculate_quota("user1@domain")
+        self.assertEqual(post_mock.call_count, 1)
+        self.assertEqual(
+            [
+                (name, params["user"], tag)
+                for name, params, tag in post_mock.call_args[1]["json"]
+            ],
+            [
+                ("mailboxDelete", "user1@domain", "c1"),
+                ("mailboxDelete", "user2@domain", "c2"),
+                ("quotaRecalc", "user1@domain", "c3"),
+            ],
+        )
+        self.assertEqual(batch.results[0], [])
+        self.assertIsInstance(batch.results[1], dovecot.DoveadmError)
+        self.assertEqual(batch.results[2], [])
+
     def test_list_password_schemes(self):
         backend = dovecot.DoveadmHTTPBackend()
         with self.assertRaises(dovecot.DoveadmError):
             backend.list_password_schemes()
 
 
+class DoveadmStubHandler(BaseHTTPRequestHandler):
+    """Answer doveadm HTTP API requests with empty responses."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):  # NOQA:N802
+        length = int(self.headers["Content-Length"])
+        commands = json.loads(self.rfile.read(length))
+        self.server.requests.append((self.client_address, commands))
+        body = json.dumps(
+            [["doveadmResponse", [], tag] for _name, _params, tag in commands]
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class DoveadmHTTPServerTestCase(SimpleTestCase):
+    """Check HTTP backend against a local stub server."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), DoveadmStubHandler)
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings = dict(REST_SETTINGS)
+        settings["DOVEADM_API_URL"] = "http://127.0.0.1:{}/doveadm/v1".format(
+            self.server.server_address[1]
+        )
+        override = override_settings(**settings)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_connection_reused(self):
+        for _index in range(3):
+            dovecot.get_dovecot_backend().delete_mailbox_if_empty(
+                "user@domain", "Scheduled"
+            )
+        self.assertEqual(len(self.server.requests), 3)
+        clients = {client for client, _commands in self.server.requests}
+        self.assertEqual(len(clients), 1)
+
+    def test_batch(self):
+        backend = dovecot.get_dovecot_backend()
+        with backend.batch() as batch:
+            batch.move_message("user@domain", "Sent", "Scheduled", "X-Hdr", "12")
+            batch.delete_mailbox_if_empty("user@domain", "Scheduled")
+            batch.recalculate_quota("user@domain")
+        self.assertEqual(len(self.server.requests), 1)
+        commands = self.server.requests[0][1]
+        self.assertEqual(
+            [name for name, _params, _tag in commands],
+            ["move", "mailboxDelete", "quotaRecalc"],
+        )
+        self.assertEqual(batch.results, [[], [], []])
+
+
 class RestModeStructureTestCase(SimpleTestCase):
     """Check admin global parameters structure in rest mode."""
 
@@ -0,0 +1,55 @@
+"""Tests for Redis connection helpers."""
+
+import os
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from modoboa.lib import redis as lib_redis
+
+
+class RedisConnectionTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.rclient = lib_redis.get_redis_connection()
+        self.addCleanup(self.rclient.delete, "modoboa-tests")
+
+    def test_shared_pool(self):
+        other = lib_redis.get_redis_connection(bytes)
+        self.assertIsNot(other, self.rclient)
+        self.assertIs(other.connection_pool, self.rclient.connection_pool)
+
+    def test_response_callbacks(self):
+        """HGET return type must not leak between clients."""
+        self.rclient.hset("modoboa-tests", "counter", 10)
+        self.assertEqual(self.rclient.hget("modoboa-tests", "counter"), 10)
+        rclient = lib_redis.get_redis_connection(bytes)
+        self.assertEqual(rclient.hget("modoboa-tests", "counter"), b"10")
+        rclient = lib_redis.get_redis_connection(hget_return_type=None)
+        self.assertEqual(rclient.hget("modoboa-tests", "counter"), b"10")
+        self.assertEqual(self.rclient.hget("modoboa-tests", "counter"), 10)
+
+    def test_settings_change(self):
+        url = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/1"
+        with override_settings(REDIS_URL=url):
+            rclient = lib_redis.get_redis_connection()
+        self.assertIsNot(rclient.connection_pool, self.rclient.connection_pool)
+        self.assertEqual(rclient.connection_pool.connection_kwargs["db"], 1)
+
+    def test_reset_after_fork(self):
+        self.rclient.ping()
+        pool = self.rclient.connection_pool
+        pid = os.fork()
+        if pid == 0:
+            # Child process: exit code tells the parent what happened
+            code = 1
+            try:
+                rclient = lib_redis.get_redis_connection()
+                if rclient.connection_pool is not pool and rclient.ping():
+                    code = 0
+            finally:
+                os._exit(code)
+        _pid, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        # Parent connections still work
+        self.assertTrue(self.rclient.ping())
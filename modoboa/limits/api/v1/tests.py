@@ -46,11 +46,13 @@ class APIAdminLimitsTestCase(lib_tests.ModoAPITestCase):
         }
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertFalse(limit.is_exceeded())
 
         data["username"] = "fromapi2@test.com"
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         data["username"] = "fromapi3@test.com"
@@ -81,12 +83,14 @@ class APIAdminLimitsTestCase(lib_tests.ModoAPITestCase):
         data = {"name": "test3.com", "quota": 1}
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertFalse(limit.is_exceeded())
         self.assertFalse(quota.is_exceeded())
 
         data["name"] = "test4.com"
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
         self.assertFalse(quota.is_exceeded())
 
@@ -117,11 +121,13 @@ class APIAdminLimitsTestCase(lib_tests.ModoAPITestCase):
         data = {"name": "dalias1.com", "target": domain.pk}
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertFalse(limit.is_exceeded())
 
         data["name"] = "dalias2.com"
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         data["username"] = "dalias3.com"
@@ -142,12 +148,14 @@ class APIAdminLimitsTestCase(lib_tests.ModoAPITestCase):
         }
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertFalse(limit.is_exceeded())
 
         data["username"] = "fromapi2@test.com"
         data["mailbox"]["full_address"] = "fromapi2@test.com"
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         data["username"] = "fromapi3@test.com"
@@ -171,11 +179,13 @@ class APIAdminLimitsTestCase(lib_tests.ModoAPITestCase):
         }
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertFalse(limit.is_exceeded())
 
         data["address"] = "alias_fromapi2@test.com"
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         data["address"] = "alias_fromapi3@test.com"
@@ -222,6 +232,7 @@ class APIDomainLimitsTestCase(lib_tests.ModoAPITestCase):
         data["name"] = "dalias2.com"
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, 201)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
         data["name"] = "dalias3.com"
         response = self.client.post(url, data, format="json")
@@ -98,6 +98,7 @@ DEFAULT_DOMAIN_LIMITS = collections.OrderedDict(
             "domain_admins",
             {
                 "relation": "admins",
+                "counter": "admins_count",
                 "label": _("Domain admins"),
                 "help": _("Maximum number of domain admins allowed for this domain."),
             },
@@ -1,7 +1,11 @@
 """Django signal handlers for limits."""
 
+import collections
+import threading
+
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import signals
+from django.db.models import Count, F, Subquery, signals
+from django.db.models.functions import Coalesce
 from django.dispatch import receiver
 
 from modoboa.admin import models as admin_models
@@ -37,14 +41,210 @@ def check_object_limit(sender, context, **kwargs):
             raise lib.LimitReached(limit)
 
 
-@receiver(signals.post_save, sender=core_models.User)
-def create_user_limits(sender, instance, **kwargs):
-    """Create limits for new user."""
-    if not kwargs.get("created"):
+def update_user_limits_usage(user_id, content_type_id, delta):
+    """Update counters of user limits related to the given content type."""
+    models.UserObjectLimit.objects.filter(
+        user_id=user_id,
+        content_type_id=content_type_id,
+        name__in=utils.get_counted_user_limits(),
+    ).update(current_count=F("current_count") + delta)
+
+
+@receiver(signals.post_save, sender=core_models.ObjectAccess)
+def count_owned_object(sender, instance, created, **kwargs):
+    """Update user limits when an object gets a new owner."""
+    was_owner = getattr(
+        instance,
+        "_counted_owner",
+        False if created else instance._loaded_values.get("is_owner"),
+    )
+    instance._counted_owner = instance.is_owner
+    if was_owner is None or was_owner == instance.is_owner:
+        return
+    update_user_limits_usage(
+        instance.user_id, instance.content_type_id, 1 if instance.is_owner else -1
+    )
+
+
+@receiver(core_signals.objects_bulk_created, sender=core_models.ObjectAccess)
+def count_owned_objects(sender, objects, **kwargs):
+    """Update user limits when objects are created in bulk."""
+    counted = collections.Counter()
+    for instance in objects:
+        instance._counted_owner = instance.is_owner
+        if instance.is_owner:
+            counted[(instance.user_id, instance.content_type_id)] += 1
+    for (user_id, content_type_id), total in counted.items():
+        update_user_limits_usage(user_id, content_type_id, total)
+
+
+def recount_user_limits_usage(user_id, content_type_id):
+    """Recompute counters of user limits related to the given content type."""
+    owned = (
+        core_models.ObjectAccess.objects.filter(
+            user_id=user_id, content_type_id=content_type_id, is_owner=True
+        )
+        .order_by()
+        .values("user")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    models.UserObjectLimit.objects.filter(
+        user_id=user_id,
+        content_type_id=content_type_id,
+        name__in=utils.get_counted_user_limits(),
+    ).update(current_count=Coalesce(Subquery(owned), 0))
+
+
+class DeletionState(threading.local):
+    """Counters already recomputed by the current deletion."""
+
+    origin = None
+    collecting = False
+    recounted: set = set()
+
+
+_deletion = DeletionState()
+
+
+@receiver(signals.pre_delete, sender=core_models.ObjectAccess)
+@receiver(signals.pre_delete, sender=admin_models.Alias)
+@receiver(signals.pre_delete, sender=admin_models.DomainAlias)
+@receiver(signals.pre_delete, sender=admin_models.Mailbox)
+def start_deletion(sender, origin=None, **kwargs):
+    """Track a new deletion (pre_delete is sent for all objects first)."""
+    if _deletion.origin is not origin or not _deletion.collecting:
+        _deletion.origin = origin
+        _deletion.collecting = True
+        _deletion.recounted = set()
+
+
+def must_recount(key: tuple, origin) -> bool:
+    """Tell if counters identified by key must be recomputed.
+
+    All rows of a model are removed before post_delete is sent for
+    them, so counters only need to be recomputed once per deletion.
+    """
+    if origin is None or _deletion.origin is not origin:
+        return True
+    _deletion.collecting = False
+    if key in _deletion.recounted:
+        return False
+    _deletion.recounted.add(key)
+    return True
+
+
+@receiver(signals.post_delete, sender=core_models.ObjectAccess)
+def uncount_owned_object(sender, instance, origin=None, **kwargs):
+    """Update user limits when an owned object is removed.
+
+    Django may send post_delete for rows already removed by another
+    handler, so counters are recomputed instead of being decremented.
+    """
+    if not instance.is_owner:
+        return
+    key = ("user", instance.user_id, instance.content_type_id)
+    if must_recount(key, origin):
+        recount_user_limits_usage(instance.user_id, instance.content_type_id)
+
+
+def get_counted_domains(instance, values: dict | None = None) -> dict:
+    """Return the domains instance is counted for, by limit name.
+
+    :param values: previous field values (current ones if None)
+    """
+    def get_value(field):
+        if values is None:
+            return getattr(instance, field)
+        return values.get(field, getattr(instance, field))
+
+    result = {}
+    limits = utils.get_counted_domain_limits().get(instance._meta.label, [])
+    for name, attname, extra_filters in limits:
+        if any(get_value(field) != value for field, value in extra_filters.items()):
+            continue
+        result[name] = get_value(attname)
+    return result
+
+
+def update_domain_limits_usage(counted: dict, delta: int):
+    for name, domain_id in counted.items():
+        if domain_id is None:
+            continue
+        models.DomainObjectLimit.objects.filter(domain_id=domain_id, name=name).update(
+            current_count=F("current_count") + delta
+        )
+
+
+@receiver(signals.post_save, sender=admin_models.Alias)
+@receiver(signals.post_save, sender=admin_models.DomainAlias)
+@receiver(signals.post_save, sender=admin_models.Mailbox)
+def count_domain_object(sender, instance, created, **kwargs):
+    """Update domain limits when an object is created or moved."""
+    if created:
+        previous = {}
+    elif hasattr(instance, "_counted_domains"):
+        previous = instance._counted_domains
+    else:
+        previous = get_counted_domains(instance, instance._loaded_values)
+    current = get_counted_domains(instance)
+    instance._counted_domains = current
+    if previous == current:
         return
+    update_domain_limits_usage(
+        {name: value for name, value in previous.items() if current.get(name) != value},
+        -1,
+    )
+    update_domain_limits_usage(
+        {name: value for name, value in current.items() if previous.get(name) != value},
+        1,
+    )
+
+
+@receiver(core_signals.objects_bulk_created, sender=admin_models.Alias)
+@receiver(core_signals.objects_bulk_created, sender=admin_models.DomainAlias)
+@receiver(core_signals.objects_bulk_created, sender=admin_models.Mailbox)
+def count_domain_objects(sender, objects, **kwargs):
+    """Update domain limits when objects are created in bulk."""
+    counted = collections.Counter()
+    for instance in objects:
+        instance._counted_domains = get_counted_domains(instance)
+        counted.update(instance._counted_domains.items())
+    for (name, domain_id), total in counted.items():
+        update_domain_limits_usage({name: domain_id}, total)
+
+
+@receiver(signals.post_delete, sender=admin_models.Alias)
+@receiver(signals.post_delete, sender=admin_models.DomainAlias)
+@receiver(signals.post_delete, sender=admin_models.Mailbox)
+def uncount_domain_object(sender, instance, origin=None, **kwargs):
+    """Update domain limits when an object is removed.
+
+    See :func:`uncount_owned_object` for why counters are recomputed.
+    """
+    limits = utils.get_counted_domain_limits().get(sender._meta.label, [])
+    for name, attname, extra_filters in limits:
+        domain_id = getattr(instance, attname)
+        if domain_id is None or not must_recount(("domain", domain_id, name), origin):
+            continue
+        objects = (
+            sender.objects.filter(**{attname: domain_id}, **extra_filters)
+            .order_by()
+            .values(attname)
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        models.DomainObjectLimit.objects.filter(domain_id=domain_id, name=name).update(
+            current_count=Coalesce(Subquery(objects), 0)
+        )
+
+
+def get_new_user_limits(users) -> list:
+    """Return limits to create for the given new users."""
     request = lib_signals.get_request()
     creator = request.user if request else None
     global_params = dict(param_tools.get_global_parameters("limits"))
+    result = []
     for name, definition in utils.get_user_limit_templates():
         ct = ContentType.objects.get_by_natural_key(
             *definition["content_type"].split(".")
@@ -53,9 +253,41 @@ def create_user_limits(sender, instance, **kwargs):
         # creator can be None if user was created by a factory
         if not creator or creator.is_superuser:
             max_value = global_params[f"deflt_user_{name}_limit"]
-        models.UserObjectLimit.objects.create(
-            user=instance, name=name, content_type=ct, max_value=max_value
+        result += [
+            models.UserObjectLimit(
+                user=user, name=name, content_type=ct, max_value=max_value
+            )
+            for user in users
+        ]
+    return result
+
+
+def get_new_domain_limits(domains) -> list:
+    """Return limits to create for the given new domains."""
+    global_params = dict(param_tools.get_global_parameters("limits"))
+    return [
+        models.DomainObjectLimit(
+            domain=domain,
+            name=name,
+            max_value=global_params[f"deflt_domain_{name}_limit"],
         )
+        for name, _definition in utils.get_domain_limit_templates()
+        for domain in domains
+    ]
+
+
+@receiver(signals.post_save, sender=core_models.User)
+def create_user_limits(sender, instance, **kwargs):
+    """Create limits for new user."""
+    if not kwargs.get("created"):
+        return
+    models.UserObjectLimit.objects.bulk_create(get_new_user_limits([instance]))
+
+
+@receiver(core_signals.objects_bulk_created, sender=core_models.User)
+def create_users_limits(sender, objects, **kwargs):
+    """Create limits for users created in bulk."""
+    models.UserObjectLimit.objects.bulk_create(get_new_user_limits(objects))
 
 
 @receiver(signals.post_save, sender=admin_models.Domain)
@@ -63,12 +295,13 @@ def create_domain_limits(sender, instance, **kwargs):
     """Create limits for new domain."""
     if not kwargs.get("created"):
         return
-    global_params = dict(param_tools.get_global_parameters("limits"))
-    for name, _definition in utils.get_domain_limit_templates():
-        max_value = global_params[f"deflt_domain_{name}_limit"]
-        models.DomainObjectLimit.objects.create(
-            domain=instance, name=name, max_value=max_value
-        )
+    models.DomainObjectLimit.objects.bulk_create(get_new_domain_limits([instance]))
+
+
+@receiver(core_signals.objects_bulk_created, sender=admin_models.Domain)
+def create_domains_limits(sender, objects, **kwargs):
+    """Create limits for domains created in bulk."""
+    models.DomainObjectLimit.objects.bulk_create(get_new_domain_limits(objects))
 
 
 @receiver(core_signals.account_deleted)
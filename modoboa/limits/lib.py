@@ -53,4 +53,4 @@ def allocate_resources_from_user(limit, user, value):
     if value > remain:
         raise UnsufficientResource(ol)
     ol.max_value -= value
-    ol.save()
+    ol.save(update_fields=["max_value"])
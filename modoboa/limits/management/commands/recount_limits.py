@@ -0,0 +1,20 @@
+"""Recompute limits usage counters."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... import utils
+
+
+class Command(BaseCommand):
+    """Management command to recount limits usage."""
+
+    help = "Recompute usage counters of resource limits"  # NOQA:A003
+
+    def handle(self, *args, **options):
+        """Entry point."""
+        with transaction.atomic():
+            users, domains = utils.recount_limits_usage()
+        self.stdout.write(
+            f"{users} user limit(s) and {domains} domain limit(s) fixed"
+        )
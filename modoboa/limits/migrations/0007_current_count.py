@@ -0,0 +1,70 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+# Frozen copy of the limits maintained as counters when this migration
+# was written (see limits.utils): later changes must not alter it.
+COUNTED_USER_LIMITS = ["domains", "domain_aliases", "mailboxes", "mailbox_aliases"]
+COUNTED_DOMAIN_LIMITS = [
+    ("admin", "DomainAlias", "domain_aliases", "target_id", {}),
+    ("admin", "Mailbox", "mailboxes", "domain_id", {}),
+    ("admin", "Alias", "mailbox_aliases", "domain_id", {"internal": False}),
+]
+
+
+def init_counters(apps, schema_editor):
+    """Compute usage counters of existing limits."""
+    UserObjectLimit = apps.get_model("limits", "UserObjectLimit")
+    DomainObjectLimit = apps.get_model("limits", "DomainObjectLimit")
+    ObjectAccess = apps.get_model("core", "ObjectAccess")
+
+    counts = {
+        (row["user"], row["content_type"]): row["total"]
+        for row in ObjectAccess.objects.filter(is_owner=True)
+        .values("user", "content_type")
+        .annotate(total=Count("id"))
+        .order_by()
+    }
+    user_limits = []
+    for limit in UserObjectLimit.objects.filter(name__in=COUNTED_USER_LIMITS):
+        limit.current_count = counts.get((limit.user_id, limit.content_type_id), 0)
+        user_limits.append(limit)
+    UserObjectLimit.objects.bulk_update(user_limits, ["current_count"], batch_size=500)
+
+    domain_limits = []
+    for app_label, model_name, name, attname, extra_filters in COUNTED_DOMAIN_LIMITS:
+        model = apps.get_model(app_label, model_name)
+        counts = dict(
+            model.objects.filter(**extra_filters)
+            .values_list(attname)
+            .annotate(total=Count("pk"))
+            .order_by()
+        )
+        for limit in DomainObjectLimit.objects.filter(name=name):
+            limit.current_count = counts.get(limit.domain_id, 0)
+            domain_limits.append(limit)
+    DomainObjectLimit.objects.bulk_update(
+        domain_limits, ["current_count"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin", "0024_domain_last_dns_check_execution"),
+        ("core", "0031_normalize_legacy_language_codes"),
+        ("limits", "0006_auto_20170216_1112"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="domainobjectlimit",
+            name="current_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userobjectlimit",
+            name="current_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(init_counters, migrations.RunPython.noop),
+    ]
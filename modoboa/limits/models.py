@@ -6,7 +6,7 @@ from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 
 from modoboa.core import models as core_models
-from . import lib, utils
+from . import constants, lib, utils
 
 
 class ObjectLimitMixin:
@@ -66,6 +66,8 @@ class UserObjectLimit(ObjectLimitMixin, models.Model):
         "contenttypes.ContentType", on_delete=models.CASCADE
     )
     max_value = models.IntegerField(default=0)
+    # Maintained by signal handlers for counted limits
+    current_count = models.IntegerField(default=0)
 
     class Meta:
         unique_together = (("user", "name"),)
@@ -73,19 +75,13 @@ class UserObjectLimit(ObjectLimitMixin, models.Model):
     @property
     def definition(self):
         """Return the definition of this limit."""
-        for name, tpl in utils.get_user_limit_templates():
-            if name == self.name:
-                return tpl
-        return None
+        return constants.DEFAULT_USER_LIMITS.get(self.name)
 
     @property
     def current_value(self) -> int:
         """Return the current number of objects."""
-        condition = self.type == "count" and "extra_filters" not in self.definition
-        if condition:
-            return core_models.ObjectAccess.objects.filter(
-                user=self.user, is_owner=True, content_type=self.content_type
-            ).count()
+        if utils.is_counted_user_limit(self.definition):
+            return self.current_count
         id_list = core_models.ObjectAccess.objects.filter(
             user=self.user, is_owner=True, content_type=self.content_type
         ).values_list("object_id", flat=True)
@@ -126,6 +122,8 @@ class DomainObjectLimit(ObjectLimitMixin, models.Model):
     domain = models.ForeignKey("admin.Domain", on_delete=models.CASCADE)
     name = models.CharField(max_length=254)
     max_value = models.IntegerField(default=0)
+    # Maintained by signal handlers for counted limits
+    current_count = models.IntegerField(default=0)
 
     class Meta:
         unique_together = (("domain", "name"),)
@@ -133,10 +131,7 @@ class DomainObjectLimit(ObjectLimitMixin, models.Model):
     @property
     def definition(self):
         """Return the definition of this limit."""
-        for name, tpl in utils.get_domain_limit_templates():
-            if name == self.name:
-                return tpl
-        return None
+        return constants.DEFAULT_DOMAIN_LIMITS.get(self.name)
 
     @property
     def current_value(self) -> int:
@@ -144,6 +139,10 @@ class DomainObjectLimit(ObjectLimitMixin, models.Model):
         definition = self.definition
         if not definition:
             raise RuntimeError(f"Bad limit {self.name}")
+        if utils.is_counted_domain_limit(self.name):
+            return self.current_count
+        if "counter" in definition:
+            return getattr(self.domain, definition["counter"])
         relation = getattr(self.domain, definition["relation"])
         if "extra_filters" in definition:
             relation = relation.filter(**definition["extra_filters"])
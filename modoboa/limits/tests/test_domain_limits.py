@@ -73,6 +73,7 @@ class DomainLimitsTestCase(ResourceTestCase):
         response = self.client.post(url, body, format="json")
         self.assertEqual(response.status_code, 201)
 
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
         body["name"] = "domainalias3.net"
         response = self.client.post(url, body, format="json")
@@ -91,6 +92,7 @@ class DomainLimitsTestCase(ResourceTestCase):
             format="json",
         )
         self.assertEqual(response.status_code, 200)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
         user = core_factories.UserFactory(
             username="admin1000@test.com", groups=("DomainAdmins",)
@@ -112,6 +114,7 @@ class DomainLimitsTestCase(ResourceTestCase):
         # Check if defined limit can't be exceeded
         username = "toto@test.com"
         self._create_account(username)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
         self._create_account("titi@test.com", status=400)
 
@@ -119,6 +122,7 @@ class DomainLimitsTestCase(ResourceTestCase):
         limit.max_value = -1
         limit.save(update_fields=["max_value"])
         self._create_account("titi@test.com")
+        limit.refresh_from_db()
         self.assertFalse(limit.is_exceeded())
 
     def test_mailbox_aliases_limit(self):
@@ -130,6 +134,7 @@ class DomainLimitsTestCase(ResourceTestCase):
         self.assertFalse(limit.is_exceeded())
 
         self._create_alias("alias1@test.com", ["user@test.com"])
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         response = self._create_alias("alias2@test.com", ["user@test.com"], status=400)
@@ -140,6 +145,7 @@ class DomainLimitsTestCase(ResourceTestCase):
         limit.max_value = 5
         limit.save()
         self._create_alias("forward2@test.com", ["user@test.com"])
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         self._create_alias("forward3@test.com", ["user@test.com"], status=400)
@@ -36,6 +36,7 @@ domainalias; domalias2.com; {self.domain}; True
         url = reverse("v2:domain-import-from-csv")
         response = self.client.post(url, {"sourcefile": f})
         self.assertEqual(response.status_code, 200)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         f = ContentFile(
@@ -62,6 +63,7 @@ domainalias; domalias2.com; {self.domain}; True
         url = reverse("v2:identities-import-from-csv")
         response = self.client.post(url, {"sourcefile": f})
         self.assertEqual(response.status_code, 200)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         f = ContentFile(
@@ -89,6 +91,7 @@ domainalias; domalias2.com; {self.domain}; True
         url = reverse("v2:identities-import-from-csv")
         response = self.client.post(url, {"sourcefile": f})
         self.assertEqual(response.status_code, 200)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         f = ContentFile(
@@ -116,6 +119,7 @@ alias; alias2@{self.domain}; True; user@{self.domain}
         url = reverse("v2:identities-import-from-csv")
         response = self.client.post(url, {"sourcefile": f})
         self.assertEqual(response.status_code, 200)
+        limit.refresh_from_db()
         self.assertTrue(limit.is_exceeded())
 
         f = ContentFile(
@@ -147,6 +151,7 @@ class UserLimitImportTestCase(LimitImportTestCase):
         f = ContentFile("domain; domain1.com; 1; 1; True", name="domains.csv")
         url = reverse("v2:domain-import-from-csv")
         self.client.post(url, {"sourcefile": f})
+        limit.refresh_from_db()
         self.assertFalse(limit.is_exceeded())
 
         f = ContentFile("domain; domain2.com; 0; 1; True", name="domains.csv")
@@ -1,5 +1,8 @@
 """Test cases for the limits extension."""
 
+from io import StringIO
+
+from django.core import management
 from django.urls import reverse
 
 from modoboa.admin.factories import populate_database
@@ -206,6 +209,19 @@ class DomainAdminTestCase(ResourceTestCase):
         Alias.objects.get(address="alias1@test.com")
         self._check_limit("mailbox_aliases", 2, 2)
 
+    def test_recount_limits(self):
+        self._create_account("tester1@test.com")
+        self._create_alias("alias1@test.com")
+        self.user.userobjectlimit_set.update(current_count=0)
+        self._check_limit("mailboxes", 0, 2)
+        out = StringIO()
+        management.call_command("recount_limits", stdout=out)
+        self.assertIn("2 user limit(s) and 0 domain limit(s) fixed", out.getvalue())
+        self._check_limit("mailboxes", 1, 2)
+        self._check_limit("mailbox_aliases", 1, 2)
+        # Nothing left to fix
+        self.assertEqual(utils.recount_limits_usage(), (0, 0))
+
 
 class ResellerTestCase(ResourceTestCase):
 
@@ -1,5 +1,11 @@
 """Modoboa limits utilities."""
 
+import functools
+
+from django.apps import apps as django_apps
+from django.db.models import Count
+from django.db.models.fields.related_descriptors import ReverseManyToOneDescriptor
+
 from . import constants
 
 
@@ -13,6 +19,100 @@ def get_domain_limit_templates():
     return list(constants.DEFAULT_DOMAIN_LIMITS.items())
 
 
+def is_counted_user_limit(definition: dict) -> bool:
+    """Tell if usage of this user limit is maintained as a counter.
+
+    It is the case for limits counting objects owned by the user.
+    """
+    return definition.get("type", "count") == "count" and (
+        "extra_filters" not in definition
+    )
+
+
+def get_counted_user_limits() -> list:
+    """Return the names of user limits maintained as counters."""
+    return [
+        name
+        for name, definition in get_user_limit_templates()
+        if is_counted_user_limit(definition)
+    ]
+
+
+@functools.cache
+def get_counted_domain_limits() -> dict:
+    """Return domain limits maintained as counters.
+
+    Only limits counting objects which point to the domain through a
+    foreign key are concerned.
+
+    :return: a dict {model label: [(name, field attname, extra filters)]}
+    """
+    Domain = django_apps.get_model("admin", "Domain")
+    result: dict = {}
+    for name, definition in get_domain_limit_templates():
+        descriptor = getattr(Domain, definition["relation"], None)
+        if not isinstance(descriptor, ReverseManyToOneDescriptor):
+            continue
+        result.setdefault(descriptor.rel.related_model._meta.label, []).append(
+            (name, descriptor.field.attname, definition.get("extra_filters", {}))
+        )
+    return result
+
+
+def is_counted_domain_limit(name: str) -> bool:
+    """Tell if usage of this domain limit is maintained as a counter."""
+    return any(
+        name == limit[0]
+        for limits in get_counted_domain_limits().values()
+        for limit in limits
+    )
+
+
+def recount_limits_usage() -> tuple[int, int]:
+    """Recompute all usage counters from scratch.
+
+    :return: number of updated (user, domain) limits
+    """
+    UserObjectLimit = django_apps.get_model("limits", "UserObjectLimit")
+    DomainObjectLimit = django_apps.get_model("limits", "DomainObjectLimit")
+    ObjectAccess = django_apps.get_model("core", "ObjectAccess")
+
+    counts = {
+        (row["user"], row["content_type"]): row["total"]
+        for row in ObjectAccess.objects.filter(is_owner=True)
+        .values("user", "content_type")
+        .annotate(total=Count("id"))
+        .order_by()
+    }
+    user_limits = []
+    for limit in UserObjectLimit.objects.filter(name__in=get_counted_user_limits()):
+        value = counts.get((limit.user_id, limit.content_type_id), 0)
+        if limit.current_count != value:
+            limit.current_count = value
+            user_limits.append(limit)
+    UserObjectLimit.objects.bulk_update(user_limits, ["current_count"], batch_size=500)
+
+    domain_limits = []
+    for label, limits in get_counted_domain_limits().items():
+        model = django_apps.get_model(label)
+        for name, attname, extra_filters in limits:
+            counts = dict(
+                model.objects.filter(**extra_filters)
+                .values_list(attname)
+                .annotate(total=Count("pk"))
+                .order_by()
+            )
+            for limit in DomainObjectLimit.objects.filter(name=name):
+                value = counts.get(limit.domain_id, 0)
+                if limit.current_count != value:
+                    limit.current_count = value
+                    domain_limits.append(limit)
+    DomainObjectLimit.objects.bulk_update(
+        domain_limits, ["current_count"], batch_size=500
+    )
+    return len(user_limits), len(domain_limits)
+
+
 def move_pool_resource(owner, user):
     """Move resource from one pool to another.
 
@@ -25,4 +125,4 @@ def move_pool_resource(owner, user):
             continue
         owner_limit = owner.userobjectlimit_set.get(name=name)
         owner_limit.max_value += user_limit.max_value
-        owner_limit.save()
+        owner_limit.save(update_fields=["max_value"])
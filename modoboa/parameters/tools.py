@@ -29,6 +29,8 @@ class Registry:
     def __init__(self):
         """Constructor."""
         self._registry2 = {"global": {}, "user": {}}
+        # Levels whose default values are up to date
+        self._loaded_levels: set = set()
 
     def add(
         self,
@@ -47,9 +49,12 @@ class Registry:
             "is_extension": is_extension,
             "defaults": {},
         }
+        self._loaded_levels.discard(level)
 
     def _load_default_values(self, level):
-        """Load default values."""
+        """Load default values (once per level)."""
+        if level in self._loaded_levels:
+            return
         for data in list(self._registry2[level].values()):
             serializer = data["serializer_class"]()
             for name, field in list(serializer.fields.items()):
@@ -57,6 +62,7 @@ class Registry:
                     data["defaults"][name] = field.default
                 else:
                     data["defaults"][name] = None
+        self._loaded_levels.add(level)
 
     def get_applications(self, level):
         """Return all applications registered for level."""
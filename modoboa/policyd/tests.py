@@ -2,6 +2,7 @@
 
 import asyncio
 from aiosmtplib import send
+from unittest import mock
 from unittest.mock import AsyncMock
 import multiprocessing
 from multiprocessing import Process
@@ -14,6 +15,7 @@ import time
 from django import db
 from django.core.management import call_command
 from django.test import TransactionTestCase
+from django.urls import reverse
 
 from modoboa.admin import factories as admin_factories
 from modoboa.admin import models as admin_models
@@ -344,3 +346,18 @@ class ModelsTestCase(RedisTestCaseMixin, ModoAPITestCase):
         mb.save()
         self.rclient.delete(constants.REDIS_HASHNAME)
         self.assertEqual(mb.sent_messages, 0)
+
+    def test_domain_list_sent_messages(self):
+        """Counters of listed domains are fetched with a single request."""
+        admin_models.Domain.objects.update(message_limit=10)
+        self.rclient.hset(constants.REDIS_HASHNAME, "test.com", 4)
+        self.rclient.hset(constants.REDIS_HASHNAME, "test2.com", 10)
+        with mock.patch("modoboa.admin.models.mixins.get_message_counter") as hget:
+            response = self.client.get(reverse("v2:domain-list"))
+        self.assertEqual(response.status_code, 200)
+        hget.assert_not_called()
+        results = {
+            domain["name"]: domain["sent_messages"]
+            for domain in response.json()["results"]
+        }
+        self.assertEqual(results, {"test.com": 6, "test2.com": 0})
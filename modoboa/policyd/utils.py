@@ -12,3 +12,12 @@ def get_message_counter(key):
     if value is None:
         return None
     return int(value)
+
+
+def get_message_counters(keys):
+    """Return current counters for given keys, using a single request."""
+    if not keys:
+        return []
+    rclient = get_redis_connection(hget_return_type=None)
+    values = rclient.hmget(constants.REDIS_HASHNAME, keys)
+    return [int(value) if value is not None else None for value in values]
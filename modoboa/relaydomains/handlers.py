@@ -11,14 +11,18 @@ from . import lib, models, postfix_maps
 
 
 @receiver(admin_signals.use_external_recipients)
-def check_relaydomain_alias(sender, recipients, **kwargs):
+def check_relaydomain_alias(sender, recipients, domain=None, **kwargs):
     """Allow the creation of an alias on a relaydomain."""
-    localpart, domain = split_mailbox(recipients)
-    qset = admin_models.Domain.objects.filter(name=domain, type="relaydomain")
-    if not qset.exists():
+    localpart, domname = split_mailbox(recipients)
+    if domain is not None:
+        if domain.type != "relaydomain":
+            return False
+    elif not admin_models.Domain.objects.filter(
+        name=domname, type="relaydomain"
+    ).exists():
         return False
     qset = admin_models.Mailbox.objects.select_related("domain").filter(
-        domain__name=domain, address=localpart
+        domain__name=domname, address=localpart
     )
     if qset.exists():
         return False
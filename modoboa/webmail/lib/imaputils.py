@@ -51,6 +51,27 @@ def validate_imap_partnum(value):
     return str(value)
 
 
+def compress_uid_set(uids) -> str:
+    """Build a compact IMAP sequence set from a list of UIDs.
+
+    Consecutive UIDs are collapsed into ranges so large selections
+    keep a reasonable command length (ie. ``1:500,600:900``).
+
+    :param uids: an iterable of UIDs (int or str)
+    :return: a string
+    """
+    values = sorted({int(uid) for uid in uids})
+    ranges = []
+    for uid in values:
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ",".join(
+        str(start) if start == stop else f"{start}:{stop}" for start, stop in ranges
+    )
+
+
 def escape_search_pattern(pattern: str) -> str:
     """Escape a user pattern before placing it in an IMAP quoted string.
 
@@ -221,7 +242,9 @@ class IMAPconnector:
         :param name: the command's name
         :return: the command's result
         """
-        if name in ["FETCH", "SORT", "STORE", "COPY", "SEARCH"]:
+        if name in ["FETCH", "SORT", "STORE", "COPY", "SEARCH", "MOVE"] or (
+            name == "EXPUNGE" and args
+        ):
             try:
                 typ, data = self.m.uid(name, *args)
             except imaplib.IMAP4.error as e:
@@ -601,25 +624,40 @@ class IMAPconnector:
             if count:
                 mb["unseen"] = count
 
-    def _add_flag(self, mbox: str, msgset: list[str], flag: str) -> None:
+    def _msgset(self, msgset: list[str] | str) -> str:
+        """Return a compact UID set for the given messages.
+
+        :param msgset: a list of UIDs or an already built UID set
+        """
+        if isinstance(msgset, str):
+            msgset = [uid for uid in msgset.split(",") if uid]
+        return compress_uid_set(msgset)
+
+    def _add_flag(self, mbox: str, msgset: list[str] | str, flag: str) -> None:
         """Add flag to a messages set.
 
         :param mbox: the mailbox containing the messages
         :param msgset: messages set (uid)
         :param flag: the flag to add
         """
+        msgset = self._msgset(msgset)
+        if not msgset:
+            return
         self.select_mailbox(mbox, False)
-        self._cmd("STORE", ",".join(msgset), "+FLAGS", flag)
+        self._cmd("STORE", msgset, "+FLAGS", flag)
 
-    def _remove_flag(self, mbox: str, msgset: list[str], flag: str) -> None:
+    def _remove_flag(self, mbox: str, msgset: list[str] | str, flag: str) -> None:
         """Remove flag from a message set.
 
         :param mbox: the mailbox containing the messages
         :param msgset: messages set (uid)
         :param flag: the flag to remove
         """
+        msgset = self._msgset(msgset)
+        if not msgset:
+            return
         self.select_mailbox(mbox, False)
-        self._cmd("STORE", ",".join(msgset), "-FLAGS", flag)
+        self._cmd("STORE", msgset, "-FLAGS", flag)
 
     def mark_messages_unread(self, mbox: str, msgset: list[str]) -> None:
         """Mark a set of messages as unread.
@@ -660,11 +698,44 @@ class IMAPconnector:
         """Add the \Answered flag to this email."""
         self._add_flag(mailbox, mailid, r"(\Answered)")
 
-    def move(self, msgset, oldmailbox: str, newmailbox: str) -> None:
-        """Move messages between mailboxes."""
+    def move(self, msgset: list[str] | str, oldmailbox: str, newmailbox: str) -> None:
+        """Move messages between mailboxes.
+
+        ``UID MOVE`` (RFC 6851) is used when the server supports
+        it. Otherwise, messages are copied and flagged as deleted,
+        and only the moved set is expunged if ``UIDPLUS`` (RFC 4315)
+        is available.
+
+        :param msgset: messages set (uid)
+        :param oldmailbox: the source mailbox
+        :param newmailbox: the destination mailbox
+        """
+        msgset = self._msgset(msgset)
+        if not msgset:
+            return
         self.select_mailbox(oldmailbox, False)
+        if "MOVE" in self.capabilities:
+            self._cmd("MOVE", msgset, self._encode_mbox_name(newmailbox))
+            return
         self._cmd("COPY", msgset, self._encode_mbox_name(newmailbox))
         self._cmd("STORE", msgset, "+FLAGS", r"(\Deleted \Seen)")
+        if "UIDPLUS" in self.capabilities:
+            self._cmd("EXPUNGE", msgset)
+
+    def move_selections(self, selections: list[dict], newmailbox: str) -> int:
+        """Move messages coming from several mailboxes at once.
+
+        :param selections: list of dict (``source`` and ``selection`` keys)
+        :param newmailbox: the destination mailbox
+        :return: the number of moved messages
+        """
+        count = 0
+        for item in selections:
+            if item["source"] == newmailbox or not item["selection"]:
+                continue
+            self.move(item["selection"], item["source"], newmailbox)
+            count += len(item["selection"])
+        return count
 
     def push_mail(self, mbox: str, msg) -> int:
         """
@@ -56,27 +56,27 @@ class ScheduledMessage(models.Model):
         sent_folder = self.account.parameters.get_value("sent_folder")
         backend = dovecot.get_dovecot_backend()
         try:
-            backend.move_message(
-                self.account.email,
-                sent_folder,
-                constants.MAILBOX_NAME_SCHEDULED,
-                constants.CUSTOM_HEADER_SCHEDULED_ID,
-                str(self.id),
-            )
+            with backend.batch() as batch:
+                batch.move_message(
+                    self.account.email,
+                    sent_folder,
+                    constants.MAILBOX_NAME_SCHEDULED,
+                    constants.CUSTOM_HEADER_SCHEDULED_ID,
+                    str(self.id),
+                )
+                # Try to delete mailbox when empty (errors are ignored)
+                batch.delete_mailbox_if_empty(
+                    self.account.email, constants.MAILBOX_NAME_SCHEDULED
+                )
+            error = batch.results[0]
         except dovecot.DoveadmError as err:
+            error = err
+        if isinstance(error, dovecot.DoveadmError):
             self.status = constants.SchedulingState.MOVE_ERROR.value
-            self.error = str(err)
+            self.error = str(error)
             self.save()
             return False
 
-        # Try to delete mailbox when empty
-        try:
-            backend.delete_mailbox_if_empty(
-                self.account.email, constants.MAILBOX_NAME_SCHEDULED
-            )
-        except dovecot.DoveadmError:
-            pass
-
         return True
 
     def to_email_message(self) -> EmailMessage:
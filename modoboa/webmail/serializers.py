@@ -254,6 +254,12 @@ class MoveSelectionSerializer(serializers.Serializer):
         return [item for item in value if item.isdigit()]
 
 
+class BatchMoveSelectionSerializer(serializers.Serializer):
+
+    selections = MoveSelectionSerializer(many=True)
+    destination = serializers.CharField()
+
+
 class FlagSelectionSerializer(serializers.Serializer):
 
     mailbox = serializers.CharField()
@@ -1,5 +1,7 @@
 """Tests for IMAP argument validation (command injection protection)."""
 
+from unittest import mock
+
 from django.test import SimpleTestCase
 
 from modoboa.webmail.exceptions import ImapError
@@ -50,3 +52,63 @@ class EscapeSearchPatternTestCase(SimpleTestCase):
         for value in ["a\r\nb", "a\tb", "a\x00b", "a\x7fb"]:
             with self.assertRaises(ImapError):
                 imaputils.escape_search_pattern(value)
+
+
+class CompressUidSetTestCase(SimpleTestCase):
+    """Tests for compress_uid_set."""
+
+    def test_ranges(self):
+        self.assertEqual(imaputils.compress_uid_set([]), "")
+        self.assertEqual(imaputils.compress_uid_set(["3"]), "3")
+        self.assertEqual(
+            imaputils.compress_uid_set(["5", "1", "2", "3", 9, "10", "3"]),
+            "1:3,5,9:10",
+        )
+        self.assertEqual(
+            imaputils.compress_uid_set(list(range(1, 501)) + list(range(600, 901))),
+            "1:500,600:900",
+        )
+
+
+class IMAPconnectorMoveTestCase(SimpleTestCase):
+    """Tests for IMAPconnector.move."""
+
+    def _get_connector(self, capabilities):
+        with mock.patch.object(
+            imaputils.param_tools, "get_global_parameters", return_value={}
+        ):
+            imapc = imaputils.IMAPconnector.__new__(imaputils.IMAPconnector)
+        imapc.m = mock.Mock()
+        imapc.m.uid.return_value = ("OK", [])
+        imapc.m._simple_command.return_value = ("OK", None)
+        imapc.m.untagged_responses = {}
+        imapc.capabilities = capabilities
+        return imapc
+
+    def test_move_with_move_extension(self):
+        imapc = self._get_connector(["IMAP4rev1", "MOVE", "UIDPLUS"])
+        imapc.move(["3", "1", "2", "8"], "INBOX", "Trash")
+        imapc.m.uid.assert_called_once_with("MOVE", "1:3,8", b'"Trash"')
+
+    def test_move_with_uidplus(self):
+        imapc = self._get_connector(["IMAP4rev1", "UIDPLUS"])
+        imapc.move("1,2,3", "INBOX", "Trash")
+        self.assertEqual(
+            [c.args for c in imapc.m.uid.call_args_list],
+            [
+                ("COPY", "1:3", b'"Trash"'),
+                ("STORE", "1:3", "+FLAGS", r"(\Deleted \Seen)"),
+                ("EXPUNGE", "1:3"),
+            ],
+        )
+
+    def test_move_without_extensions(self):
+        imapc = self._get_connector(["IMAP4rev1"])
+        imapc.move(["4"], "INBOX", "Trash")
+        commands = [c.args[0] for c in imapc.m.uid.call_args_list]
+        self.assertEqual(commands, ["COPY", "STORE"])
+
+    def test_move_empty_selection(self):
+        imapc = self._get_connector(["IMAP4rev1", "MOVE"])
+        imapc.move([], "INBOX", "Trash")
+        imapc.m.uid.assert_not_called()
@@ -318,6 +318,28 @@ class UserEmailViewSetTestCase(WebmailTestCase):
         response = self.client.post(url, body, format="json")
         self.assertEqual(response.status_code, 400)
 
+    def test_batch_move(self):
+        self.authenticate()
+        url = reverse("v2:webmail-email-batch-move")
+        body = {
+            "selections": [
+                {"source": "INBOX", "selection": [1, 2, 3]},
+                {"source": "Archives", "selection": [7, "truc"]},
+                {"source": "Trash", "selection": [4]},
+            ],
+            "destination": "Trash",
+        }
+        response = self.client.post(url, body, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 4)
+
+        body = {
+            "selections": [{"source": "Scheduled", "selection": [1]}],
+            "destination": "Trash",
+        }
+        response = self.client.post(url, body, format="json")
+        self.assertEqual(response.status_code, 400)
+
     def test_delete(self):
         self.authenticate()
         url = reverse("v2:webmail-email-delete")
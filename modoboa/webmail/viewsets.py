@@ -174,6 +174,8 @@ class UserEmailViewSet(viewsets.GenericViewSet):
             return serializers.PaginatedEmailListSerializer
         if self.action in ["move", "delete", "mark_as_junk", "mark_as_not_junk"]:
             return serializers.MoveSelectionSerializer
+        if self.action == "batch_move":
+            return serializers.BatchMoveSelectionSerializer
         if self.action == "flag":
             return serializers.FlagSelectionSerializer
         return serializers.EmailSerializer
@@ -227,7 +229,7 @@ class UserEmailViewSet(viewsets.GenericViewSet):
             destination = serializer.validated_data["destination"]
         with lib.get_imapconnector(request) as mbc:
             mbc.move(
-                ",".join(serializer.validated_data["selection"]),
+                serializer.validated_data["selection"],
                 serializer.validated_data["source"],
                 destination,
             )
@@ -273,6 +275,22 @@ class UserEmailViewSet(viewsets.GenericViewSet):
         count = self.move_selection(request, "INBOX")
         return response.Response({"count": count})
 
+    @action(
+        methods=["post"],
+        detail=False,
+        serializer_class=serializers.BatchMoveSelectionSerializer,
+    )
+    def batch_move(self, request):
+        """Move selections spanning several mailboxes in one IMAP session."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with lib.get_imapconnector(request) as imapc:
+            count = imapc.move_selections(
+                serializer.validated_data["selections"],
+                serializer.validated_data["destination"],
+            )
+        return response.Response({"count": count})
+
     @action(
         methods=["post"],
         detail=False,